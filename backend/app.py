@@ -1,27 +1,67 @@
 import os
 import uuid
-from flask import Flask, request, jsonify
+import io
+import csv
+import json
+from flask import Flask, Request, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
-from supabase import create_client, Client
-from helper import get_db_connection, extract_gps, compress_image
+from helper import get_db_connection, get_pool_stats, hash_to_db
+import metrics
+from metrics import span
+from ward_index import ward_locator, find_ward_overlaps, WardGeometryError
+from wards_cache import wards_cache, tier_for_zoom
+import tiles
+from listing import ComplaintListing, ListingError
+from search import ComplaintSearch
+from storage import STORAGE_BACKEND, get_storage
+from pipeline import ImageJob, image_pipeline, save_uploads
+from imaging import image_service, ImageServiceError
+from votes import vote_buffer
+from response_cache import feed_cache
+from ward_admins import AssignmentError, apply_assignments, parse_assignments, release_ward_admins
+from reroute import reroute_worker, enqueue_job, job_to_dict, JOB_COLUMNS
+from events import event_hub, event_stream, EventStreamError
+from dedup import open_complaints, find_duplicate, find_duplicates, pick_duplicate, haversine_m, OPEN_COMPLAINT_COLUMNS
 import datetime
+from psycopg2.extras import execute_values
+
+class InMemoryRequest(Request):
+    """Keeps uploaded files in memory instead of spooling large ones to disk."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
 
 app = Flask(__name__)
+app.request_class = InMemoryRequest
+# Uploads are held in memory, so bound the request size
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv("MAX_UPLOAD_MB", "25")) * 1024 * 1024
+
+# Reverse proxies in front of the app (0: none). Only then is the client
+# address taken from X-Forwarded-For, which clients can otherwise forge
+TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", "0"))
+if TRUSTED_PROXY_COUNT > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT, x_proto=TRUSTED_PROXY_COUNT)
 
 # --- ENABLE CORS ---
-CORS(app)
+# X-Next-Cursor carries the next page of /complaints/user/<phone>
+CORS(app, expose_headers=['X-Next-Cursor'])
 
-# Supabase Configuration
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# --- LOGGING + REQUEST METRICS (scraped from /metrics) ---
+metrics.configure_logging()
+metrics.init_app(app)
 
-# Staging folder for temporary storage during forensic checks
-UPLOAD_FOLDER = 'uploads'
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+# Ward edits re-route complaints in the background (see reroute.py); every
+# worker process takes part, resuming jobs left unfinished by a restart
+# Vector tiles need no invalidation here: complaint features carry id,
+# category and status only, none of which a re-route changes
+reroute_worker.on_batch = lambda ward_ids: feed_cache.invalidate(*ward_ids)
+app.before_request(reroute_worker.ensure_started)
+# Starts the image workers, and with them the recovery of uploads left
+# unfinished by a worker that exited before processing them
+app.before_request(image_pipeline.ensure_started)
 
 # ---------------------------------------------------------
 # API ENDPOINTS
@@ -56,12 +96,17 @@ def report_issue():
     phone = request.form.get('phone')
     force_new = request.form.get('force_new', 'false').lower() == 'true'
     
-    temp_file_path = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(temp_file_path)
+    file_extension = os.path.splitext(filename)[1]
 
-    gps_data = extract_gps(temp_file_path)
+    # The upload never touches disk: EXIF is read from the header of the
+    # in-memory buffer, and the pipeline decodes/encodes from the same bytes
+    data = file.stream.getvalue() if isinstance(file.stream, io.BytesIO) else file.read()
+    try:
+        with span("exif"):
+            gps_data, image_hash = image_service.inspect(data)
+    except ImageServiceError as e:
+        return jsonify({"error": f"Image processing unavailable: {e}"}), 503
     if not gps_data:
-        os.remove(temp_file_path)
         return jsonify({"status": "Rejected", "reason": "Image lacks GPS metadata"}), 400
     
     lat, lon = gps_data
@@ -70,19 +115,17 @@ def report_issue():
 
     try:
         if not force_new:
-            # Cast to geography to ensure 20 means 20 meters, not 20 degrees
-            check_query = """
-                SELECT id, category, description, status, image_url, created_at, phone_number, ward_id 
-                FROM complaints 
-                WHERE ST_DWithin(geom::geography, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography, 20)
-                AND status != 'resolved';
-            """
-            cur.execute(check_query, (lon, lat))
-            data = cur.fetchall()
-            
+            # Spatial radius combined with image similarity (see dedup.py)
+            with span("duplicate_check"):
+                duplicate_id = find_duplicate(cur, lon, lat, category, image_hash)
             duplicate_issue = None
-            for issue in data:
-                if issue[1] == category:
+            if duplicate_id is not None:
+                cur.execute("""
+                    SELECT id, category, description, status, image_url, created_at, phone_number, ward_id
+                    FROM complaints WHERE id = %s;
+                """, (duplicate_id,))
+                issue = cur.fetchone()
+                if issue:
                     # Format datetime safely
                     db_date = issue[5]
                     iso_date = db_date.isoformat() + 'Z' if isinstance(db_date, datetime.datetime) else None
@@ -99,7 +142,6 @@ def report_issue():
                         "latitude": lat,
                         "longitude": lon
                     }
-                    break
 
             if duplicate_issue:
                 # Return the duplicate data to the frontend modal
@@ -109,43 +151,40 @@ def report_issue():
                     "existing_issue": duplicate_issue
                 }), 409
 
-        # --- SPATIAL ROUTING ---
-        routing_query = """
-            SELECT id, name FROM wards 
-            WHERE ST_Contains(geom, ST_SetSRID(ST_MakePoint(%s, %s), 4326));
-        """
-        cur.execute(routing_query, (lon, lat))
-        ward = cur.fetchone()
+        # --- SPATIAL ROUTING (in-memory ward index) ---
+        with span("ward_routing"):
+            ward = ward_locator.locate(cur, lon, lat)
         ward_id = ward[0] if ward else None
         ward_name = ward[1] if ward else "Unknown Area"
 
-        # --- UPLOAD COMPRESSED IMAGE ---
-        compression_success = compress_image(temp_file_path, quality=80)
-        file_extension = os.path.splitext(filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-
-        with open(temp_file_path, 'rb') as f:
-            supabase.storage.from_(SUPABASE_BUCKET).upload(
-                path=unique_filename, file=f, file_options={"content-type": file.mimetype}
-            )
-        public_url = supabase.storage.from_(SUPABASE_BUCKET).get_public_url(unique_filename)
-
-        # --- SAVE TO DATABASE ---
+        # --- SAVE TO DATABASE (image follows from the background pipeline) ---
         insert_query = """
-            INSERT INTO complaints (image_url, description, geom, ward_id, category, phone_number, upvotes)
-            VALUES (%s, %s, ST_SetSRID(ST_MakePoint(%s, %s), 4326), %s, %s, %s, 0)
+            INSERT INTO complaints (image_url, image_status, description, geom, ward_id, category, phone_number, upvotes, image_hash)
+            VALUES (NULL, 'pending', %s, ST_SetSRID(ST_MakePoint(%s, %s), 4326), %s, %s, %s, 0, %s)
             RETURNING id;
         """
-        cur.execute(insert_query, (public_url, desc, lon, lat, ward_id, category, phone))
-        new_id = cur.fetchone()[0]
-        conn.commit()
+        with span("insert"):
+            cur.execute(insert_query, (desc, lon, lat, ward_id, category, phone, hash_to_db(image_hash)))
+            new_id = cur.fetchone()[0]
+            # Saved with the complaint so the job survives a worker restart
+            job = ImageJob(complaint_id=new_id, data=data, extension=file_extension, content_type=file.mimetype)
+            save_uploads(cur, [job])
+            conn.commit()
+        tiles.invalidate_point(lon, lat)
+        open_complaints.add(new_id, lat, lon, category, hash_to_db(image_hash), ward_id)
+        feed_cache.invalidate(ward_id)
+
+        # --- HAND THE IMAGE TO THE COMPRESS + UPLOAD WORKERS ---
+        with span("enqueue"):
+            image_pipeline.submit(job)
         
         return jsonify({
             "status": "Success", 
             "complaint_id": new_id,
             "routed_to_ward": ward_name,
-            "image_url": public_url
-        }), 201
+            "image_url": None,
+            "image_status": "pending"
+        }), 202
 
     except Exception as e:
         conn.rollback()
@@ -154,56 +193,31 @@ def report_issue():
     finally:
         cur.close()
         conn.close()
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
 
 # 3. Issue Request End point
+USER_COMPLAINT_FIELDS = ["id", "description", "status", "image_url", "image_status", "created_at", "latitude", "longitude"]
+
 @app.route('/api/v1/complaints/user/<string:phone_number>', methods=['GET'])
 def get_user_complaints(phone_number):
+    try:
+        listing = ComplaintListing(request.args, USER_COMPLAINT_FIELDS)
+    except ListingError as e:
+        return jsonify({"error": str(e)}), 400
+
     conn = get_db_connection()
     cur = conn.cursor()
 
     try:
-        query = """
-            SELECT id, description, status, image_url, created_at, 
-                   ST_Y(geom) as lat, ST_X(geom) as lon
-            FROM complaints 
-            WHERE phone_number = %s
-            ORDER BY created_at DESC;
-        """
-        cur.execute(query, (phone_number,))
-        records = cur.fetchall()
+        query, params = listing.query("c.phone_number = %s", (phone_number,))
+        cur.execute(query, params)
+        complaints, next_cursor = listing.page(cur.fetchall())
 
-        complaints = []
-        for row in records:
-            # Handle the datetime to ISO string conversion safely
-            db_date = row[4]
-            if isinstance(db_date, datetime.datetime):
-                # Convert to standard ISO format with 'Z' indicating UTC
-                iso_date = db_date.isoformat()
-                if not iso_date.endswith('Z') and not '+' in iso_date:
-                    iso_date += 'Z'
-            else:
-                iso_date = None
-
-            # Handle status casing (defaulting to 'pending' if null)
-            raw_status = row[2]
-            status_val = raw_status.lower() if raw_status else 'pending'
-
-            # Build the exact dictionary the frontend expects
-            complaints.append({
-                "id": str(row[0]),
-                "description": row[1],
-                "status": status_val,
-                "image_url": row[3],
-                "created_at": iso_date,
-                "latitude": row[5],
-                "longitude": row[6]
-            })
-        print(complaints)
-
-        # Return the raw array directly if your frontend maps over the root response
-        return jsonify(complaints), 200
+        # Return the raw array directly (the frontend maps over the root
+        # response); the cursor for the next page travels in a header
+        response = jsonify(complaints)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response, 200
 
     except Exception as e:
         return jsonify({"error": f"Database error: {str(e)}"}), 500
@@ -212,6 +226,8 @@ def get_user_complaints(phone_number):
         conn.close()
     
 # 4. End point to fetch Issues around a location
+WARD_COMPLAINT_FIELDS = ["id", "category", "description", "status", "image_url", "image_status", "images", "created_at", "latitude", "longitude"]
+
 @app.route('/api/v1/complaints/ward', methods=['GET'])
 def get_complaints_by_location():
     # 1. Grab coordinates from the URL query string
@@ -227,17 +243,17 @@ def get_complaints_by_location():
     except ValueError:
         return jsonify({"error": "Invalid coordinates provided"}), 400
 
+    try:
+        listing = ComplaintListing(request.args, WARD_COMPLAINT_FIELDS)
+    except ListingError as e:
+        return jsonify({"error": str(e)}), 400
+
     conn = get_db_connection()
     cur = conn.cursor()
 
     try:
         # --- STEP 1: Find which ward contains this location ---
-        ward_query = """
-            SELECT id, name FROM wards 
-            WHERE ST_Contains(geom, ST_SetSRID(ST_MakePoint(%s, %s), 4326));
-        """
-        cur.execute(ward_query, (lon, lat))
-        ward = cur.fetchone()
+        ward = ward_locator.locate(cur, lon, lat)
 
         # If the user is outside your defined city boundaries
         if not ward:
@@ -249,50 +265,33 @@ def get_complaints_by_location():
 
         ward_id, ward_name = ward[0], ward[1]
 
-        # --- STEP 2: Fetch all complaints for this ward ---
-        complaints_query = """
-            SELECT id, category, description, status, image_url, created_at, 
-                   ST_Y(geom) as lat, ST_X(geom) as lon 
-            FROM complaints 
-            WHERE ward_id = %s
-            ORDER BY created_at DESC;
-        """
-        cur.execute(complaints_query, (ward_id,))
-        records = cur.fetchall()
-
-        complaints = []
-        for row in records:
-            # Handle standard ISO date formatting
-            db_date = row[5]
-            if isinstance(db_date, datetime.datetime):
-                iso_date = db_date.isoformat()
-                if not iso_date.endswith('Z') and not '+' in iso_date:
-                    iso_date += 'Z'
-            else:
-                iso_date = None
-
-            raw_status = row[3]
-            status_val = raw_status.lower() if raw_status else 'pending'
+        # Every point in a ward gets the same page, so the cache is keyed on
+        # the ward and the listing parameters, not the coordinates
+        cache_params = [(k, v) for k, v in request.args.items(multi=True) if k not in ('lat', 'lon')]
+        cached, cache_key = feed_cache.lookup(ward_id, cache_params)
+        if cached is not None:
+            response = Response(cached, mimetype='application/json')
+            response.headers['X-Cache'] = 'HIT'
+            return response, 200
 
-            complaints.append({
-                "id": str(row[0]),
-                "category": row[1],
-                "description": row[2],
-                "status": status_val,
-                "image_url": row[4],
-                "created_at": iso_date,
-                "latitude": row[6],
-                "longitude": row[7]
-            })
+        # --- STEP 2: Fetch one page of complaints for this ward ---
+        query, params = listing.query("c.ward_id = %s", (ward_id,))
+        cur.execute(query, params)
+        complaints, next_cursor = listing.page(cur.fetchall())
 
         # Return a rich payload including the identified ward context
-        return jsonify({
+        response = jsonify({
             "status": "Success",
             "ward_id": ward_id,
             "ward_name": ward_name,
             "count": len(complaints),
+            "limit": listing.limit,
+            "next_cursor": next_cursor,
             "data": complaints
-        }), 200
+        })
+        feed_cache.store(cache_key, response.get_data())
+        response.headers['X-Cache'] = 'MISS'
+        return response, 200
 
     except Exception as e:
         return jsonify({"error": f"Database error: {str(e)}"}), 500
@@ -300,7 +299,27 @@ def get_complaints_by_location():
         cur.close()
         conn.close()
 
+def get_admin_profile(cur, admin_id):
+    """Returns (role, wards_allocated) for an admin, or None for anyone else."""
+    profile_query = """
+        SELECT p.role, array_remove(array_agg(aw.ward_id), NULL) 
+        FROM public.profiles p
+        LEFT JOIN public.admin_wards aw ON p.id = aw.user_id
+        WHERE p.id = %s
+        GROUP BY p.id;
+    """
+    cur.execute(profile_query, (admin_id,))
+    profile = cur.fetchone()
+    if not profile or profile[0] != 'admin':
+        return None
+    return profile
+
 # 5. ADMIN: Get complaints (Filtered by Ward)
+ADMIN_COMPLAINT_FIELDS = [
+    "id", "category", "description", "status", "image_url", "image_status", "images", "created_at",
+    "phone_number", "ward_id", "latitude", "longitude", "upvotes"
+]
+
 @app.route('/api/v1/admin/complaints', methods=['GET'])
 def get_all_complaints():
     admin_id = request.args.get('user_id')
@@ -308,69 +327,34 @@ def get_all_complaints():
     if not admin_id:
         return jsonify({"error": "User ID is required for access"}), 401
 
+    try:
+        listing = ComplaintListing(request.args, ADMIN_COMPLAINT_FIELDS)
+    except ListingError as e:
+        return jsonify({"error": str(e)}), 400
+
     conn = get_db_connection()
     cur = conn.cursor()
     
     try:
-        profile_query = """
-            SELECT p.role, array_remove(array_agg(aw.ward_id), NULL) 
-            FROM public.profiles p
-            LEFT JOIN public.admin_wards aw ON p.id = aw.user_id
-            WHERE p.id = %s
-            GROUP BY p.id;
-        """
-        cur.execute(profile_query, (admin_id,))
-        profile = cur.fetchone()
-
-        if not profile or profile[0] != 'admin':
+        profile = get_admin_profile(cur, admin_id)
+        if not profile:
             return jsonify({"error": "Unauthorized: Admin access required"}), 403
             
         wards_allocated = profile[1]
 
-        # --- ADDED COALESCE(upvotes, 0) TO BOTH QUERIES ---
         if wards_allocated:
-            query = """
-                SELECT id, category, description, status, image_url, created_at, 
-                       phone_number, ward_id, ST_Y(geom) as lat, ST_X(geom) as lon, COALESCE(upvotes, 0) as upvotes
-                FROM complaints 
-                WHERE ward_id = ANY(%s::int[])
-                ORDER BY created_at DESC;
-            """
-            cur.execute(query, (wards_allocated,))
+            query, params = listing.query("c.ward_id = ANY(%s::int[])", (wards_allocated,))
         else:
-            query = """
-                SELECT id, category, description, status, image_url, created_at, 
-                       phone_number, ward_id, ST_Y(geom) as lat, ST_X(geom) as lon, COALESCE(upvotes, 0) as upvotes
-                FROM complaints 
-                ORDER BY created_at DESC;
-            """
-            cur.execute(query)
-
-        records = cur.fetchall()
-
-        complaints = []
-        for row in records:
-            db_date = row[5]
-            iso_date = db_date.isoformat() + 'Z' if isinstance(db_date, datetime.datetime) else None
-
-            complaints.append({
-                "id": str(row[0]),
-                "category": row[1],
-                "description": row[2],
-                "status": row[3].lower() if row[3] else 'pending',
-                "image_url": row[4],
-                "created_at": iso_date,
-                "phone_number": row[6],
-                "ward_id": row[7],
-                "latitude": row[8],
-                "longitude": row[9],
-                "upvotes": row[10]
-            })
+            query, params = listing.query()
+        cur.execute(query, params)
+        complaints, next_cursor = listing.page(cur.fetchall())
 
         return jsonify({
             "status": "Success", 
             "wards_allocated": wards_allocated,
             "count": len(complaints),
+            "limit": listing.limit,
+            "next_cursor": next_cursor,
             "data": complaints
         }), 200
         
@@ -392,13 +376,17 @@ def update_complaint_status(issue_id):
     conn = get_db_connection()
     cur = conn.cursor()
     try:
-        update_query = "UPDATE complaints SET status = %s WHERE id = %s RETURNING id;"
+        update_query = f"UPDATE complaints SET status = %s WHERE id = %s RETURNING {OPEN_COMPLAINT_COLUMNS};"
         cur.execute(update_query, (new_status, issue_id))
+        updated = cur.fetchone()
         
-        if cur.fetchone() is None:
+        if updated is None:
             return jsonify({"error": "Complaint not found"}), 404
             
         conn.commit()
+        tiles.invalidate_point(updated[2], updated[1])
+        open_complaints.apply_row(updated)
+        feed_cache.invalidate(updated[5])
         return jsonify({"status": "Success", "message": f"Issue {issue_id} updated to {new_status}"}), 200
     except Exception as e:
         conn.rollback()
@@ -410,28 +398,43 @@ def update_complaint_status(issue_id):
 # 7. Fetch all wards for the frontend dropdowns
 @app.route('/api/v1/wards', methods=['GET'])
 def get_wards():
-    conn = get_db_connection()
-    cur = conn.cursor()
+    # Optional map parameters: zoom picks a simplification tier, bbox
+    # (minLon,minLat,maxLon,maxLat) limits the result to the visible area
+    zoom = request.args.get('zoom', type=int)
+    bbox = None
+    if request.args.get('bbox'):
+        try:
+            bbox = tuple(round(float(v), 4) for v in request.args['bbox'].split(','))
+        except ValueError:
+            bbox = ()
+        if len(bbox) != 4:
+            return jsonify({"error": "bbox must be minLon,minLat,maxLon,maxLat"}), 400
+
     try:
-        # Fetch ward IDs, names, and geometry GeoJSON
-        cur.execute("SELECT id, name, ST_AsGeoJSON(geom) FROM wards ORDER BY name ASC;")
-        records = cur.fetchall()
-        
-        import json
-        wards = []
-        for row in records:
-            wards.append({
-                "id": row[0], 
-                "name": row[1],
-                "geom": json.loads(row[2]) if row[2] else None
-            })
-        
-        return jsonify({"status": "Success", "data": wards}), 200
+        payload = wards_cache.get(tier_for_zoom(zoom), bbox)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        cur.close()
-        conn.close()
+
+    # Weak ETag: the same payload is served under several encodings
+    if request.if_none_match.contains_weak(payload.etag):
+        response = Response(status=304)
+    else:
+        accepted = request.accept_encodings
+        # Only touch payload.br when the client takes it: bbox payloads
+        # are compressed lazily, in the encoding served
+        if accepted['br'] and payload.br is not None:
+            response = Response(payload.br, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'br'
+        elif accepted['gzip']:
+            response = Response(payload.gzip, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(payload.body, mimetype='application/json')
+
+    response.set_etag(payload.etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
 # 9. ADMIN: Set new ward boundary
 @app.route('/api/v1/wards', methods=['POST'])
@@ -446,17 +449,14 @@ def create_ward():
     conn = get_db_connection()
     cur = conn.cursor()
     try:
-        # Check for intersection overlaps using ST_Area of ST_Intersection > 0
-        # This allows boundaries to seamlessly touch without throwing overlap errors
-        overlap_query = """
-            SELECT name FROM wards 
-            WHERE ST_Area(ST_Intersection(geom, ST_GeomFromText(%s, 4326))) > 0;
-        """
-        cur.execute(overlap_query, (geom_wkt,))
-        overlaps = cur.fetchall()
+        # Only overlapping areas conflict; boundaries may touch (see ward_index)
+        try:
+            overlaps = find_ward_overlaps(cur, geom_wkt)
+        except WardGeometryError as e:
+            return jsonify({"error": str(e)}), 400
         
         if overlaps:
-            conflicting_wards = [row[0] for row in overlaps]
+            conflicting_wards = [row[1] for row in overlaps]
             return jsonify({
                 "status": "Conflict", 
                 "error": "The drawn boundary overlaps with existing wards.",
@@ -466,8 +466,14 @@ def create_ward():
         insert_query = "INSERT INTO wards (name, geom) VALUES (%s, ST_GeomFromText(%s, 4326)) RETURNING id;"
         cur.execute(insert_query, (name, geom_wkt))
         new_id = cur.fetchone()[0]
+        # Complaints already inside the new boundary move to it in the background
+        job_id = enqueue_job(cur, 'ward_created', new_id)
         conn.commit()
-        return jsonify({"status": "Success", "ward_id": new_id}), 201
+        ward_locator.invalidate()
+        wards_cache.invalidate()
+        tiles.invalidate_layer('wards')
+        reroute_worker.notify()
+        return jsonify({"status": "Success", "ward_id": new_id, "reroute_job_id": job_id}), 201
     except Exception as e:
         conn.rollback()
         return jsonify({"error": str(e)}), 500
@@ -511,36 +517,31 @@ def get_users():
 @app.route('/api/v1/wards/<int:ward_id>/admin', methods=['POST'])
 def assign_ward_admin(ward_id):
     data = request.json
-    user_ids = data.get('user_ids', [])
+    return _assign_ward_admins({"assignments": [{"ward_id": ward_id, "user_ids": data.get('user_ids', [])}]})
+
+# 21. ADMIN: Bulk ward -> admins assignment
+# {"assignments": [{"ward_id": 3, "user_ids": [...]}, ...]}; each listed
+# ward's admins become exactly the given users, unlisted wards are untouched
+@app.route('/api/v1/wards/admins', methods=['POST'])
+def assign_ward_admins_bulk():
+    return _assign_ward_admins(request.get_json(silent=True))
+
+def _assign_ward_admins(payload):
+    try:
+        assignments = parse_assignments(payload)
+    except AssignmentError as e:
+        return jsonify({"error": str(e)}), e.status
 
     conn = get_db_connection()
     cur = conn.cursor()
     try:
-        # Check if ward exists
-        cur.execute("SELECT id FROM wards WHERE id = %s", (ward_id,))
-        if not cur.fetchone():
-            return jsonify({"error": "Ward not found"}), 404
-            
-        # 1. Clear existing junction mappings for this specific ward mapped in the panel
-        cur.execute("DELETE FROM public.admin_wards WHERE ward_id = %s", (ward_id,))
-
-        # 2. Rebuild the assignments directly according to the frontend's explicit checklist
-        if user_ids:
-            for uid in user_ids:
-                cur.execute("INSERT INTO public.admin_wards (user_id, ward_id) VALUES (%s, %s)", (uid, ward_id))
-
-        # 3. Synchronize `role` profiles automatically globally against the new mappings!
-        cur.execute("""
-            UPDATE public.profiles SET role = 'citizen' 
-            WHERE role = 'admin' AND id NOT IN (SELECT user_id FROM public.admin_wards);
-        """)
-        cur.execute("""
-            UPDATE public.profiles SET role = 'admin' 
-            WHERE id IN (SELECT user_id FROM public.admin_wards);
-        """)
-        
+        # One set-based diff; roles are recomputed only for users it changed
+        result = apply_assignments(cur, assignments)
         conn.commit()
-        return jsonify({"status": "Success", "message": "Admins bulk assigned successfully"}), 200
+        return jsonify({"status": "Success", "message": "Admins bulk assigned successfully", **result}), 200
+    except AssignmentError as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), e.status
     except Exception as e:
         conn.rollback()
         return jsonify({"error": str(e)}), 500
@@ -554,17 +555,25 @@ def delete_ward(ward_id):
     conn = get_db_connection()
     cur = conn.cursor()
     try:
-        # Cascading relationships in Postgres takes care of the mapping table.
-        # But we must nullify any historic complaints linked to this now-vanished ward
-        cur.execute("UPDATE complaints SET ward_id = NULL WHERE ward_id = %s", (ward_id,))
-        
-        # Finally delete the ward
-        cur.execute("DELETE FROM wards WHERE id = %s RETURNING id", (ward_id,))
+        # Mark the ward deleted and drop its pieces: that takes it out of
+        # routing, the map and overlap checks now. Its admins lose it in the
+        # same transaction (and their admin role with their last ward, since
+        # an admin without wards sees every ward). Its complaints are
+        # re-routed in batches by reroute_worker, which then removes the row.
+        cur.execute("UPDATE wards SET deleted_at = CURRENT_TIMESTAMP WHERE id = %s AND deleted_at IS NULL RETURNING id", (ward_id,))
         if not cur.fetchone():
             return jsonify({"error": "Ward not found"}), 404
+        cur.execute("DELETE FROM ward_parts WHERE ward_id = %s", (ward_id,))
+        demoted = release_ward_admins(cur, ward_id)
+        job_id = enqueue_job(cur, 'ward_deleted', ward_id)
             
         conn.commit()
-        return jsonify({"status": "Success", "message": "Ward deleted successfully"}), 200
+        ward_locator.invalidate()
+        wards_cache.invalidate()
+        tiles.invalidate_layer('wards')
+        feed_cache.invalidate(ward_id)
+        reroute_worker.notify()
+        return jsonify({"status": "Success", "message": "Ward deleted; its complaints are being re-routed", "reroute_job_id": job_id, "admins_demoted": demoted}), 202
     except Exception as e:
         conn.rollback()
         return jsonify({"error": str(e)}), 500
@@ -575,17 +584,525 @@ def delete_ward(ward_id):
 # 8. Vote End Point
 @app.route('/api/v1/complaints/<string:issue_id>/vote', methods=['POST'])
 def vote_issue(issue_id):
+    if not issue_id.isdigit():
+        return jsonify({"error": "Issue not found"}), 404
+
+    # One vote per voter per complaint. There is no verified identity here:
+    # voter_id is whatever the client sends (the frontend sends the signed-in
+    # phone number) and a client can change it at will, and anonymous votes
+    # are keyed by client address, so everyone behind one NAT or proxy counts
+    # once (see TRUSTED_PROXY_COUNT). This de-duplicates honest repeat clicks;
+    # it is not protection against vote stuffing
+    data = request.get_json(silent=True) or {}
+    voter_id = str(data.get('voter_id') or request.form.get('voter_id') or f"ip:{request.remote_addr}")[:200]
+
     conn = get_db_connection()
     cur = conn.cursor()
     try:
-        # Increment the upvotes count safely
-        update_query = "UPDATE complaints SET upvotes = COALESCE(upvotes, 1) + 1 WHERE id = %s RETURNING id;"
-        cur.execute(update_query, (issue_id,))
-        if not cur.fetchone():
+        # Read-only check: the increment itself is batched by vote_buffer
+        cur.execute("""
+            SELECT EXISTS (SELECT 1 FROM complaint_votes WHERE complaint_id = c.id AND voter_id = %s)
+            FROM complaints c WHERE c.id = %s;
+        """, (voter_id, int(issue_id)))
+        row = cur.fetchone()
+        if not row:
             return jsonify({"error": "Issue not found"}), 404
-            
-        conn.commit()
+        if row[0] or not vote_buffer.add(int(issue_id), voter_id):
+            return jsonify({"status": "Success", "message": "Vote already registered", "already_voted": True}), 200
+
         return jsonify({"status": "Success", "message": "Vote registered successfully"}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+
+# 13. Monitoring: Database connection pool statistics (per worker process)
+@app.route('/api/v1/health/db', methods=['GET'])
+def db_pool_health():
+    return jsonify({"status": "Success", "pool": get_pool_stats()}), 200
+
+# 14. Image processing status for a complaint (pending / ready / failed)
+@app.route('/api/v1/complaints/<string:issue_id>/image', methods=['GET'])
+def get_image_status(issue_id):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT image_status, image_url, image_variants FROM complaints WHERE id = %s;", (issue_id,))
+        row = cur.fetchone()
+        if not row:
+            return jsonify({"error": "Complaint not found"}), 404
+        return jsonify({"status": "Success", "image_status": row[0], "image_url": row[1], "images": row[2]}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+# 15. Serve images from the local storage stand-in (STORAGE_BACKEND=local only)
+if STORAGE_BACKEND == 'local':
+    @app.route('/media/<path:key>', methods=['GET'])
+    def serve_local_media(key):
+        return send_from_directory(get_storage().root, key)
+
+# 16. ADMIN: Streaming export of complaints (JSON Lines, CSV or GeoJSON)
+EXPORT_FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'geojson': 'application/geo+json',
+}
+# Renditions are left out of exports unless asked for with ?fields=
+EXPORT_COMPLAINT_FIELDS = [f for f in ADMIN_COMPLAINT_FIELDS if f not in ('images', 'image_status')]
+# Rows fetched per round trip by the server-side cursor
+EXPORT_ITERSIZE = int(os.getenv("EXPORT_ITERSIZE", "2000"))
+# Rows serialized per chunk written to the client
+EXPORT_CHUNK_ROWS = 500
+
+def _export_chunks(listing, fmt, cur):
+    if fmt == 'csv':
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(listing.fields)
+    elif fmt == 'geojson':
+        yield '{"type": "FeatureCollection", "features": [\n'
+
+    lines, first = [], True
+    for row in cur:
+        item = listing.format_row(row)
+        if fmt == 'jsonl':
+            lines.append(json.dumps(item))
+        elif fmt == 'csv':
+            writer.writerow([json.dumps(item[f]) if isinstance(item[f], dict) else item[f] for f in listing.fields])
+        else:
+            feature = {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [item.pop("longitude"), item.pop("latitude")]},
+                "properties": item
+            }
+            lines.append(("" if first else ",") + json.dumps(feature))
+            first = False
+
+        if len(lines) >= EXPORT_CHUNK_ROWS or (fmt == 'csv' and buf.tell() >= 64 * 1024):
+            if fmt == 'csv':
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            else:
+                yield "\n".join(lines) + "\n"
+                lines = []
+
+    if fmt == 'csv':
+        yield buf.getvalue()
+    elif lines:
+        yield "\n".join(lines) + "\n"
+    if fmt == 'geojson':
+        yield ']}\n'
+
+@app.route('/api/v1/admin/complaints/export', methods=['GET'])
+def export_complaints():
+    admin_id = request.args.get('user_id')
+    if not admin_id:
+        return jsonify({"error": "User ID is required for access"}), 401
+
+    fmt = request.args.get('format', 'jsonl').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+
+    try:
+        listing = ComplaintListing(request.args, ADMIN_COMPLAINT_FIELDS)
+    except ListingError as e:
+        return jsonify({"error": str(e)}), 400
+    if not request.args.get('fields'):
+        listing.fields = list(EXPORT_COMPLAINT_FIELDS)
+    if fmt == 'geojson':
+        # Coordinates become the feature geometry
+        listing.fields = [f for f in listing.fields if f not in ('latitude', 'longitude')] + ['latitude', 'longitude']
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        profile = get_admin_profile(cur, admin_id)
+        if not profile:
+            return jsonify({"error": "Unauthorized: Admin access required"}), 403
+        wards_allocated = profile[1]
+
+        ward_id = request.args.get('ward_id', type=int)
+        if ward_id is not None and wards_allocated and ward_id not in wards_allocated:
+            return jsonify({"error": "Unauthorized: Ward not allocated to this admin"}), 403
+
+        if ward_id is not None:
+            query, params = listing.query("c.ward_id = %s", (ward_id,), paged=False)
+        elif wards_allocated:
+            query, params = listing.query("c.ward_id = ANY(%s::int[])", (wards_allocated,), paged=False)
+        else:
+            query, params = listing.query(paged=False)
+    except Exception as e:
+        cur.close()
+        conn.close()
+        return jsonify({"error": str(e)}), 500
+    cur.close()
+
+    def generate():
+        # Named (server-side) cursor: rows arrive EXPORT_ITERSIZE at a time,
+        # so memory stays flat however many complaints are exported
+        stream_cur = conn.cursor(name=f"export_{uuid.uuid4().hex}")
+        stream_cur.itersize = EXPORT_ITERSIZE
+        try:
+            stream_cur.execute(query, params)
+            yield from _export_chunks(listing, fmt, stream_cur)
+        finally:
+            stream_cur.close()
+            conn.close()
+
+    filename = f"complaints.{fmt}"
+    response = Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+    # Returns the connection even if the client disconnects before the
+    # first chunk (an unstarted generator never runs its finally block)
+    response.call_on_close(conn.close)
+    return response
+
+# 17. Vector tiles (MVT) for the map: complaints and wards layers
+@app.route('/api/v1/tiles/<string:layer>/<int:z>/<int:x>/<int:y>.mvt', methods=['GET'])
+def get_tile(layer, z, x, y):
+    if layer not in tiles.LAYERS:
+        return jsonify({"error": f"Unknown layer. Available: {', '.join(tiles.LAYERS)}"}), 404
+    if not tiles.valid_tile(z, x, y):
+        return jsonify({"error": "Invalid tile coordinates"}), 400
+
+    try:
+        data = tiles.get_tile(layer, z, x, y)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    response = Response(data, mimetype='application/vnd.mapbox-vector-tile')
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
+
+# 18. Batch upload for field crews / offline clients
+# multipart: repeated `images` files plus an `items` JSON array of
+# {category, description, phone, force_new}, one per image in order
+REPORT_BATCH_MAX = int(os.getenv("REPORT_BATCH_MAX", "50"))
+
+@app.route('/api/v1/report/batch', methods=['POST'])
+def report_issue_batch():
+    files = request.files.getlist('images')
+    if not files:
+        return jsonify({"error": "No images uploaded"}), 400
+    if len(files) > REPORT_BATCH_MAX:
+        return jsonify({"error": f"At most {REPORT_BATCH_MAX} images per batch"}), 400
+    try:
+        items = json.loads(request.form.get('items') or '[]')
+    except ValueError:
+        return jsonify({"error": "items must be a JSON array"}), 400
+    if not isinstance(items, list) or (items and len(items) != len(files)):
+        return jsonify({"error": "items must have one entry per image"}), 400
+    if not all(isinstance(item, dict) for item in items):
+        return jsonify({"error": "Each item must be a JSON object"}), 400
+    items = items or [{} for _ in files]
+    default_phone = request.form.get('phone')
+
+    uploads = [f.stream.getvalue() if isinstance(f.stream, io.BytesIO) else f.read() for f in files]
+    # EXIF + perceptual hash for every image in parallel on the image processes
+    try:
+        inspected = image_service.inspect_many(uploads)
+    except ImageServiceError as e:
+        return jsonify({"error": f"Image processing unavailable: {e}"}), 503
+
+    results = [None] * len(files)
+    reports = []   # batch indexes with usable GPS
+    for i, (gps_data, image_hash) in enumerate(inspected):
+        if not gps_data:
+            results[i] = {"index": i, "status": "Rejected", "reason": "Image lacks GPS metadata"}
+        else:
+            reports.append(i)
+
+    def item_field(i, name, default):
+        value = items[i].get(name)
+        return default if value is None else value
+
+    def force_new(i):
+        return str(item_field(i, 'force_new', False)).lower() == 'true'
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        # --- DUPLICATES: one query for the whole batch ---
+        check = [i for i in reports if not force_new(i)]
+        duplicates = find_duplicates(cur, [
+            (inspected[i][0][1], inspected[i][0][0], item_field(i, 'category', 'No category'), inspected[i][1])
+            for i in check
+        ])
+        for i, duplicate_id in zip(check, duplicates):
+            if duplicate_id is not None:
+                results[i] = {"index": i, "status": "Duplicate", "existing_issue_id": str(duplicate_id)}
+
+        # Reports in the same batch can duplicate each other too
+        accepted = []
+        for i in reports:
+            if results[i] is not None:
+                continue
+            (lat, lon), image_hash = inspected[i]
+            if not force_new(i):
+                earlier = pick_duplicate([
+                    (j, item_field(j, 'category', 'No category'), inspected[j][1],
+                     haversine_m(lat, lon, inspected[j][0][0], inspected[j][0][1]))
+                    for j in accepted
+                ], item_field(i, 'category', 'No category'), image_hash)
+                if earlier is not None:
+                    results[i] = {"index": i, "status": "Duplicate", "duplicate_of_index": earlier}
+                    continue
+            accepted.append(i)
+
+        # --- SPATIAL ROUTING + ONE MULTI-ROW INSERT ---
+        values = []
+        wards = {}
+        for i in accepted:
+            (lat, lon), image_hash = inspected[i]
+            wards[i] = ward_locator.locate(cur, lon, lat)
+            values.append((
+                item_field(i, 'description', 'No description'), lon, lat,
+                wards[i][0] if wards[i] else None,
+                item_field(i, 'category', 'No category'),
+                item_field(i, 'phone', default_phone),
+                hash_to_db(image_hash)
+            ))
+        new_ids = []
+        if values:
+            new_ids = [row[0] for row in execute_values(cur, """
+                INSERT INTO complaints (image_url, image_status, description, geom, ward_id, category, phone_number, upvotes, image_hash)
+                VALUES %s RETURNING id;
+            """, values,
+                template="(NULL, 'pending', %s, ST_SetSRID(ST_MakePoint(%s, %s), 4326), %s, %s, %s, 0, %s)",
+                page_size=len(values), fetch=True)]
+        jobs = [
+            ImageJob(
+                complaint_id=new_id,
+                data=uploads[i],
+                extension=os.path.splitext(secure_filename(files[i].filename or ''))[1],
+                content_type=files[i].mimetype
+            )
+            for i, new_id in zip(accepted, new_ids)
+        ]
+        save_uploads(cur, jobs)
+        conn.commit()
+        feed_cache.invalidate(*(row[3] for row in values))
+
+        for i, new_id, row, job in zip(accepted, new_ids, values, jobs):
+            (lat, lon), image_hash = inspected[i]
+            tiles.invalidate_point(lon, lat)
+            open_complaints.add(new_id, lat, lon, row[4], row[6], row[3])
+            image_pipeline.submit(job)
+            results[i] = {
+                "index": i,
+                "status": "Success",
+                "complaint_id": new_id,
+                "routed_to_ward": wards[i][1] if wards[i] else "Unknown Area",
+                "image_status": "pending"
+            }
+
+        return jsonify({"status": "Success", "created": len(new_ids), "results": results}), 202 if new_ids else 200
+
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": f"Failed to process batch: {str(e)}"}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+
+# 20. ADMIN: Dashboard summary per ward (counts, resolution time, top voted, daily trend)
+# Read from the aggregate tables of migration 0008, which triggers on
+# complaints keep current, so the cost grows with wards, not complaints
+STATS_MAX_DAYS = 365
+STATS_MAX_TOP = 50
+
+def _empty_ward_stats(ward_id, name):
+    return {
+        "ward_id": ward_id, "ward_name": name, "total": 0, "by_status": {}, "by_category": {},
+        "resolved": 0, "avg_resolution_hours": None, "top_upvoted": [], "daily": []
+    }
+
+def _avg_hours(seconds, resolved):
+    return round(seconds / resolved / 3600, 2) if resolved else None
+
+@app.route('/api/v1/admin/stats', methods=['GET'])
+def get_admin_stats():
+    admin_id = request.args.get('user_id')
+
+    if not admin_id:
+        return jsonify({"error": "User ID is required for access"}), 401
+
+    days = request.args.get('days', 30, type=int)
+    top = request.args.get('top', 5, type=int)
+    if not 1 <= days <= STATS_MAX_DAYS or not 0 <= top <= STATS_MAX_TOP:
+        return jsonify({"error": f"days must be 1-{STATS_MAX_DAYS} and top 0-{STATS_MAX_TOP}"}), 400
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        profile = get_admin_profile(cur, admin_id)
+        if not profile:
+            return jsonify({"error": "Unauthorized: Admin access required"}), 403
+
+        wards_allocated = profile[1]
+
+        # Unrestricted admins also see complaints outside every ward (ward 0)
+        if wards_allocated:
+            cur.execute("SELECT id, name FROM wards WHERE id = ANY(%s::int[]) AND deleted_at IS NULL ORDER BY id;", (wards_allocated,))
+        else:
+            cur.execute("SELECT id, name FROM wards WHERE deleted_at IS NULL ORDER BY id;")
+        wards = {row[0]: _empty_ward_stats(row[0], row[1]) for row in cur.fetchall()}
+        if not wards_allocated:
+            wards[0] = _empty_ward_stats(0, "Unassigned")
+        ward_ids = list(wards)
+
+        cur.execute("""
+            SELECT ward_id, status, category, complaints FROM ward_status_counts
+            WHERE ward_id = ANY(%s::int[]) AND complaints > 0;
+        """, (ward_ids,))
+        for ward_id, status, category, count in cur.fetchall():
+            ward = wards[ward_id]
+            ward["total"] += count
+            ward["by_status"][status] = ward["by_status"].get(status, 0) + count
+            ward["by_category"][category] = ward["by_category"].get(category, 0) + count
+
+        cur.execute("""
+            SELECT ward_id, resolved, resolution_seconds FROM ward_resolution_stats
+            WHERE ward_id = ANY(%s::int[]);
+        """, (ward_ids,))
+        resolution_seconds = 0.0
+        for ward_id, resolved, seconds in cur.fetchall():
+            wards[ward_id]["resolved"] = resolved
+            wards[ward_id]["avg_resolution_hours"] = _avg_hours(seconds, resolved)
+            resolution_seconds += seconds
+
+        cur.execute("""
+            SELECT ward_id, day, reported, resolved FROM ward_daily_counts
+            WHERE ward_id = ANY(%s::int[]) AND day > (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')::date - %s
+            AND (reported > 0 OR resolved > 0)
+            ORDER BY ward_id, day;
+        """, (ward_ids, days))
+        for ward_id, day, reported, resolved in cur.fetchall():
+            wards[ward_id]["daily"].append({"date": day.isoformat(), "reported": reported, "resolved": resolved})
+
+        # Open issues only: top-N per ward straight off complaints_ward_upvotes_idx
+        if top:
+            cur.execute("""
+                SELECT w.id, c.id, c.category, c.description, c.status, c.upvotes, c.created_at
+                FROM unnest(%s::int[]) AS w(id)
+                CROSS JOIN LATERAL (
+                    SELECT id, category, description, status, upvotes, created_at FROM complaints
+                    WHERE ward_id = w.id AND status IS DISTINCT FROM 'resolved'
+                    ORDER BY upvotes DESC, id DESC LIMIT %s
+                ) c;
+            """, ([w for w in ward_ids if w], top))
+            for ward_id, issue_id, category, description, status, upvotes, created_at in cur.fetchall():
+                wards[ward_id]["top_upvoted"].append({
+                    "id": issue_id, "category": category, "description": description,
+                    "status": status.lower() if status else 'pending', "upvotes": upvotes or 0,
+                    "created_at": created_at.isoformat() if created_at else None
+                })
+
+        totals = {"total": 0, "by_status": {}, "by_category": {}, "resolved": 0}
+        for ward in wards.values():
+            totals["total"] += ward["total"]
+            totals["resolved"] += ward["resolved"]
+            for key in ("by_status", "by_category"):
+                for name, count in ward[key].items():
+                    totals[key][name] = totals[key].get(name, 0) + count
+        totals["avg_resolution_hours"] = _avg_hours(resolution_seconds, totals["resolved"])
+
+        return jsonify({
+            "status": "Success",
+            "wards_allocated": wards_allocated,
+            "days": days,
+            "totals": totals,
+            "wards": list(wards.values())
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+
+# 22. ADMIN: Progress of background re-routing after ward edits (any admin)
+@app.route('/api/v1/admin/reroute-jobs', methods=['GET'])
+def list_reroute_jobs():
+    admin_id = request.args.get('user_id')
+    if not admin_id:
+        return jsonify({"error": "User ID is required for access"}), 401
+    status = request.args.get('status')
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        profile = get_admin_profile(cur, admin_id)
+        if not profile:
+            return jsonify({"error": "Unauthorized: Admin access required"}), 403
+        if status:
+            cur.execute(f"SELECT {JOB_COLUMNS} FROM reroute_jobs WHERE status = %s ORDER BY id DESC LIMIT %s;", (status, limit))
+        else:
+            cur.execute(f"SELECT {JOB_COLUMNS} FROM reroute_jobs ORDER BY id DESC LIMIT %s;", (limit,))
+        jobs = [job_to_dict(row) for row in cur.fetchall()]
+        return jsonify({"status": "Success", "count": len(jobs), "data": jobs}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+@app.route('/api/v1/admin/reroute-jobs/<int:job_id>', methods=['GET'])
+def get_reroute_job(job_id):
+    admin_id = request.args.get('user_id')
+    if not admin_id:
+        return jsonify({"error": "User ID is required for access"}), 401
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        profile = get_admin_profile(cur, admin_id)
+        if not profile:
+            return jsonify({"error": "Unauthorized: Admin access required"}), 403
+        cur.execute(f"SELECT {JOB_COLUMNS} FROM reroute_jobs WHERE id = %s;", (job_id,))
+        row = cur.fetchone()
+        if row is None:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify({"status": "Success", "data": job_to_dict(row)}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+# A failed job continues from its last committed batch
+@app.route('/api/v1/admin/reroute-jobs/<int:job_id>/retry', methods=['POST'])
+def retry_reroute_job(job_id):
+    admin_id = request.args.get('user_id')
+    if not admin_id:
+        return jsonify({"error": "User ID is required for access"}), 401
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        profile = get_admin_profile(cur, admin_id)
+        if not profile:
+            return jsonify({"error": "Unauthorized: Admin access required"}), 403
+        cur.execute("""
+            UPDATE reroute_jobs SET status = CASE WHEN started_at IS NULL THEN 'pending' ELSE 'running' END,
+                   attempts = 0, finished_at = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s AND status = 'failed' RETURNING id;
+        """, (job_id,))
+        if not cur.fetchone():
+            return jsonify({"error": "No failed job with that id"}), 404
+        conn.commit()
+        reroute_worker.notify()
+        return jsonify({"status": "Success", "message": f"Job {job_id} resumed"}), 200
     except Exception as e:
         conn.rollback()
         return jsonify({"error": str(e)}), 500
@@ -594,5 +1111,175 @@ def vote_issue(issue_id):
         conn.close()
 
 
+# 23. Search complaints by description/category (full text + typo tolerant),
+# optionally ranked by distance from lat/lon (see search.py)
+SEARCH_COMPLAINT_FIELDS = WARD_COMPLAINT_FIELDS + ["ward_id", "upvotes", "score", "distance_m"]
+ADMIN_SEARCH_COMPLAINT_FIELDS = ADMIN_COMPLAINT_FIELDS + ["score", "distance_m"]
+
+@app.route('/api/v1/complaints/search', methods=['GET'])
+def search_complaints():
+    ward_id = request.args.get('ward_id', type=int)
+    try:
+        search = ComplaintSearch(request.args, SEARCH_COMPLAINT_FIELDS)
+    except ListingError as e:
+        return jsonify({"error": str(e)}), 400
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        if ward_id is not None:
+            query, params = search.query("c.ward_id = %s", (ward_id,))
+        else:
+            query, params = search.query()
+        cur.execute(query, params)
+        complaints, next_cursor = search.page(cur.fetchall())
+        return jsonify({
+            "status": "Success",
+            "query": search.text,
+            "count": len(complaints),
+            "limit": search.limit,
+            "next_cursor": next_cursor,
+            "data": complaints
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+# Same search, limited to the admin's wards (all wards when none are allocated)
+@app.route('/api/v1/admin/complaints/search', methods=['GET'])
+def search_admin_complaints():
+    admin_id = request.args.get('user_id')
+    if not admin_id:
+        return jsonify({"error": "User ID is required for access"}), 401
+
+    try:
+        search = ComplaintSearch(request.args, ADMIN_SEARCH_COMPLAINT_FIELDS)
+    except ListingError as e:
+        return jsonify({"error": str(e)}), 400
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        profile = get_admin_profile(cur, admin_id)
+        if not profile:
+            return jsonify({"error": "Unauthorized: Admin access required"}), 403
+
+        wards_allocated = profile[1]
+        if wards_allocated:
+            query, params = search.query("c.ward_id = ANY(%s::int[])", (wards_allocated,))
+        else:
+            query, params = search.query()
+        cur.execute(query, params)
+        complaints, next_cursor = search.page(cur.fetchall())
+        return jsonify({
+            "status": "Success",
+            "query": search.text,
+            "wards_allocated": wards_allocated,
+            "count": len(complaints),
+            "limit": search.limit,
+            "next_cursor": next_cursor,
+            "data": complaints
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+
+# 24. Live updates (Server-Sent Events) for one ward's feed: new reports,
+# status changes, votes, processed images and re-routed complaints.
+# Reconnecting clients resume with Last-Event-ID (see events.py)
+def _last_event_id():
+    value = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if value is None:
+        return None
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        raise ValueError("Invalid Last-Event-ID")
+
+def _event_response(ward_ids, last_id):
+    try:
+        sub = event_hub.subscribe(ward_ids)
+    except EventStreamError as e:
+        return jsonify({"error": str(e)}), 503
+    response = Response(stream_with_context(event_stream(event_hub, sub, last_id)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies (nginx) from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/v1/complaints/stream', methods=['GET'])
+def stream_ward_events():
+    try:
+        last_id = _last_event_id()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    ward_id = request.args.get('ward_id', type=int)
+    if ward_id is None:
+        lat = request.args.get('lat', type=float)
+        lon = request.args.get('lon', type=float)
+        if lat is None or lon is None:
+            return jsonify({"error": "ward_id or lat/lon is required"}), 400
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            ward = ward_locator.locate(cur, lon, lat)
+        except Exception as e:
+            return jsonify({"error": f"Database error: {str(e)}"}), 500
+        finally:
+            cur.close()
+            conn.close()
+        if not ward:
+            return jsonify({"status": "Not Found", "message": "This location does not fall inside any registered ward."}), 404
+        ward_id = ward[0]
+
+    return _event_response([ward_id], last_id)
+
+# Same stream over all of an admin's wards (every ward when none are allocated)
+@app.route('/api/v1/admin/complaints/stream', methods=['GET'])
+def stream_admin_events():
+    admin_id = request.args.get('user_id')
+    if not admin_id:
+        return jsonify({"error": "User ID is required for access"}), 401
+    try:
+        last_id = _last_event_id()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        profile = get_admin_profile(cur, admin_id)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        cur.close()
+        conn.close()
+    if not profile:
+        return jsonify({"error": "Unauthorized: Admin access required"}), 403
+
+    return _event_response(profile[1] or None, last_id)
+
+
+# 19. Monitoring: Prometheus metrics for this worker process
+metrics.register_collector("civicsnap_db_pool", "Database connection pool state.", get_pool_stats)
+metrics.register_collector("civicsnap_image_pipeline", "Background image pipeline queue and job counts.", image_pipeline.stats)
+metrics.register_collector("civicsnap_image_service", "Image process pool task counts.", image_service.stats)
+metrics.register_collector("civicsnap_vote_buffer", "Buffered votes and flush counts.", vote_buffer.stats)
+metrics.register_collector("civicsnap_dedup_index", "In-memory open complaint index size.", open_complaints.stats)
+metrics.register_collector("civicsnap_events", "Live update streams, events received and delivered.", event_hub.stats)
+metrics.register_collector("civicsnap_reroute", "Background re-routing batches and complaints moved.", reroute_worker.stats)
+metrics.register_collector("civicsnap_feed_cache", "Ward feed response cache hits, misses and invalidations.", feed_cache.stats)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
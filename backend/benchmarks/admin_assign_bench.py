@@ -0,0 +1,120 @@
+"""
+Benchmark: ward admin assignment time, the old per-ward route (delete, one
+INSERT per user, then two role UPDATEs over every profile) versus the
+set-based diff in ward_admins.apply_assignments.
+
+Everything runs in one transaction that is rolled back at the end: it adds
+--profiles users (auth.users rows; the init.sql trigger creates their
+profiles), --wards x --wards bench wards and --admins existing assignments,
+then times each scenario --repeat times from a savepoint.
+
+    python benchmarks/admin_assign_bench.py [--profiles 100000] [--wards 4]
+        [--admins 2000] [--users-per-ward 5] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper import get_db_connection
+from seed import seed_wards
+from ward_admins import apply_assignments
+
+
+def legacy_assign(cur, ward_id, user_ids):
+    """The previous body of assign_ward_admin, for one ward."""
+    cur.execute("SELECT id FROM wards WHERE id = %s", (ward_id,))
+    cur.fetchone()
+    cur.execute("DELETE FROM public.admin_wards WHERE ward_id = %s", (ward_id,))
+    for uid in user_ids:
+        cur.execute("INSERT INTO public.admin_wards (user_id, ward_id) VALUES (%s, %s)", (uid, ward_id))
+    cur.execute("""
+        UPDATE public.profiles SET role = 'citizen'
+        WHERE role = 'admin' AND id NOT IN (SELECT user_id FROM public.admin_wards);
+    """)
+    cur.execute("""
+        UPDATE public.profiles SET role = 'admin'
+        WHERE id IN (SELECT user_id FROM public.admin_wards);
+    """)
+
+
+def seed_profiles(cur, count):
+    cur.execute("""
+        INSERT INTO auth.users (id)
+        SELECT gen_random_uuid() FROM generate_series(1, %s)
+        RETURNING id::text;
+    """, (count,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def seed_admins(cur, user_ids, ward_ids, count, rng):
+    pairs = [(uid, rng.choice(ward_ids)) for uid in rng.sample(user_ids, count)]
+    cur.execute("""
+        INSERT INTO public.admin_wards (user_id, ward_id)
+        SELECT * FROM unnest(%s::uuid[], %s::int[]) ON CONFLICT DO NOTHING;
+    """, ([p[0] for p in pairs], [p[1] for p in pairs]))
+    cur.execute("UPDATE public.profiles SET role = 'admin' WHERE id = ANY(%s::uuid[]);", ([p[0] for p in pairs],))
+
+
+def time_scenario(cur, repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        cur.execute("SAVEPOINT bench;")
+        began = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - began) * 1000)
+        cur.execute("ROLLBACK TO SAVEPOINT bench;")
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', type=int, default=100000)
+    parser.add_argument('--wards', type=int, default=4, help="grid size: N x N bench wards")
+    parser.add_argument('--admins', type=int, default=2000, help="existing ward assignments")
+    parser.add_argument('--users-per-ward', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        began = time.perf_counter()
+        user_ids = seed_profiles(cur, args.profiles)
+        ward_ids = seed_wards(cur, args.wards)
+        seed_admins(cur, user_ids, ward_ids, min(args.admins, len(user_ids)), rng)
+        cur.execute("ANALYZE public.profiles; ANALYZE public.admin_wards;")
+        cur.execute("SELECT count(*) FROM public.profiles;")
+        total_profiles = cur.fetchone()[0]
+        print(f"Seeded {args.profiles} profiles ({total_profiles} in total), {len(ward_ids)} wards, "
+              f"{args.admins} assignments in {time.perf_counter() - began:.1f}s")
+
+        k = args.users_per_ward
+        one_ward = {ward_ids[0]: rng.sample(user_ids, k)}
+        all_wards = {ward_id: rng.sample(user_ids, k) for ward_id in ward_ids}
+
+        scenarios = [
+            (f"1 ward x {k} users", one_ward),
+            (f"{len(ward_ids)} wards x {k} users", all_wards),
+        ]
+        print(f"{'scenario':24s} {'per-ward route':>16s} {'set-based':>12s} {'speedup':>9s}")
+        for label, assignments in scenarios:
+            legacy_ms = time_scenario(cur, args.repeat, lambda: [
+                legacy_assign(cur, ward_id, users) for ward_id, users in assignments.items()
+            ])
+            bulk_ms = time_scenario(cur, args.repeat, lambda: apply_assignments(cur, assignments))
+            print(f"{label:24s} {legacy_ms:13.1f} ms {bulk_ms:9.1f} ms {legacy_ms / bulk_ms:8.1f}x")
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
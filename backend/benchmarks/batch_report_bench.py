@@ -0,0 +1,125 @@
+"""
+Benchmark: items/sec through POST /api/v1/report (one image per request)
+versus POST /api/v1/report/batch (N images per request).
+
+Drives the Flask app in-process with the test client. Images go to the
+local storage stand-in (STORAGE_BACKEND=local), so only the database is
+needed, and it must be marked disposable (see seed.py). Every report is
+forced new and tagged with a "bench-" phone number, and the rows are
+removed afterwards.
+
+    python benchmarks/batch_report_bench.py [--items 200] [--batch 50]
+
+No results are recorded yet: the batch route is not known to be faster
+until this has been run against a PostGIS database.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ.setdefault("LOCAL_STORAGE_DIR", tempfile.mkdtemp(prefix="civicsnap-bench-"))
+
+import app as civicsnap
+from helper import get_db_connection
+from pipeline import image_pipeline
+from seed import BENCH_PHONE_PREFIX, CATEGORIES, cleanup, require_disposable_database
+from synthetic import make_geotagged_jpeg, random_point
+
+
+def make_uploads(count, size, seed):
+    rng = random.Random(seed)
+    uploads = []
+    for i in range(count):
+        lat, lon = random_point(rng)
+        uploads.append((make_geotagged_jpeg(lat, lon, size=size, seed=seed + i), rng.choice(CATEGORIES)))
+    return uploads
+
+
+def run_single(client, uploads):
+    for i, (data, category) in enumerate(uploads):
+        response = client.post('/api/v1/report', data={
+            'image': (io.BytesIO(data), f'IMG_{i:04d}.jpg'),
+            'category': category,
+            'description': 'Batch benchmark (single)',
+            'phone': BENCH_PHONE_PREFIX + 'batch',
+            'force_new': 'true',
+        }, content_type='multipart/form-data')
+        assert response.status_code == 202, response.get_json()
+
+
+def run_batch(client, uploads, batch):
+    for start in range(0, len(uploads), batch):
+        chunk = uploads[start:start + batch]
+        response = client.post('/api/v1/report/batch', data={
+            'images': [(io.BytesIO(data), f'IMG_{start + i:04d}.jpg') for i, (data, _) in enumerate(chunk)],
+            'items': json.dumps([
+                {'category': category, 'description': 'Batch benchmark (batch)', 'force_new': True}
+                for _, category in chunk
+            ]),
+            'phone': BENCH_PHONE_PREFIX + 'batch',
+        }, content_type='multipart/form-data')
+        body = response.get_json()
+        assert response.status_code == 202 and body['created'] == len(chunk), body
+
+
+def check_database():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        require_disposable_database(cur)
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+
+def remove_bench_rows():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        complaints, _ = cleanup(cur)
+        conn.commit()
+        return complaints
+    finally:
+        cur.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=200)
+    parser.add_argument('--batch', type=int, default=civicsnap.REPORT_BATCH_MAX)
+    parser.add_argument('--size', type=int, nargs=2, default=(2000, 1500), metavar=('W', 'H'))
+    args = parser.parse_args()
+    check_database()
+
+    print(f"Generating {args.items} geotagged {args.size[0]}x{args.size[1]} JPEGs...")
+    uploads = make_uploads(args.items, tuple(args.size), seed=11)
+    client = civicsnap.app.test_client()
+    # Warm up the pool, ward index and worker threads
+    run_single(client, uploads[:2])
+
+    try:
+        for name, fn in (('single', lambda: run_single(client, uploads)),
+                         (f'batch({args.batch})', lambda: run_batch(client, uploads, args.batch))):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            print(f"{name:12s} {args.items / elapsed:8.1f} items/s  ({elapsed:.2f}s)")
+        # Image compression/upload is asynchronous in both modes; let it
+        # finish before the rows are deleted
+        image_pipeline.drain()
+    finally:
+        print(f"Removed {remove_bench_rows()} benchmark complaints")
+
+
+if __name__ == '__main__':
+    main()
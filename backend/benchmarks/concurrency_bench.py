@@ -0,0 +1,189 @@
+"""
+Benchmark: concurrent connections one worker process can carry, sync vs async.
+
+Starts a single gunicorn worker (gunicorn.conf.py) in each mode:
+  sync     SERVER_MODE=sync, WEB_THREADS=1: the default gunicorn sync worker
+  gthread  SERVER_MODE=sync, WEB_THREADS=--threads
+  async    SERVER_MODE=async: gevent worker, psycopg2 made non-blocking
+and drives increasing numbers of concurrent clients at an I/O-bound route,
+recording throughput, p50/p99 latency and errors per level. A level counts
+as carried when there are no errors and p99 stays under --p99-limit times
+the I/O wait.
+
+The route is the app plus /bench/io, which waits --io-wait seconds either in
+Postgres (--io db: SELECT pg_sleep through the pool, needs the database in
+.env) or in a plain sleep standing in for a database / storage round trip
+(--io sleep, no database needed). --route drives a real API path instead.
+
+    python benchmarks/concurrency_bench.py [--io sleep|db] [--io-wait 0.05]
+        [--levels 1 8 32 128 512] [--modes sync gthread async] [--output concurrency.json]
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from load_test import free_port, latency_summary, git_commit
+
+
+def bench_app():
+    """Gunicorn app factory: the API plus the /bench/io probe."""
+    from app import app
+    from helper import get_db_connection
+
+    io = os.getenv("BENCH_IO", "sleep")
+    io_wait = float(os.getenv("BENCH_IO_WAIT", "0.05"))
+
+    @app.route('/bench/io', methods=['GET'])
+    def bench_io():
+        if io == 'db':
+            conn = get_db_connection()
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT pg_sleep(%s);", (io_wait,))
+            finally:
+                cur.close()
+                conn.close()
+        else:
+            time.sleep(io_wait)  # cooperative under the gevent worker
+        return '{"status": "ok"}', 200, {'Content-Type': 'application/json'}
+
+    return app
+
+
+def start_worker(mode, port, args):
+    env = dict(os.environ,
+               SERVER_MODE='async' if mode == 'async' else 'sync',
+               WEB_THREADS=str(args.threads if mode == 'gthread' else 1),
+               WEB_WORKERS='1',
+               ASYNC_WORKER_CONNECTIONS=str(max(args.levels) * 2),
+               DB_POOL_MAX=str(args.db_pool),
+               BENCH_IO=args.io, BENCH_IO_WAIT=str(args.io_wait),
+               PYTHONPATH=os.pathsep.join([BACKEND_DIR, os.path.join(BACKEND_DIR, 'benchmarks')]))
+    command = ['gunicorn', '-c', os.path.join(BACKEND_DIR, 'gunicorn.conf.py'), '--bind', f'127.0.0.1:{port}',
+               '--backlog', '4096', '--log-level', 'warning', 'concurrency_bench:bench_app()']
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{mode} worker exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"{mode} worker did not come up within 60s")
+
+
+def drive(port, path, clients, duration, timeout):
+    """Closed loop: `clients` connections each sending requests back to back."""
+    samples = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(clients + 1)
+    stop_at = [0.0]
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+        local = []
+        start_barrier.wait()
+        while time.monotonic() < stop_at[0]:
+            began = time.perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                ok = False
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+            local.append((time.perf_counter() - began, ok))
+        connection.close()
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    stop_at[0] = time.monotonic() + duration
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    latencies = sorted(s[0] for s in samples if s[1])
+    return {
+        "clients": clients,
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if not s[1]),
+        "throughput_rps": round(len(latencies) / duration, 2),
+        **latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', default=['sync', 'gthread', 'async'], choices=['sync', 'gthread', 'async'])
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 8, 32, 128, 512])
+    parser.add_argument('--io', choices=('sleep', 'db'), default='sleep')
+    parser.add_argument('--io-wait', type=float, default=0.05, help="seconds each request waits on I/O")
+    parser.add_argument('--route', help="drive this API path instead of /bench/io")
+    parser.add_argument('--threads', type=int, default=8, help="threads per gthread worker")
+    parser.add_argument('--db-pool', type=int, default=20, help="DB_POOL_MAX for the worker")
+    parser.add_argument('--duration', type=float, default=10, help="seconds per level")
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--p99-limit', type=float, default=4, help="carried while p99 < this x io-wait")
+    parser.add_argument('--output', default='concurrency_results.json')
+    args = parser.parse_args()
+
+    path = args.route or '/bench/io'
+    limit_ms = args.p99_limit * args.io_wait * 1000
+    results = {}
+    for mode in args.modes:
+        port = free_port()
+        process = start_worker(mode, port, args)
+        try:
+            drive(port, path, min(args.levels), 1, args.timeout)  # warm-up
+            levels = []
+            for clients in args.levels:
+                level = drive(port, path, clients, args.duration, args.timeout)
+                level["carried"] = level["errors"] == 0 and level["p99_ms"] is not None and level["p99_ms"] < limit_ms
+                levels.append(level)
+                print(f"{mode:8s} {clients:5d} clients  {level['throughput_rps']:8.1f} req/s  "
+                      f"p50 {level['p50_ms'] or 0:8.1f} ms  p99 {level['p99_ms'] or 0:8.1f} ms  "
+                      f"errors {level['errors']}{'' if level['carried'] else '  (not carried)'}")
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        carried = [level["clients"] for level in levels if level["carried"]]
+        results[mode] = {"max_carried_clients": max(carried) if carried else 0, "levels": levels}
+
+    print()
+    for mode, result in results.items():
+        print(f"{mode:8s} carries {result['max_carried_clients']} concurrent connections per worker")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                "route": path, "io": args.io, "io_wait_s": args.io_wait,
+                "gthread_threads": args.threads, "duration_s": args.duration,
+                "p99_limit_ms": limit_ms, "cpu_count": os.cpu_count(),
+            },
+            "modes": results,
+        }, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
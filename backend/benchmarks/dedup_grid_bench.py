@@ -0,0 +1,119 @@
+"""
+Benchmark: duplicate checks per second against the in-memory open complaint
+index at 1M open complaints (no database needed).
+
+Loads dedup.OpenComplaintIndex with --complaints synthetic open complaints
+in BENCH_BBOX, a share of them clustered a few metres from another one in
+the same category, then runs the full duplicate rules (same category within
+SPATIAL_DUP_RADIUS_M, similar photo within IMAGE_DUP_RADIUS_M) for
+--queries reports, half of them next to an existing complaint. --verify of
+the reports are also checked against a linear scan of every complaint.
+
+    python benchmarks/dedup_grid_bench.py [--complaints 1000000] [--queries 20000] [--verify 50]
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import (OpenComplaintIndex, haversine_m, pick_duplicate,
+                   IMAGE_DUP_RADIUS_M, SPATIAL_DUP_RADIUS_M)
+from helper import hash_to_db, hash_from_db
+from seed import CATEGORIES
+from synthetic import random_point
+
+
+def jitter(lat, lon, rng, metres):
+    # ~111 km per degree of latitude; good enough near the equator
+    return lat + rng.uniform(-metres, metres) / 111000, lon + rng.uniform(-metres, metres) / 111000
+
+
+def make_rows(rng, count, cluster_share=0.1):
+    rows = []
+    for complaint_id in range(1, count + 1):
+        if rows and rng.random() < cluster_share:
+            _, lat, lon, category, _, _, _ = rows[rng.randrange(len(rows))]
+            lat, lon = jitter(lat, lon, rng, 15)
+        else:
+            lat, lon = random_point(rng)
+            category = rng.choice(CATEGORIES)
+        image_hash = hash_to_db(rng.getrandbits(64)) if rng.random() < 0.9 else None
+        rows.append((complaint_id, lat, lon, category, image_hash, None, 'pending'))
+    return rows
+
+
+def make_queries(rng, rows, count):
+    queries = []
+    for i in range(count):
+        if i % 2:
+            _, lat, lon, category, image_hash, _, _ = rows[rng.randrange(len(rows))]
+            lat, lon = jitter(lat, lon, rng, 12)
+            value = hash_from_db(image_hash) if image_hash is not None and rng.random() < 0.5 else rng.getrandbits(64)
+        else:
+            lat, lon = random_point(rng)
+            category, value = rng.choice(CATEGORIES), rng.getrandbits(64)
+        queries.append((lat, lon, category, value))
+    return queries
+
+
+def linear_check(rows, lat, lon, category, image_hash):
+    radius = max(IMAGE_DUP_RADIUS_M, SPATIAL_DUP_RADIUS_M)
+    candidates = []
+    for complaint_id, e_lat, e_lon, e_category, e_hash, _, _ in rows:
+        if abs(e_lat - lat) > 0.001:  # ~111 m, cheap pre-filter
+            continue
+        metres = haversine_m(lat, lon, e_lat, e_lon)
+        if metres <= radius and (e_category == category or e_hash is not None):
+            candidates.append((complaint_id, e_category, hash_from_db(e_hash), metres))
+    return pick_duplicate(candidates, category, image_hash)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--complaints', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=20000)
+    parser.add_argument('--verify', type=int, default=50, help="queries also checked by a linear scan")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    rows = make_rows(rng, args.complaints)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    index = OpenComplaintIndex()
+    index.load_rows(rows, synced_at=None)
+    load_s = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    stats = index.stats()
+    print(f"Indexed {stats['open_complaints']} open complaints in {stats['grid_cells']} cells "
+          f"in {load_s:.1f}s (peak RSS +{(rss_after - rss_before) / 1024:.0f} MB)")
+
+    queries = make_queries(rng, rows, args.queries)
+    start = time.perf_counter()
+    found = [
+        pick_duplicate(index.duplicate_candidates(lat, lon, category, value), category, value)
+        for lat, lon, category, value in queries
+    ]
+    elapsed = time.perf_counter() - start
+    duplicates = sum(1 for f in found if f is not None)
+    print(f"{args.queries} checks ({duplicates} duplicates): {args.queries / elapsed:,.0f} checks/s, "
+          f"{elapsed / args.queries * 1e6:.1f} us/check")
+
+    if args.verify:
+        start = time.perf_counter()
+        mismatches = sum(
+            1 for q, f in zip(queries[:args.verify], found) if linear_check(rows, *q) != f
+        )
+        elapsed = time.perf_counter() - start
+        print(f"Linear scan: {elapsed / args.verify * 1e3:.0f} ms/check; "
+              f"{args.verify - mismatches}/{args.verify} results identical to the index")
+        if mismatches:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
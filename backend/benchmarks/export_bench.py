@@ -0,0 +1,96 @@
+"""
+Benchmark: streaming export vs materializing the full result.
+
+"materialize" mirrors the old get_all_complaints: fetchall(), a dict per row
+and one JSON string for the whole response. "export" is the streaming path
+of /api/v1/admin/complaints/export: a named server-side cursor and
+_export_chunks(). Each mode runs in its own process so peak RSS is isolated.
+
+    python benchmarks/seed.py --complaints 1000000     # once
+    python benchmarks/export_bench.py [--format jsonl|csv|geojson]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def run_mode(mode, fmt):
+    from app import ADMIN_COMPLAINT_FIELDS, EXPORT_ITERSIZE, _export_chunks
+    from helper import get_db_connection
+    from listing import ComplaintListing
+
+    listing = ComplaintListing({}, ADMIN_COMPLAINT_FIELDS)
+    if fmt == 'geojson':
+        listing.fields = [f for f in listing.fields if f not in ('latitude', 'longitude')] + ['latitude', 'longitude']
+    query, params = listing.query(paged=False)
+
+    conn = get_db_connection()
+    start = time.perf_counter()
+    rows = out_bytes = 0
+    try:
+        if mode == 'materialize':
+            cur = conn.cursor()
+            cur.execute(query, params)
+            records = cur.fetchall()
+            rows = len(records)
+            body = json.dumps({"data": [listing.format_row(r) for r in records]})
+            out_bytes = len(body.encode())
+        else:
+            cur = conn.cursor(name='export_bench')
+            cur.itersize = EXPORT_ITERSIZE
+            cur.execute(query, params)
+
+            class Counting:
+                def __init__(self, it):
+                    self.it = it
+
+                def __iter__(self):
+                    nonlocal rows
+                    for row in self.it:
+                        rows += 1
+                        yield row
+
+            for chunk in _export_chunks(listing, fmt, Counting(cur)):
+                out_bytes += len(chunk.encode())
+        cur.close()
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(json.dumps({
+        "mode": mode, "format": fmt, "rows": rows, "seconds": round(elapsed, 2),
+        "rows_per_s": round(rows / elapsed) if elapsed else None,
+        "mb_per_s": round(out_bytes / elapsed / 1e6, 1) if elapsed else None,
+        "output_mb": round(out_bytes / 1e6, 1),
+        "peak_rss_mb": round(peak_rss / 1e6, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--format', default='jsonl', choices=['jsonl', 'csv', 'geojson'])
+    parser.add_argument('--mode', choices=['export', 'materialize'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.format)
+        return
+
+    for mode in ('materialize', 'export'):
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--mode', mode, '--format', args.format],
+            cwd=BACKEND_DIR, check=True
+        )
+
+
+if __name__ == '__main__':
+    main()
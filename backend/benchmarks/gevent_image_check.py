@@ -0,0 +1,106 @@
+"""
+Check: the image process pool (imaging.ImageService) under gevent.
+
+SERVER_MODE=async runs the app on gevent workers, which monkey-patch
+threading, select and sockets before the app is imported. The pool's
+management thread and its result waits then run on the gevent hub. This
+script patches the same way, then ingests --images geotagged photos from as
+many concurrent greenlets and checks that:
+
+  1. every photo comes back with its GPS position, the re-encoded image and
+     its renditions
+  2. a heartbeat greenlet keeps ticking while the work runs on the
+     processes, i.e. waiting on the pool does not block the hub (largest gap
+     under --max-gap seconds)
+
+    pip install -r requirements-async.txt
+    python benchmarks/gevent_image_check.py [--images 8] [--processes 2]
+
+tests/test_gevent_imaging.py runs it when gevent is installed. Exits
+non-zero on a failure.
+"""
+if __name__ == '__main__':
+    # Patch first, as the gevent worker does. Not in the image processes:
+    # they import this module as __mp_main__ and, like under gunicorn, run
+    # unpatched
+    from gevent import monkey
+    monkey.patch_all()
+
+import argparse
+import os
+import sys
+import time
+
+import gevent
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from imaging import ImageService
+from synthetic import make_geotagged_jpeg
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=8)
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--size', type=int, nargs=2, default=(1600, 1200), metavar=('W', 'H'))
+    parser.add_argument('--max-gap', type=float, default=0.5, help="longest allowed hub stall, in seconds")
+    args = parser.parse_args()
+
+    points = [(9.5 + i * 0.001, 76.5 + i * 0.001) for i in range(args.images)]
+    photos = [make_geotagged_jpeg(lat, lon, size=tuple(args.size), seed=i) for i, (lat, lon) in enumerate(points)]
+
+    service = ImageService(processes=args.processes, queue_size=args.images, task_timeout=120)
+    try:
+        # Start the processes before measuring: spawning them is not the point
+        service.inspect(photos[0])
+
+        ticks = []
+        running = True
+
+        def heartbeat():
+            while running:
+                ticks.append(time.monotonic())
+                gevent.sleep(0.01)
+
+        def work(photo):
+            gps, image_hash = service.inspect(photo)
+            encoded, extension, content_type, renditions = service.ingest(photo)
+            return gps, image_hash, encoded, renditions
+
+        beat = gevent.spawn(heartbeat)
+        began = time.monotonic()
+        jobs = [gevent.spawn(work, photo) for photo in photos]
+        gevent.joinall(jobs, raise_error=False)
+        elapsed = time.monotonic() - began
+        running = False
+        beat.join()
+    finally:
+        service.shutdown()
+
+    failures = 0
+    for (lat, lon), job in zip(points, jobs):
+        if not job.successful():
+            failures += 1
+            print(f"[FAIL] ({lat}, {lon}): {job.exception!r}")
+            continue
+        gps, image_hash, encoded, renditions = job.value
+        if gps is None or abs(gps[0] - lat) > 1e-4 or abs(gps[1] - lon) > 1e-4:
+            failures += 1
+            print(f"[FAIL] ({lat}, {lon}): GPS read back as {gps}")
+        elif image_hash is None or not encoded or not renditions:
+            failures += 1
+            print(f"[FAIL] ({lat}, {lon}): missing hash, image or renditions")
+
+    gaps = [b - a for a, b in zip(ticks, ticks[1:])]
+    max_gap = max(gaps) if gaps else elapsed
+    print(f"Images:        {args.images} on {args.processes} processes in {elapsed:.2f}s, {failures} failed")
+    print(f"Heartbeat:     {len(ticks)} ticks, largest gap {max_gap * 1000:.0f} ms")
+    if max_gap > args.max_gap:
+        print(f"[FAIL] the gevent hub was blocked for {max_gap:.2f}s (limit {args.max_gap}s)")
+        failures += 1
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Benchmark: image processing throughput, images/sec and images/sec per core.
+
+  baseline  the old pipeline step on one thread: full decode, re-encode at
+            the original resolution (compress_image_to_buffer)
+  encode    imaging.encode_task: draft() reduced decode + downscale to
+            IMAGE_MAX_DIMENSION + re-encode, through ImageService with
+            1..N processes, fed by as many threads as there are processes
+  inspect   imaging.inspect_task (EXIF GPS + perceptual hash), the work on
+            the request path
+  ingest    imaging.ingest_task: encode plus the IMAGE_RENDITION_WIDTHS
+            renditions, what the pipeline runs per upload
+
+Also prints what a feed card downloads and decodes: the full image versus
+the rendition a ~480 px card picks from the srcset.
+
+No database or storage needed.
+
+    python benchmarks/imaging_bench.py [--images 24] [--processes 1 2 4]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper import open_image, compress_image_to_buffer
+from imaging import ImageService, IMAGE_MAX_DIMENSION, IMAGE_RENDITION_WIDTHS, ingest_task, IMAGE_QUALITY, IMAGE_RENDITION_QUALITY
+from synthetic import make_geotagged_jpeg
+
+
+def baseline(uploads):
+    out = io.BytesIO()
+    start = time.perf_counter()
+    for data in uploads:
+        with open_image(data) as image:
+            compress_image_to_buffer(image, out, quality=80)
+    return time.perf_counter() - start
+
+
+def through_service(service, method, uploads):
+    # Warm-up: spawn and initialise every process before timing
+    service.inspect_many(uploads[:service.processes])
+    with ThreadPoolExecutor(max_workers=max(service.processes, 1)) as threads:
+        start = time.perf_counter()
+        list(threads.map(getattr(service, method), uploads))
+        return time.perf_counter() - start
+
+
+def card_payload(uploads):
+    upload_bytes = main_bytes = card_bytes = 0
+    main_pixels = card_pixels = 0
+    card_width = min((w for w in IMAGE_RENDITION_WIDTHS if w >= 480), default=max(IMAGE_RENDITION_WIDTHS))
+    for data in uploads:
+        main, _, _, renditions = ingest_task(data, IMAGE_MAX_DIMENSION, IMAGE_QUALITY,
+                                             IMAGE_RENDITION_WIDTHS, IMAGE_RENDITION_QUALITY)
+        with open_image(main) as image:
+            main_pixels += image.width * image.height
+        # The browser takes the first <source> type it supports; count WebP
+        width, height, _, _, body = next(
+            r for r in renditions if r[0] <= card_width and r[3] == 'image/webp'
+        )
+        upload_bytes += len(data)
+        main_bytes += len(main)
+        card_bytes += len(body)
+        card_pixels += width * height
+    n = len(uploads)
+    print(f"\nFeed card (~{card_width}px): full image {main_bytes / n / 1024:.0f} KiB / {main_pixels / n / 1e6:.1f} MP, "
+          f"rendition {card_bytes / n / 1024:.0f} KiB / {card_pixels / n / 1e6:.2f} MP "
+          f"({main_bytes / card_bytes:.0f}x fewer bytes, {main_pixels / card_pixels:.0f}x fewer pixels); "
+          f"upload was {upload_bytes / n / 1024:.0f} KiB")
+
+
+def report(name, cores, count, elapsed):
+    rate = count / elapsed
+    print(f"{name:26s} {rate:8.2f} images/s  {rate / cores:8.2f} images/s/core")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=24)
+    parser.add_argument('--size', type=int, nargs=2, default=(4032, 3024), metavar=('W', 'H'))
+    parser.add_argument('--processes', type=int, nargs='+',
+                        default=sorted({1, 2, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    print(f"{args.images} geotagged {args.size[0]}x{args.size[1]} JPEGs, "
+          f"IMAGE_MAX_DIMENSION={IMAGE_MAX_DIMENSION}, {os.cpu_count()} CPUs")
+    uploads = [make_geotagged_jpeg(9.5, 76.5, size=tuple(args.size), seed=i) for i in range(args.images)]
+
+    report("baseline (1 thread)", 1, args.images, baseline(uploads))
+    for processes in args.processes:
+        service = ImageService(processes=processes, queue_size=processes * 4)
+        report(f"encode ({processes} proc)", processes, args.images, through_service(service, 'encode', uploads))
+        report(f"inspect ({processes} proc)", processes, args.images, through_service(service, 'inspect', uploads))
+        report(f"ingest ({processes} proc)", processes, args.images, through_service(service, 'ingest', uploads))
+        service.shutdown()
+
+    card_payload(uploads[:min(len(uploads), 8)])
+
+
+if __name__ == '__main__':
+    main()
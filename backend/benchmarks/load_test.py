@@ -0,0 +1,465 @@
+"""
+Load test: throughput and p50/p95/p99 latency per route for a realistic
+request mix, written to a JSON file that can be diffed between commits.
+
+Starts the API in a subprocess (a threaded Werkzeug server, or gunicorn with
+--server gunicorn, in the SERVER_MODE set in the environment) with STORAGE_BACKEND=local pointed at a temporary folder,
+so uploads never reach Supabase Storage, against the database configured in
+.env. Use --url to drive a server that is already running instead.
+
+The database must be a disposable one marked with
+`ALTER DATABASE <name> SET civicsnap.disposable = 'on'` (see seed.py); the
+test refuses to run otherwise, with --url too (the server is assumed to use
+the same database). Votes only go to seeded "bench-" complaints, with
+"bench-" voter ids, so --cleanup / seed.py --cleanup removes them all.
+
+Seed the database first (or pass --seed-wards / --seed-complaints):
+
+    python benchmarks/seed.py --wards 8 --complaints 1000000
+    python benchmarks/load_test.py --concurrency 16 --duration 60 --output load.json
+    python benchmarks/load_test.py --output load-new.json --compare load.json
+    python benchmarks/seed.py --cleanup
+
+Default mix (weights, --mix route=weight,...):
+  ward    GET /api/v1/complaints/ward at a random point          50
+  wards   GET /api/v1/wards at a random zoom and viewport          20
+  admin   GET /api/v1/admin/complaints (needs an admin profile)   10
+  vote    POST /api/v1/complaints/<id>/vote on a seeded
+          complaint, fresh voter id                                 15
+  report  POST /api/v1/report, geotagged photo at a random point   5
+
+Reports reuse --report-images pre-generated photos; once they run out the
+same photo and location come back as duplicates (409), which is counted as a
+success like the ward feed's 404 outside every ward.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit, urlencode
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from seed import BENCH_BBOX, BENCH_PHONE_PREFIX, CATEGORIES, require_disposable_database
+from synthetic import make_geotagged_jpeg, random_point
+
+DEFAULT_MIX = "ward=50,wards=20,admin=10,vote=15,report=5"
+# Responses that are a normal outcome of the route, not a failure
+EXPECTED_STATUS = {"ward": {404}, "report": {409}, "vote": {404}}
+
+
+# ---- server ----
+
+def serve(port):
+    """Entry point of the server subprocess (--serve PORT)."""
+    import logging
+    import signal
+    from werkzeug.serving import make_server
+    from app import app
+    from imaging import image_service
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    # SIGTERM ends serve_forever() so the image processes are shut down too
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    try:
+        server.serve_forever()
+    finally:
+        image_service.shutdown()
+
+
+def start_server(args, port, storage_dir):
+    env = dict(os.environ, STORAGE_BACKEND='local', LOCAL_STORAGE_DIR=storage_dir)
+    if args.server == 'gunicorn':
+        # gunicorn.conf.py picks the worker class from SERVER_MODE (sync / async)
+        command = ['gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(args.workers), '--threads', str(args.threads),
+                   '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app']
+    else:
+        command = [sys.executable, os.path.abspath(__file__), '--serve', str(port)]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("Server did not come up within 60s")
+
+
+def free_port():
+    import socket
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+# ---- requests ----
+
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content_type, data) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode() + data + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class Workload:
+    """Builds the next request for each route: (method, path, body, headers)."""
+
+    def __init__(self, args, rng):
+        self.args = args
+        self.rng = rng
+        self.admin_id = args.admin_id
+        self.complaint_ids = []
+        self.photos = []
+        self._photo_index = itertools.count()
+
+    def prepare(self, host, port, routes):
+        rng = self.rng
+        if 'report' in routes:
+            print(f"Generating {self.args.report_images} geotagged {self.args.image_size[0]}x{self.args.image_size[1]} photos...")
+            for i in range(self.args.report_images):
+                lat, lon = random_point(rng, BENCH_BBOX)
+                self.photos.append(make_geotagged_jpeg(lat, lon, size=tuple(self.args.image_size), quality=85, seed=i))
+
+        if 'vote' in routes:
+            # Vote targets: seeded complaints only, never real ones
+            self.complaint_ids = find_bench_complaints(2000)
+            if not self.complaint_ids:
+                print("No seeded complaints found; the vote route is disabled (seed first)")
+
+        if 'admin' in routes and self.admin_id is None:
+            self.admin_id = find_admin_id()
+            if self.admin_id is None:
+                print("No admin profile found; the admin route is disabled (pass --admin-id)")
+
+    def available(self, route):
+        if route == 'vote':
+            return bool(self.complaint_ids)
+        if route == 'admin':
+            return self.admin_id is not None
+        return True
+
+    def build(self, route, rng):
+        if route == 'ward':
+            lat, lon = random_point(rng, BENCH_BBOX)
+            return 'GET', '/api/v1/complaints/ward?' + urlencode({"lat": lat, "lon": lon, "limit": 20}), None, {}
+        if route == 'wards':
+            zoom = rng.randint(10, 16)
+            lat, lon = random_point(rng, BENCH_BBOX)
+            span = 360 / 2 ** zoom * 4
+            bbox = f"{lon - span:.5f},{lat - span:.5f},{lon + span:.5f},{lat + span:.5f}"
+            return 'GET', '/api/v1/wards?' + urlencode({"zoom": zoom, "bbox": bbox}), None, {}
+        if route == 'admin':
+            return 'GET', '/api/v1/admin/complaints?' + urlencode({"user_id": self.admin_id, "limit": 50}), None, {}
+        if route == 'vote':
+            body = json.dumps({"voter_id": f"{BENCH_PHONE_PREFIX}voter-{uuid.uuid4().hex}"}).encode()
+            issue_id = rng.choice(self.complaint_ids)
+            return 'POST', f'/api/v1/complaints/{issue_id}/vote', body, {"Content-Type": "application/json"}
+        if route == 'report':
+            photo = self.photos[next(self._photo_index) % len(self.photos)]
+            body, content_type = multipart(
+                {"category": rng.choice(CATEGORIES), "description": "Load test report",
+                 "phone": f"{BENCH_PHONE_PREFIX}load"},
+                {"image": ("photo.jpg", "image/jpeg", photo)}
+            )
+            return 'POST', '/api/v1/report', body, {"Content-Type": content_type}
+        raise ValueError(route)
+
+
+def with_cursor(fn):
+    """Runs fn(cur) on a database connection and commits."""
+    from helper import get_db_connection
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        result = fn(cur)
+        conn.commit()
+        return result
+    finally:
+        cur.close()
+        conn.close()
+
+
+def find_bench_complaints(limit):
+    def query(cur):
+        cur.execute("SELECT id FROM complaints WHERE phone_number LIKE %s LIMIT %s;",
+                    (BENCH_PHONE_PREFIX + '%', limit))
+        return [row[0] for row in cur.fetchall()]
+    return with_cursor(query)
+
+
+def find_admin_id():
+    def query(cur):
+        cur.execute("SELECT id FROM public.profiles WHERE role = 'admin' LIMIT 1;")
+        row = cur.fetchone()
+        return str(row[0]) if row else None
+    return with_cursor(query)
+
+
+def seed_database(args):
+    import seed
+
+    def run_seed(cur):
+        if args.seed_wards:
+            seed.seed_wards(cur, args.seed_wards)
+        if args.seed_complaints:
+            seed.seed_complaints(cur, args.seed_complaints)
+    with_cursor(run_seed)
+    with_cursor(lambda cur: cur.execute("ANALYZE complaints;"))
+
+
+# ---- driver ----
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(int(round(p / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def run(args, host, port, workload):
+    routes, weights = zip(*[(r, w) for r, w in args.mix.items() if w > 0 and workload.available(r)])
+    samples = {route: [] for route in routes}  # (latency seconds, status) after warm-up
+    lock = threading.Lock()
+    start = time.monotonic()
+    measure_from = start + args.warmup
+    stop_at = measure_from + args.duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        connection = http.client.HTTPConnection(host, port, timeout=args.timeout)
+        local = {route: [] for route in routes}
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                break
+            route = rng.choices(routes, weights)[0]
+            method, path, body, headers = workload.build(route, rng)
+            began = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                status = 0
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=args.timeout)
+            elapsed = time.perf_counter() - began
+            if now >= measure_from:
+                local[route].append((elapsed, status))
+        connection.close()
+        with lock:
+            for route, values in local.items():
+                samples[route].extend(values)
+
+    threads = [threading.Thread(target=worker, args=(args.seed + i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarize(samples, duration):
+    routes = {}
+    everything = []
+    for route, values in sorted(samples.items()):
+        latencies = sorted(v[0] for v in values)
+        everything.extend(latencies)
+        statuses = {}
+        errors = 0
+        for _, status in values:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if not (200 <= status < 400 or status in EXPECTED_STATUS.get(route, ())):
+                errors += 1
+        routes[route] = {
+            "requests": len(values),
+            "errors": errors,
+            "throughput_rps": round(len(values) / duration, 2),
+            **latency_summary(latencies),
+            "status": statuses,
+        }
+    everything.sort()
+    total = {
+        "requests": len(everything),
+        "errors": sum(r["errors"] for r in routes.values()),
+        "throughput_rps": round(len(everything) / duration, 2),
+        **latency_summary(everything),
+    }
+    return routes, total
+
+
+def latency_summary(latencies):
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+    return {
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "max_ms": ms(latencies[-1]) if latencies else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(routes, total, baseline=None):
+    header = f"{'route':8s} {'req':>7s} {'err':>5s} {'req/s':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}"
+    print(header)
+    for name, r in list(routes.items()) + [("total", total)]:
+        line = (f"{name:8s} {r['requests']:7d} {r['errors']:5d} {r['throughput_rps']:9.1f} "
+                f"{_fmt(r['p50_ms'])} {_fmt(r['p95_ms'])} {_fmt(r['p99_ms'])}")
+        if baseline is not None:
+            old = baseline["total"] if name == "total" else baseline["routes"].get(name)
+            if old:
+                line += "   " + "  ".join(
+                    f"{key.split('_')[0]} {_change(old.get(key), r.get(key))}"
+                    for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+                )
+        print(line)
+
+
+def _fmt(value):
+    return f"{value:9.2f}" if value is not None else f"{'-':>9s}"
+
+
+def _change(old, new):
+    if not old or new is None:
+        return "   n/a"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        route, _, weight = part.partition('=')
+        if route.strip() not in ('ward', 'wards', 'admin', 'vote', 'report'):
+            raise argparse.ArgumentTypeError(f"unknown route {route!r}")
+        mix[route.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="drive an already running server instead of starting one")
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn'), default='werkzeug')
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument('--threads', type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument('--concurrency', type=int, default=16, help="client threads (closed loop)")
+    parser.add_argument('--duration', type=float, default=30, help="measured seconds")
+    parser.add_argument('--warmup', type=float, default=5, help="unmeasured seconds before measuring")
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument('--admin-id', help="profile id for the admin route (default: first admin found)")
+    parser.add_argument('--report-images', type=int, default=100)
+    parser.add_argument('--image-size', type=int, nargs=2, default=(2016, 1512), metavar=('W', 'H'))
+    parser.add_argument('--seed-wards', type=int, default=0, help="seed N x N wards first (see seed.py)")
+    parser.add_argument('--seed-complaints', type=int, default=0, help="seed this many complaints first")
+    parser.add_argument('--cleanup', action='store_true', help="remove all synthetic rows afterwards")
+    parser.add_argument('--seed', type=int, default=1, help="random seed")
+    parser.add_argument('--output', default='load_results.json')
+    parser.add_argument('--compare', help="previous --output file to print changes against")
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    with_cursor(require_disposable_database)
+    if args.seed_wards or args.seed_complaints:
+        seed_database(args)
+
+    process = storage_dir = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        host, port = '127.0.0.1', free_port()
+        storage_dir = tempfile.mkdtemp(prefix='civicsnap-load-')
+        process = start_server(args, port, storage_dir)
+
+    try:
+        workload = Workload(args, random.Random(args.seed))
+        workload.prepare(host, port, [route for route, weight in args.mix.items() if weight > 0])
+        print(f"Running {args.concurrency} clients for {args.warmup:g}s warm-up + {args.duration:g}s...")
+        samples = run(args, host, port, workload)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+            shutil.rmtree(storage_dir, ignore_errors=True)
+
+    routes, total = summarize(samples, args.duration)
+    if args.url:
+        server = args.url
+    elif args.server == 'gunicorn':
+        server = f"gunicorn {os.getenv('SERVER_MODE', 'sync')} (workers={args.workers}, threads={args.threads})"
+    else:
+        server = "werkzeug (threaded)"
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            "server": server,
+            "cpu_count": os.cpu_count(),
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "mix": args.mix,
+            "seed": args.seed,
+        },
+        "routes": routes,
+        "total": total,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} (commit {baseline['meta'].get('commit')}):")
+    print_table(routes, total, baseline)
+    print(f"\nWrote {args.output}")
+
+    if args.cleanup:
+        import seed
+        complaints, wards = with_cursor(seed.cleanup)
+        print(f"Removed {complaints} complaints and {wards} wards")
+
+
+if __name__ == '__main__':
+    main()
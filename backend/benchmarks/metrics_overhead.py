@@ -0,0 +1,111 @@
+"""
+Benchmark: cost of the request instrumentation in metrics.py.
+
+  primitives  one histogram observe(), one span(), one statement label
+              lookup (what TimedCursor adds per query)
+  hooks       the before/after_request hooks alone, run on one request
+              context: what metrics.init_app() adds to every request
+  requests    GET / through the Flask test client on a bare app versus the
+              same app with the hooks (text and JSON logging), for scale
+
+No database needed.
+
+    python benchmarks/metrics_overhead.py [--requests 2000] [--rounds 5]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+
+import metrics
+
+
+def per_call(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+
+def primitives(n):
+    histogram = metrics.Histogram("bench_seconds", "bench", ("route",))
+    sql = "SELECT id, category FROM complaints WHERE ward_id = %s ORDER BY created_at DESC LIMIT %s;"
+
+    def timed_block():
+        with metrics.span("bench"):
+            pass
+
+    print(f"observe()          {per_call(lambda: histogram.observe(0.004, '/api'), n) * 1e6:7.2f} us")
+    print(f"span()             {per_call(timed_block, n) * 1e6:7.2f} us")
+    print(f"observe_query()    {per_call(lambda: metrics.observe_query(sql, 0.002), n) * 1e6:7.2f} us")
+
+
+def make_app(instrumented):
+    app = Flask(__name__)
+
+    @app.route('/')
+    def health_check():
+        return jsonify({"status": "Online"}), 200
+
+    if instrumented:
+        metrics.init_app(app)
+    return app
+
+
+def per_hooks(app, n, rounds):
+    with app.test_request_context('/'):
+        response = app.make_response(({"status": "Online"}, 200))
+
+        def hooks():
+            app.preprocess_request()
+            app.process_response(response)
+        return min(per_call(hooks, n) for _ in range(rounds))
+
+
+def per_request(app, n, rounds):
+    client = app.test_client()
+    for _ in range(200):
+        client.get('/')
+    # Best of several rounds: the test client is noisy on a shared host
+    return min(per_call(lambda: client.get('/'), n) for _ in range(rounds))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    primitives(100000)
+    print()
+    results = []
+    bare = make_app(False)
+    instrumented = make_app(True)
+    results.append(("bare app", per_hooks(bare, args.requests, args.rounds), per_request(bare, args.requests, args.rounds)))
+    results.append(("metrics (LOG_FORMAT=text)", per_hooks(instrumented, args.requests, args.rounds),
+                    per_request(instrumented, args.requests, args.rounds)))
+
+    # JSON request lines, formatted and written to /dev/null so the terminal is not the cost
+    metrics.LOG_FORMAT = 'json'
+    handler = logging.StreamHandler(open(os.devnull, 'w'))
+    handler.setFormatter(metrics.JsonFormatter())
+    metrics.log.addHandler(handler)
+    metrics.log.setLevel(logging.INFO)
+    metrics.log.propagate = False
+    results.append(("metrics (LOG_FORMAT=json)", per_hooks(instrumented, args.requests, args.rounds),
+                    per_request(instrumented, args.requests, args.rounds)))
+
+    print(f"{'':28s} {'hooks':>10s} {'request':>12s}")
+    for label, hooks, request in results:
+        print(f"{label:28s} {hooks * 1e6:7.1f} us {request * 1e6:9.1f} us")
+    print(f"\nadded per request: {(results[1][1] - results[0][1]) * 1e6:.1f} us (text), "
+          f"{(results[2][1] - results[0][1]) * 1e6:.1f} us (json)")
+
+
+if __name__ == '__main__':
+    main()
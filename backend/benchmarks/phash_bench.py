@@ -0,0 +1,134 @@
+"""
+Benchmark: near-duplicate photo lookup over a synthetic corpus of hashes.
+
+Builds dedup.OpenComplaintIndex from N synthetic open complaints (no
+database needed) and compares "similar photo within IMAGE_DUP_RADIUS_M"
+lookups through duplicate_candidates (the call report_issue makes) against
+a linear scan of every hash. Part
+of the corpus is near-copies of other entries (a few flipped bits, a few
+metres away), so the recall check exercises real matches.
+
+Also sanity-checks image_dhash on real JPEGs: a recompressed, resized copy
+of a photo should land within PHASH_MAX_DISTANCE bits, an unrelated photo
+far outside it.
+
+    python benchmarks/phash_bench.py [--hashes 50000] [--queries 2000]
+"""
+import argparse
+import io
+import random
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from helper import open_image, image_dhash, hamming_distance, hash_to_db
+from dedup import OpenComplaintIndex, haversine_m, PHASH_MAX_DISTANCE, IMAGE_DUP_RADIUS_M
+from synthetic import make_geotagged_jpeg, random_point
+from seed import CATEGORIES
+
+
+def flip_bits(value, rng, count):
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+def jitter(lat, lon, rng, metres):
+    # ~111 km per degree of latitude; good enough near the equator
+    return lat + rng.uniform(-metres, metres) / 111000, lon + rng.uniform(-metres, metres) / 111000
+
+
+def make_corpus(rng, count, near_copy_share=0.2):
+    rows = []
+    for complaint_id in range(1, count + 1):
+        if rows and rng.random() < near_copy_share:
+            _, lat, lon, _, base_hash, _, _ = rng.choice(rows)
+            value = flip_bits(base_hash & ((1 << 64) - 1), rng, rng.randrange(0, PHASH_MAX_DISTANCE + 1))
+            lat, lon = jitter(lat, lon, rng, 30)
+        else:
+            value = rng.getrandbits(64)
+            lat, lon = random_point(rng)
+        rows.append((complaint_id, lat, lon, rng.choice(CATEGORIES), hash_to_db(value), None, 'pending'))
+    return rows
+
+
+def linear_scan(entries, image_hash, lat, lon):
+    matches = []
+    for complaint_id, e_lat, e_lon, _, e_hash in entries:
+        bits = hamming_distance(e_hash, image_hash)
+        if bits <= PHASH_MAX_DISTANCE:
+            metres = haversine_m(lat, lon, e_lat, e_lon)
+            if metres <= IMAGE_DUP_RADIUS_M:
+                matches.append(complaint_id)
+    return matches
+
+
+def check_real_images():
+    photo = make_geotagged_jpeg(9.5, 76.5, size=(2000, 1500), seed=1)
+    other = make_geotagged_jpeg(9.5, 76.5, size=(2000, 1500), seed=2)
+    with open_image(photo) as image:
+        resized = image.resize((800, 600))
+        out = io.BytesIO()
+        resized.save(out, format='JPEG', quality=60)
+    hashes = {}
+    for name, data in (('original', photo), ('recompressed', out.getvalue()), ('unrelated', other)):
+        with Image.open(io.BytesIO(data)) as image:
+            hashes[name] = image_dhash(image)
+    print(f"dHash distance, recompressed copy: {hamming_distance(hashes['original'], hashes['recompressed'])} bits")
+    print(f"dHash distance, unrelated photo:   {hamming_distance(hashes['original'], hashes['unrelated'])} bits")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hashes', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    check_real_images()
+
+    rows = make_corpus(rng, args.hashes)
+    start = time.perf_counter()
+    index = OpenComplaintIndex()
+    index.load_rows(rows, synced_at=None)
+    print(f"\nIndexed {args.hashes} hashes in {time.perf_counter() - start:.2f}s")
+
+    entries = [(r[0], r[1], r[2], r[3], r[4] & ((1 << 64) - 1)) for r in rows]
+    # Half the queries are near-copies of indexed photos, half are new photos
+    queries = []
+    for i in range(args.queries):
+        if i % 2:
+            complaint_id, lat, lon, _, value = rng.choice(entries)
+            lat, lon = jitter(lat, lon, rng, 10)
+            queries.append((flip_bits(value, rng, rng.randrange(0, 6)), lat, lon))
+        else:
+            lat, lon = random_point(rng)
+            queries.append((rng.getrandbits(64), lat, lon))
+
+    start = time.perf_counter()
+    expected = [sorted(linear_scan(entries, *q)) for q in queries]
+    linear_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # No category: the same-category rule finds nothing, leaving the photo rule
+    found = [sorted(c[0] for c in index.duplicate_candidates(lat, lon, None, value))
+             for value, lat, lon in queries]
+    index_s = time.perf_counter() - start
+
+    hits = sum(1 for e in expected if e)
+    recall_ok = expected == found
+    print(f"Queries: {args.queries} ({hits} with a duplicate)")
+    print(f"linear scan  {linear_s / args.queries * 1e3:8.3f} ms/query")
+    print(f"grid index   {index_s / args.queries * 1e3:8.3f} ms/query  ({linear_s / index_s:.0f}x)")
+    print(f"Results identical to linear scan: {recall_ok}")
+    if not recall_ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
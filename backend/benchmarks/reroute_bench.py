@@ -0,0 +1,130 @@
+"""
+Benchmark: re-routing a ward's complaints in one statement (the previous
+delete_ward) versus the batched reroute jobs (migration 0011, reroute.py).
+
+Everything runs in one transaction that is rolled back at the end: it adds
+two adjacent square wards in an empty area and --complaints complaints in
+the first one, then
+  * deletes the first ward the old way, timing the single
+    UPDATE complaints SET ward_id = NULL over all its complaints (the time
+    every one of those rows stays locked),
+  * carves a new ward out of the eastern half of the first one and runs its
+    ward_created job, then deletes it and runs its ward_deleted job, batch
+    by batch through RerouteWorker._advance, reporting the slowest batch
+    (the longest any row is locked) and checking every complaint ends up in
+    the ward that contains it.
+
+    python benchmarks/reroute_bench.py [--complaints 200000] [--batch 1000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper import get_db_connection
+from reroute import RerouteWorker, enqueue_job
+
+# Open ocean, away from any real ward
+BENCH_AREA = (-41.0, -41.0, -40.0, -40.5)
+
+
+def square(minx, miny, maxx, maxy):
+    return f"POLYGON(({minx} {miny}, {maxx} {miny}, {maxx} {maxy}, {minx} {maxy}, {minx} {miny}))"
+
+
+def add_ward(cur, name, wkt):
+    cur.execute("INSERT INTO wards (name, geom) VALUES (%s, ST_GeomFromText(%s, 4326)) RETURNING id;", (name, wkt))
+    return cur.fetchone()[0]
+
+
+def run_job(cur, worker, kind, ward_id):
+    job_id = enqueue_job(cur, kind, ward_id)
+    slowest = total = 0.0
+    batches = 0
+    while True:
+        cur.execute("SELECT id, kind, ward_id, status, part_cursor, complaint_cursor, total, attempts "
+                    "FROM reroute_jobs WHERE id = %s;", (job_id,))
+        job = cur.fetchone()
+        if job[3] == 'done':
+            break
+        began = time.perf_counter()
+        worker._advance(cur, *job)
+        took = time.perf_counter() - began
+        slowest, total, batches = max(slowest, took), total + took, batches + 1
+    cur.execute("SELECT moved FROM reroute_jobs WHERE id = %s;", (job_id,))
+    moved = cur.fetchone()[0]
+    return batches, moved, total, slowest
+
+
+def misrouted(cur, complaint_ids_sql):
+    cur.execute(f"""
+        SELECT count(*) FROM complaints c
+        WHERE c.id IN ({complaint_ids_sql})
+        AND c.ward_id IS DISTINCT FROM (
+            SELECT min(w.id) FROM wards w WHERE w.deleted_at IS NULL AND ST_Contains(w.geom, c.geom)
+        );
+    """)
+    return cur.fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--complaints', type=int, default=200000)
+    parser.add_argument('--batch', type=int, default=1000)
+    args = parser.parse_args()
+
+    minx, miny, maxx, maxy = BENCH_AREA
+    midx = (minx + maxx) / 2
+    worker = RerouteWorker(batch_size=args.batch, enabled=False)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        west = add_ward(cur, "Bench Reroute West", square(minx, miny, midx, maxy))
+        add_ward(cur, "Bench Reroute East", square(midx, miny, maxx, maxy))
+        began = time.perf_counter()
+        cur.execute("""
+            INSERT INTO complaints (description, category, status, phone_number, geom, ward_id)
+            SELECT 'Reroute bench ' || g, 'Pothole', 'pending', 'bench-reroute',
+                   ST_SetSRID(ST_MakePoint(%s + random() * %s + g * 0, %s + random() * %s), 4326), %s
+            FROM generate_series(1, %s) g;
+        """, (minx, midx - minx, miny, maxy - miny, west, args.complaints))
+        cur.execute("ANALYZE complaints;")
+        print(f"Seeded {args.complaints} complaints in {time.perf_counter() - began:.1f}s")
+        bench_ids = "SELECT id FROM complaints WHERE phone_number = 'bench-reroute'"
+
+        cur.execute("SAVEPOINT legacy;")
+        began = time.perf_counter()
+        cur.execute("UPDATE complaints SET ward_id = NULL WHERE ward_id = %s;", (west,))
+        cur.execute("DELETE FROM wards WHERE id = %s;", (west,))
+        legacy = time.perf_counter() - began
+        print(f"Single-statement delete   {legacy * 1000:9.1f} ms with all {args.complaints} rows locked")
+        cur.execute("ROLLBACK TO SAVEPOINT legacy;")
+
+        # The new ward takes over the eastern half of the west one
+        middle = add_ward(cur, "Bench Reroute Middle", square(midx - (midx - minx) / 2, miny, midx, maxy))
+        cur.execute("UPDATE wards SET geom = ST_Difference(geom, (SELECT geom FROM wards WHERE id = %s)) "
+                    "WHERE id = %s;", (middle, west))
+        batches, moved, total, slowest = run_job(cur, worker, 'ward_created', middle)
+        print(f"Batched ward_created      {total * 1000:9.1f} ms in {batches} batches, {moved} moved, "
+              f"slowest batch {slowest * 1000:.1f} ms")
+
+        cur.execute("UPDATE wards SET deleted_at = CURRENT_TIMESTAMP WHERE id = %s;", (middle,))
+        cur.execute("DELETE FROM ward_parts WHERE ward_id = %s;", (middle,))
+        batches, moved, total, slowest = run_job(cur, worker, 'ward_deleted', middle)
+        print(f"Batched ward_deleted      {total * 1000:9.1f} ms in {batches} batches, {moved} moved, "
+              f"slowest batch {slowest * 1000:.1f} ms")
+
+        wrong = misrouted(cur, bench_ids)
+        print(f"Complaints in the wrong ward afterwards: {wrong}")
+        return 0 if wrong == 0 else 1
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
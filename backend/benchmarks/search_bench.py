@@ -0,0 +1,121 @@
+"""
+Benchmark: complaint search latency (search.py, migration 0012) on a large
+synthetic corpus.
+
+Runs each query class --runs times through ComplaintSearch, exactly as the
+search endpoints build it, and reports p50/p95/max latency and the number of
+matches of the first page against --target-ms (p95):
+
+  rare       a specific phrase ("collapsed manhole cover library")
+  common     one frequent word ("pothole")
+  typo       misspelled words only the trigram index can match
+  near       a common word ranked by distance from a point, within 2 km
+  admin      a common word scoped to a few wards, as for an admin
+  page 2     the second page of the common query, through the cursor
+
+    python benchmarks/seed.py --wards 16 --complaints 3000000     # once
+    python benchmarks/search_bench.py [--runs 30] [--target-ms 150]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper import get_db_connection
+from search import SEARCH_CANDIDATE_LIMIT, ComplaintSearch
+from seed import BENCH_BBOX, BENCH_WARD_PREFIX
+
+FIELDS = ["id", "category", "description", "status", "created_at", "ward_id", "latitude", "longitude",
+          "upvotes", "score", "distance_m"]
+
+QUERIES = {
+    "rare": "collapsed manhole cover library",
+    "common": "pothole",
+    "typo": "flikering stretlight",
+    "near": "garbage",
+    "admin": "leaking water pipe",
+}
+
+
+def run(cur, args, where=None, params=()):
+    search = ComplaintSearch(args, FIELDS)
+    query, values = search.query(where, params)
+    began = time.perf_counter()
+    cur.execute(query, values)
+    rows = cur.fetchall()
+    took = (time.perf_counter() - began) * 1000
+    items, next_cursor = search.page(rows)
+    return took, items, next_cursor
+
+
+def report(label, timings, items, target_ms):
+    p50 = statistics.median(timings)
+    p95 = sorted(timings)[max(0, int(len(timings) * 0.95) - 1)]
+    ok = p95 <= target_ms
+    print(f"[{'OK' if ok else 'SLOW'}] {label:8s} p50 {p50:8.1f} ms   p95 {p95:8.1f} ms   "
+          f"max {max(timings):8.1f} ms   first page {len(items)} results")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=30)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--target-ms', type=float, default=150)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT count(*) FROM complaints;")
+        print(f"Corpus: {cur.fetchone()[0]} complaints, ranking at most {SEARCH_CANDIDATE_LIMIT} matches per query")
+        cur.execute("SELECT id FROM wards WHERE name LIKE %s AND deleted_at IS NULL ORDER BY id;",
+                    (BENCH_WARD_PREFIX + '%',))
+        ward_ids = [row[0] for row in cur.fetchall()]
+
+        minx, miny, maxx, maxy = BENCH_BBOX
+        all_ok = True
+        for label, text in QUERIES.items():
+            timings, items = [], []
+            for _ in range(args.runs):
+                query_args = {"q": text, "limit": str(args.limit)}
+                where, params = None, ()
+                if label == 'near':
+                    query_args.update(lat=str(rng.uniform(miny, maxy)), lon=str(rng.uniform(minx, maxx)),
+                                      radius_m="2000")
+                if label == 'admin':
+                    if not ward_ids:
+                        break
+                    where, params = "c.ward_id = ANY(%s::int[])", (rng.sample(ward_ids, min(3, len(ward_ids))),)
+                took, items, _ = run(cur, query_args, where, params)
+                timings.append(took)
+            if timings:
+                all_ok &= report(label, timings, items, args.target_ms)
+            else:
+                print(f"[SKIP] {label}: no '{BENCH_WARD_PREFIX}' wards (seed.py --wards)")
+
+        _, first, cursor = run(cur, {"q": QUERIES["common"], "limit": str(args.limit)})
+        if cursor:
+            timings = []
+            for _ in range(args.runs):
+                took, items, _ = run(cur, {"q": QUERIES["common"], "limit": str(args.limit), "cursor": cursor})
+                timings.append(took)
+            all_ok &= report("page 2", timings, items, args.target_ms)
+            overlap = {i["id"] for i in first} & {i["id"] for i in items}
+            print(f"Pages overlap: {bool(overlap)}")
+            all_ok &= not overlap
+        return 0 if all_ok else 1
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Seeds synthetic wards and complaints for benchmarks, and removes them again.
+
+All synthetic rows are tagged (ward names start with "Bench Ward", complaint
+phone numbers and voter ids with "bench-") so they can be cleaned up without
+touching real data.
+
+Seeding and the benchmarks that write through the API refuse to run unless
+the database is marked as disposable, so a load test cannot be pointed at
+production by a stray .env:
+
+    ALTER DATABASE <name> SET civicsnap.disposable = 'on';   -- then reconnect
+
+    python benchmarks/seed.py --wards 16 --complaints 1000000
+    python benchmarks/seed.py --cleanup
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper import get_db_connection
+
+BENCH_WARD_PREFIX = 'Bench Ward'
+BENCH_PHONE_PREFIX = 'bench-'
+# Default area for synthetic data: the dummy ward from init.sql
+BENCH_BBOX = (76.0, 9.0, 77.0, 10.0)
+# Custom setting that marks a database as safe for benchmark writes
+DISPOSABLE_SETTING = 'civicsnap.disposable'
+CATEGORIES = ['Pothole', 'Garbage', 'Streetlight', 'Water Leakage', 'Drainage']
+STATUSES = ['pending', 'in_progress', 'resolved', 'rejected']
+# Descriptions are "<problem> <subject> <place>, <detail>", so search
+# benchmarks get a realistic mix of common and rare terms
+PROBLEMS = ['Broken', 'Overflowing', 'Leaking', 'Blocked', 'Not working', 'Damaged', 'Collapsed',
+            'Flickering', 'Missing', 'Flooded', 'Cracked', 'Burnt out']
+SUBJECTS = ['pothole', 'garbage pile', 'streetlight', 'water pipe', 'drain', 'manhole cover', 'footpath',
+            'traffic signal', 'tree branch', 'sewage line', 'bus stop shelter', 'road divider',
+            'public toilet', 'electric pole', 'speed breaker']
+PLACES = ['near the school', 'outside the market', 'next to the temple', 'opposite the hospital',
+          'at the bus stand', 'behind the church', 'on the main road', 'near the railway crossing',
+          'by the park entrance', 'in front of the library', 'near the junction', 'along the canal']
+DETAILS = ['for two weeks', 'since the rain', 'causing accidents', 'children at risk', 'bad smell at night',
+           'traffic jam every morning', 'residents complained', 'vehicles damaged', 'dangerous after dark',
+           'getting worse daily']
+
+
+def require_disposable_database(cur):
+    """Exits unless the connected database is marked disposable (see above)."""
+    cur.execute("SELECT current_database(), current_setting(%s, true);", (DISPOSABLE_SETTING,))
+    name, value = cur.fetchone()
+    if (value or '').lower() not in ('on', 'true', '1'):
+        raise SystemExit(
+            f"Refusing to write benchmark data to database {name!r}: it is not marked disposable.\n"
+            f"Use a throwaway database and run: ALTER DATABASE {name} SET {DISPOSABLE_SETTING} = 'on';"
+        )
+
+
+def seed_wards(cur, grid, bbox=BENCH_BBOX):
+    """Tiles `bbox` with grid x grid square wards. Returns their ids."""
+    minx, miny, maxx, maxy = bbox
+    step_x, step_y = (maxx - minx) / grid, (maxy - miny) / grid
+    ward_ids = []
+    for i in range(grid):
+        for j in range(grid):
+            x0, y0 = minx + i * step_x, miny + j * step_y
+            x1, y1 = x0 + step_x, y0 + step_y
+            wkt = f"POLYGON(({x0} {y0}, {x1} {y0}, {x1} {y1}, {x0} {y1}, {x0} {y0}))"
+            cur.execute(
+                "INSERT INTO wards (name, geom) VALUES (%s, ST_GeomFromText(%s, 4326)) RETURNING id;",
+                (f"{BENCH_WARD_PREFIX} {i}-{j}", wkt)
+            )
+            ward_ids.append(cur.fetchone()[0])
+    return ward_ids
+
+
+def seed_complaints(cur, count, bbox=BENCH_BBOX, batch=100000, phones=10000):
+    """
+    Inserts `count` complaints at random points in `bbox`, routed to whichever
+    ward contains them, spread over the last year.
+    """
+    minx, miny, maxx, maxy = bbox
+    done = 0
+    while done < count:
+        n = min(batch, count - done)
+        cur.execute("""
+            INSERT INTO complaints
+                (image_url, image_status, category, description, status, geom, ward_id, phone_number, created_at, upvotes)
+            SELECT 'https://example.invalid/bench/' || g || '.jpg', 'ready',
+                   (%(categories)s::text[])[1 + g %% cardinality(%(categories)s::text[])],
+                   (%(problems)s::text[])[1 + floor(random() * cardinality(%(problems)s::text[]))::int] || ' ' ||
+                   (%(subjects)s::text[])[1 + floor(random() * cardinality(%(subjects)s::text[]))::int] || ' ' ||
+                   (%(places)s::text[])[1 + floor(random() * cardinality(%(places)s::text[]))::int] || ', ' ||
+                   (%(details)s::text[])[1 + floor(random() * cardinality(%(details)s::text[]))::int] ||
+                   ' (ref ' || g || ')',
+                   (%(statuses)s::text[])[1 + (g / 7) %% cardinality(%(statuses)s::text[])],
+                   p.pt,
+                   (SELECT w.id FROM wards w WHERE ST_Contains(w.geom, p.pt) LIMIT 1),
+                   %(phone)s || (g %% %(phones)s),
+                   now() - (g %% 525600) * interval '1 minute',
+                   g %% 50
+            FROM generate_series(%(start)s, %(end)s) g
+            -- "+ g * 0" correlates the subquery so random() runs per row
+            CROSS JOIN LATERAL (
+                SELECT ST_SetSRID(ST_MakePoint(
+                    %(minx)s + random() * (%(maxx)s - %(minx)s) + g * 0,
+                    %(miny)s + random() * (%(maxy)s - %(miny)s)
+                ), 4326) AS pt
+            ) p;
+        """, {
+            "categories": CATEGORIES, "statuses": STATUSES, "phone": BENCH_PHONE_PREFIX,
+            "problems": PROBLEMS, "subjects": SUBJECTS, "places": PLACES, "details": DETAILS,
+            "phones": phones, "start": done, "end": done + n - 1,
+            "minx": minx, "maxx": maxx, "miny": miny, "maxy": maxy,
+        })
+        done += n
+        print(f"  seeded {done}/{count} complaints")
+
+
+def cleanup(cur):
+    # Benchmark votes on other complaints, and the upvotes they added
+    cur.execute("""
+        WITH removed AS (
+            DELETE FROM complaint_votes WHERE voter_id LIKE %s RETURNING complaint_id
+        )
+        UPDATE complaints c SET upvotes = GREATEST(COALESCE(c.upvotes, 0) - r.n, 0)
+        FROM (SELECT complaint_id, count(*) AS n FROM removed GROUP BY complaint_id) r
+        WHERE c.id = r.complaint_id;
+    """, (BENCH_PHONE_PREFIX + '%',))
+    cur.execute("DELETE FROM complaints WHERE phone_number LIKE %s;", (BENCH_PHONE_PREFIX + '%',))
+    complaints = cur.rowcount
+    cur.execute("UPDATE complaints SET ward_id = NULL WHERE ward_id IN (SELECT id FROM wards WHERE name LIKE %s);",
+                (BENCH_WARD_PREFIX + '%',))
+    cur.execute("DELETE FROM wards WHERE name LIKE %s;", (BENCH_WARD_PREFIX + '%',))
+    return complaints, cur.rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--wards', type=int, default=0, help="grid size: creates N x N wards")
+    parser.add_argument('--complaints', type=int, default=0)
+    parser.add_argument('--cleanup', action='store_true')
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        if args.wards or args.complaints:
+            require_disposable_database(cur)
+        start = time.perf_counter()
+        if args.cleanup:
+            complaints, wards = cleanup(cur)
+            print(f"Removed {complaints} complaints and {wards} wards")
+        if args.wards:
+            print(f"Created {len(seed_wards(cur, args.wards))} wards")
+        if args.complaints:
+            seed_complaints(cur, args.complaints)
+        conn.commit()
+        cur.execute("ANALYZE complaints;")
+        conn.commit()
+        print(f"Done in {time.perf_counter() - start:.1f}s")
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
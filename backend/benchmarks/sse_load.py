@@ -0,0 +1,196 @@
+"""
+Load test: thousands of idle live-update streams on one worker (events.py).
+
+Drives a server that is already running, best with a single async worker so
+every stream lands on the same process:
+
+    SERVER_MODE=async WEB_WORKERS=1 ASYNC_WORKER_CONNECTIONS=10000 gunicorn -c gunicorn.conf.py app:app
+    python benchmarks/sse_load.py --url http://localhost:5000 --ward-id 1 --complaint-id 42 \\
+        [--subscribers 5000] [--idle 60] [--events 20] [--server-pid <worker pid>]
+
+Steps:
+  1. open --subscribers streams on /api/v1/complaints/stream?ward_id=..
+     (--connect-rate per second) and keep them idle for --idle seconds,
+     counting keep-alives and dropped streams
+  2. flip the status of --complaint-id (in that ward) --events times
+     through PATCH /api/v1/admin/complaints/<id>/status, and measure how
+     long each event takes to reach every stream (p50/p95/max)
+  3. close one stream, change the status once more, reconnect it with
+     Last-Event-ID and check the missed event is replayed
+The worker's subscriber count comes from /metrics; with --server-pid the
+worker's resident memory is reported before and after the streams open.
+Needs ulimit -n above --subscribers on both sides. Exits non-zero when a
+stream dropped, missed an event, or the resume check failed.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+
+def rss_mb(pid):
+    if not pid:
+        return None
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def metric(url, name, key):
+    with urllib.request.urlopen(f"{url}/metrics", timeout=10) as response:
+        for line in response.read().decode().splitlines():
+            if line.startswith(f'{name}{{key="{key}"}}'):
+                return float(line.split()[-1])
+    return None
+
+
+def set_status(url, complaint_id, status):
+    request = urllib.request.Request(
+        f"{url}/api/v1/admin/complaints/{complaint_id}/status", method='PATCH',
+        data=json.dumps({"status": status}).encode(), headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        response.read()
+
+
+class Stream:
+    """One SSE connection, parsed just enough to timestamp events by id."""
+
+    def __init__(self):
+        self.received = {}      # event id -> monotonic arrival time
+        self.keep_alives = 0
+        self.last_id = None
+        self.dropped = False
+        self.writer = None
+
+    async def open(self, host, port, path, last_id=None):
+        reader, self.writer = await asyncio.open_connection(host, port)
+        # HTTP/1.0: the body arrives unchunked, one SSE line per line
+        headers = f"GET {path} HTTP/1.0\r\nHost: {host}\r\nAccept: text/event-stream\r\n"
+        if last_id is not None:
+            headers += f"Last-Event-ID: {last_id}\r\n"
+        self.writer.write((headers + "\r\n").encode())
+        await self.writer.drain()
+        status = await reader.readline()
+        if b" 200 " not in status:
+            raise RuntimeError(status.decode().strip())
+        while (await reader.readline()) not in (b"\r\n", b""):
+            pass
+        return reader
+
+    async def read(self, reader):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                text = line.decode().strip()
+                if text.startswith("id: "):
+                    self.last_id = int(text[4:])
+                    self.received.setdefault(self.last_id, time.monotonic())
+                elif text.startswith(": keep-alive"):
+                    self.keep_alives += 1
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        self.dropped = True
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def run(args):
+    split = urlsplit(args.url)
+    host, port = split.hostname, split.port or 80
+    path = f"/api/v1/complaints/stream?ward_id={args.ward_id}"
+
+    base_rss = rss_mb(args.server_pid)
+    streams, tasks = [], []
+    began = time.monotonic()
+    for i in range(args.subscribers):
+        stream = Stream()
+        reader = await stream.open(host, port, path)
+        streams.append(stream)
+        tasks.append(asyncio.ensure_future(stream.read(reader)))
+        if args.connect_rate:
+            await asyncio.sleep(max(0.0, began + (i + 1) / args.connect_rate - time.monotonic()))
+    print(f"Opened {len(streams)} streams in {time.monotonic() - began:.1f}s")
+
+    await asyncio.sleep(args.idle)
+    loop = asyncio.get_running_loop()
+    subscribers = await loop.run_in_executor(None, metric, args.url, "civicsnap_events", "subscribers")
+    open_rss = rss_mb(args.server_pid)
+    dropped = sum(s.dropped for s in streams)
+    print(f"Idle {args.idle}s: {dropped} dropped, {sum(s.keep_alives for s in streams)} keep-alives, "
+          f"worker reports {subscribers if subscribers is not None else '?'} subscribers")
+    if base_rss is not None and open_rss is not None:
+        print(f"Worker RSS {base_rss:.0f} MB -> {open_rss:.0f} MB "
+              f"({(open_rss - base_rss) * 1024 / max(len(streams), 1):.1f} KB per stream)")
+
+    # Fan-out latency: from sending the status change to each stream seeing it
+    latencies, missed = [], 0
+    statuses = ["in_progress", "pending"]
+    for n in range(args.events):
+        before = {id(s): set(s.received) for s in streams}
+        sent = time.monotonic()
+        await loop.run_in_executor(None, set_status, args.url, args.complaint_id, statuses[n % 2])
+        deadline = sent + args.timeout
+        while time.monotonic() < deadline and not all(set(s.received) - before[id(s)] for s in streams):
+            await asyncio.sleep(0.01)
+        for s in streams:
+            new = set(s.received) - before[id(s)]
+            if new:
+                latencies.append((s.received[min(new)] - sent) * 1000)
+            else:
+                missed += 1
+    if latencies:
+        latencies.sort()
+        print(f"Fan-out to {len(streams)} streams x {args.events} events: "
+              f"p50 {statistics.median(latencies):.1f} ms   p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms   "
+              f"max {latencies[-1]:.1f} ms   missed {missed}")
+
+    # Resume: a stream that was away gets what it missed
+    probe = streams[0]
+    last_seen = probe.last_id or 0
+    probe.close()
+    await asyncio.sleep(0.2)
+    await loop.run_in_executor(None, set_status, args.url, args.complaint_id, statuses[args.events % 2])
+    resumed = Stream()
+    reader = await resumed.open(host, port, path, last_id=last_seen)
+    tasks.append(asyncio.ensure_future(resumed.read(reader)))
+    deadline = time.monotonic() + args.timeout
+    while time.monotonic() < deadline and not any(i > last_seen for i in resumed.received):
+        await asyncio.sleep(0.01)
+    resume_ok = any(i > last_seen for i in resumed.received)
+    print(f"Resume with Last-Event-ID {last_seen}: {'replayed' if resume_ok else 'MISSED'}")
+
+    for s in streams + [resumed]:
+        s.close()
+    for task in tasks:
+        task.cancel()
+    return 0 if dropped == 0 and missed == 0 and resume_ok else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--ward-id', type=int, required=True)
+    parser.add_argument('--complaint-id', type=int, required=True, help="a complaint in --ward-id")
+    parser.add_argument('--subscribers', type=int, default=5000)
+    parser.add_argument('--connect-rate', type=float, default=500, help="new streams per second (0: no limit)")
+    parser.add_argument('--idle', type=float, default=60)
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=10, help="seconds to wait for an event everywhere")
+    parser.add_argument('--server-pid', type=int)
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""
+Synthetic inputs shared by the benchmark scripts.
+"""
+import io
+import random
+from fractions import Fraction
+
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+
+GPS_IFD_TAG = 0x8825
+
+
+def _dms(value):
+    value = abs(value)
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = Fraction((value - degrees - minutes / 60) * 3600).limit_denominator(10000)
+    return (IFDRational(degrees, 1), IFDRational(minutes, 1), IFDRational(seconds.numerator, seconds.denominator))
+
+
+def make_geotagged_jpeg(lat, lon, size=(4000, 3000), quality=92, seed=None):
+    """Returns JPEG bytes of a noisy photo-like image carrying GPS EXIF."""
+    rng = random.Random(seed)
+    small = Image.new('RGB', (size[0] // 50, size[1] // 50))
+    small.putdata([
+        (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        for _ in range(small.width * small.height)
+    ])
+    image = small.resize(size, Image.BILINEAR)
+
+    exif = Image.Exif()
+    exif[GPS_IFD_TAG] = {
+        1: 'N' if lat >= 0 else 'S',
+        2: _dms(lat),
+        3: 'E' if lon >= 0 else 'W',
+        4: _dms(lon),
+    }
+    out = io.BytesIO()
+    image.save(out, format='JPEG', quality=quality, exif=exif.tobytes())
+    return out.getvalue()
+
+
+def random_point(rng, bbox=(76.0, 9.0, 77.0, 10.0)):
+    return rng.uniform(bbox[1], bbox[3]), rng.uniform(bbox[0], bbox[2])
@@ -0,0 +1,123 @@
+"""
+Benchmark: disk-staged upload path (before) vs in-memory upload path (after).
+
+Before: save the upload to uploads/, extract_gps() reopens it, compress_image()
+decodes it and overwrites the file, then it is reopened to stream to storage.
+After:  EXIF is parsed from the in-memory bytes, pixels are decoded once and
+encoded into a reused BytesIO that is handed straight to storage.
+
+The "before" functions are kept here as the reference implementation; the
+app itself only has the in-memory path.
+
+Reports per-upload latency, file opens/removes (counted with an audit hook)
+and peak Python allocations (tracemalloc). No database or storage needed.
+
+    python benchmarks/upload_path_bench.py [iterations]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from helper import open_image, extract_gps_from_image, compress_image_to_buffer
+from synthetic import make_geotagged_jpeg
+
+FILE_EVENTS = {'open': 0, 'os.remove': 0}
+
+def _audit(event, args):
+    if event in FILE_EVENTS:
+        FILE_EVENTS[event] += 1
+
+
+# ---- before: the disk-staged helpers the upload route used to call ----
+
+def extract_gps(image_path):
+    try:
+        with Image.open(image_path) as image:
+            return extract_gps_from_image(image)
+    except Exception:
+        return None
+
+
+def compress_image(image_path, quality=80):
+    """Reads an image from disk, compresses it, and overwrites the original file."""
+    try:
+        img = Image.open(image_path)
+        # Convert transparent images to RGB (JPEG requirement)
+        if img.mode in ('RGBA', 'P'):
+            img = img.convert('RGB')
+        # PIL format names are uppercase (e.g., 'JPEG', 'PNG')
+        img_format = os.path.splitext(image_path)[1].strip('.').upper()
+        if img_format == 'JPG':
+            img_format = 'JPEG'
+        img.save(image_path, format=img_format, quality=quality, optimize=True)
+        return True
+    except Exception:
+        return False
+
+
+def disk_path(upload, staging_dir):
+    path = os.path.join(staging_dir, 'IMG_0001.jpg')
+    with open(path, 'wb') as f:
+        f.write(upload)
+    extract_gps(path)
+    compress_image(path, quality=80)
+    with open(path, 'rb') as f:
+        body = f.read()
+    os.remove(path)
+    return len(body)
+
+
+# ---- after: in-memory, as in the app ----
+
+_buf = io.BytesIO()
+
+def memory_path(upload, staging_dir):
+    with open_image(upload) as image:
+        extract_gps_from_image(image)
+        compress_image_to_buffer(image, _buf, quality=80)
+    with _buf.getbuffer() as view:
+        return len(view)
+
+
+def measure(fn, upload, staging_dir, iterations):
+    fn(upload, staging_dir)  # warm-up
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(upload, staging_dir)
+    latency = (time.perf_counter() - start) / iterations
+
+    for key in FILE_EVENTS:
+        FILE_EVENTS[key] = 0
+    tracemalloc.start()
+    fn(upload, staging_dir)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latency, dict(FILE_EVENTS), peak
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    upload = make_geotagged_jpeg(9.5, 76.5, seed=7)
+    sys.addaudithook(_audit)
+
+    print(f"Upload size: {len(upload) / 1024:.0f} KiB, iterations: {iterations}")
+    with tempfile.TemporaryDirectory() as staging_dir:
+        for label, fn in (("disk (before)", disk_path), ("memory (after)", memory_path)):
+            latency, events, peak = measure(fn, upload, staging_dir, iterations)
+            print(
+                f"{label:15s} {latency * 1000:8.1f} ms/upload  "
+                f"opens={events['open']} removes={events['os.remove']}  "
+                f"peak alloc={peak / 1024:.0f} KiB"
+            )
+
+
+if __name__ == '__main__':
+    main()
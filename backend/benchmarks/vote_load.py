@@ -0,0 +1,123 @@
+"""
+Load test: sustained votes/sec on a single hot complaint.
+
+"direct" is the old vote_issue write path: one UPDATE ... SET upvotes =
+upvotes + 1 and one commit per vote, all threads fighting over the same row.
+"buffered" sends each vote through votes.VoteBuffer, which batches inserts
+into complaint_votes and the upvotes increment.
+
+Each run creates a tagged throwaway complaint and deletes it afterwards.
+
+    python benchmarks/vote_load.py [--threads 32] [--seconds 10]
+"""
+import argparse
+import itertools
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import helper
+from helper import get_db_connection
+from votes import VoteBuffer
+from seed import BENCH_PHONE_PREFIX
+
+
+def create_complaint():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            INSERT INTO complaints (description, geom, category, phone_number, upvotes)
+            VALUES ('Vote load test', ST_SetSRID(ST_MakePoint(76.5, 9.5), 4326), 'Pothole', %s, 0)
+            RETURNING id;
+        """, (BENCH_PHONE_PREFIX + 'votes',))
+        complaint_id = cur.fetchone()[0]
+        conn.commit()
+        return complaint_id
+    finally:
+        cur.close()
+        conn.close()
+
+
+def read_and_delete(complaint_id):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT upvotes FROM complaints WHERE id = %s;", (complaint_id,))
+        upvotes = cur.fetchone()[0]
+        cur.execute("DELETE FROM complaints WHERE id = %s;", (complaint_id,))
+        conn.commit()
+        return upvotes
+    finally:
+        cur.close()
+        conn.close()
+
+
+def direct_vote(complaint_id, voter_id):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("UPDATE complaints SET upvotes = COALESCE(upvotes, 0) + 1 WHERE id = %s RETURNING id;", (complaint_id,))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def run(mode, threads, seconds):
+    complaint_id = create_complaint()
+    buffer = VoteBuffer()
+    voters = itertools.count()
+    counter_lock = threading.Lock()
+    done = [0]
+    deadline = time.monotonic() + seconds
+
+    def worker():
+        local = 0
+        while time.monotonic() < deadline:
+            voter_id = f"voter-{next(voters)}"
+            if mode == 'direct':
+                direct_vote(complaint_id, voter_id)
+            else:
+                buffer.add(complaint_id, voter_id)
+                # Keep the request-path cost honest: vote_issue also does a
+                # read-only existence check per vote
+                conn = get_db_connection()
+                cur = conn.cursor()
+                cur.execute("SELECT 1 FROM complaints WHERE id = %s;", (complaint_id,))
+                cur.fetchone()
+                cur.close()
+                conn.close()
+            local += 1
+        with counter_lock:
+            done[0] += local
+
+    start = time.monotonic()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.monotonic() - start
+    if mode == 'buffered':
+        buffer.flush()
+    upvotes = read_and_delete(complaint_id)
+    print(f"{mode:9s} {done[0] / elapsed:10.0f} votes/s  ({done[0]} votes, upvotes column = {upvotes})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+    # Enough pooled connections for every thread (read when the pool is created)
+    helper.DB_POOL_MAX = max(helper.DB_POOL_MAX, args.threads + 2)
+    for mode in ('direct', 'buffered'):
+        run(mode, args.threads, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Randomized check that the in-memory ward locator agrees with PostGIS.
+
+Samples points inside (and slightly around) the bounding box of every ward
+piece the locator indexes, plus every piece vertex and edge midpoint (so the
+ST_Subdivide cuts inside a ward as well as its boundary), and compares
+`ward_locator.locate` with `ST_Contains` on the whole ward for each one. Also reports the per-lookup latency of both.
+tests/test_ward_index.py runs the same comparison under pytest; both take
+the sampling and the reference query from ward_index.py.
+
+    python benchmarks/ward_locator_check.py [samples]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper import get_db_connection
+from ward_index import ROUTING_QUERY, sample_points, ward_locator
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rng = random.Random(42)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        ward_locator.refresh(cur, force=True)
+        points = sample_points(ward_locator._tree, samples, rng)
+
+        mismatches = []
+        local_time = db_time = 0.0
+        for lon, lat in points:
+            t0 = time.perf_counter()
+            local = ward_locator.locate(cur, lon, lat)
+            t1 = time.perf_counter()
+            cur.execute(ROUTING_QUERY, (lon, lat))
+            remote = cur.fetchone()
+            t2 = time.perf_counter()
+            local_time += t1 - t0
+            db_time += t2 - t1
+            if (local[0] if local else None) != (remote[0] if remote else None):
+                mismatches.append((lon, lat, local, remote))
+
+        n = len(points)
+        print(f"Points checked: {n}")
+        print(f"Mismatches:     {len(mismatches)}")
+        print(f"Local lookup:   {local_time / n * 1e6:.1f} us/point")
+        print(f"PostGIS lookup: {db_time / n * 1e6:.1f} us/point")
+        for lon, lat, local, remote in mismatches[:20]:
+            print(f"  ({lon!r}, {lat!r}): local={local} postgis={remote}")
+        return 1 if mismatches else 0
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
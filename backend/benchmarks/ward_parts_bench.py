@@ -0,0 +1,165 @@
+"""
+Benchmark: ward overlap validation and routing against whole ward polygons
+versus their ward_parts pieces (migration 0010), with several hundred
+complex hand-drawn-like wards.
+
+Everything runs in one transaction that is rolled back at the end: it adds
+(--wards - 1) x --wards jagged star-shaped wards of --vertices vertices each (the
+ward_parts trigger subdivides them as they are inserted) in an empty area,
+one grid column left free, and then times
+  * overlap validation of --drawn new boundaries (half overlapping existing
+    wards, half in the free column): the previous ST_Area(ST_Intersection)
+    query over every ward versus ward_index.find_ward_overlaps,
+  * routing of --points random points in PostGIS: ST_Contains on wards
+    versus the pieces,
+  * the in-memory ward locator built from whole polygons versus pieces,
+checking each pair of methods returns the same answers.
+
+    python benchmarks/ward_parts_bench.py [--wards 20] [--vertices 2000] [--drawn 40] [--points 2000]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper import get_db_connection
+from ward_index import WardLocator, STRTree, _bbox, parse_geojson_polygons, find_ward_overlaps
+
+# Open ocean, away from any real ward
+BENCH_AREA = (-31.0, -31.0, -30.0, -30.0)
+
+LEGACY_OVERLAP_SQL = """
+    SELECT id, name FROM wards
+    WHERE ST_Area(ST_Intersection(geom, ST_GeomFromText(%s, 4326))) > 0
+    ORDER BY name;
+"""
+
+
+def star_wkt(cx, cy, radius, vertices, rng):
+    """A jagged, star-shaped (so simple) polygon around (cx, cy)."""
+    points = []
+    for k in range(vertices):
+        angle = 2 * math.pi * k / vertices
+        r = radius * rng.uniform(0.75, 1.0)
+        points.append(f"{cx + r * math.cos(angle)} {cy + r * math.sin(angle)}")
+    points.append(points[0])
+    return f"POLYGON(({', '.join(points)}))"
+
+
+def seed_wards(cur, grid, vertices, rng):
+    minx, miny, maxx, maxy = BENCH_AREA
+    step = (maxx - minx) / grid
+    for i in range(grid - 1):  # last column stays free
+        for j in range(grid):
+            cx, cy = minx + (i + 0.5) * step, miny + (j + 0.5) * step
+            cur.execute(
+                "INSERT INTO wards (name, geom) VALUES (%s, ST_GeomFromText(%s, 4326));",
+                (f"Bench Part Ward {i}-{j}", star_wkt(cx, cy, step / 2, vertices, rng))
+            )
+    return step
+
+
+def drawn_boundaries(count, grid, step, vertices, rng):
+    minx, miny = BENCH_AREA[:2]
+    drawn = []
+    for k in range(count):
+        j = rng.randrange(grid)
+        if k % 2:
+            # Straddles two existing wards
+            i = rng.randrange(grid - 2)
+            cx, cy = minx + (i + 1) * step, miny + (j + 0.5) * step
+        else:
+            cx, cy = minx + (grid - 0.5) * step, miny + (j + 0.5) * step
+        drawn.append(star_wkt(cx, cy, step * 0.45, vertices, rng))
+    return drawn
+
+
+def timed(fn, items):
+    began = time.perf_counter()
+    results = [fn(item) for item in items]
+    return results, (time.perf_counter() - began) / len(items) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--wards', type=int, default=20, help="grid size: (N-1) x N wards")
+    parser.add_argument('--vertices', type=int, default=2000)
+    parser.add_argument('--drawn', type=int, default=40)
+    parser.add_argument('--points', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        began = time.perf_counter()
+        step = seed_wards(cur, args.wards, args.vertices, rng)
+        cur.execute("ANALYZE wards; ANALYZE ward_parts;")
+        cur.execute("SELECT count(*) FROM ward_parts p JOIN wards w ON w.id = p.ward_id WHERE w.name LIKE 'Bench Part Ward %%';")
+        parts = cur.fetchone()[0]
+        ward_count = (args.wards - 1) * args.wards
+        print(f"Seeded {ward_count} wards x {args.vertices} vertices ({parts} pieces) "
+              f"in {time.perf_counter() - began:.1f}s")
+
+        drawn = drawn_boundaries(args.drawn, args.wards, step, args.vertices, rng)
+
+        def legacy_overlaps(wkt):
+            cur.execute(LEGACY_OVERLAP_SQL, (wkt,))
+            return sorted(cur.fetchall())
+
+        legacy, legacy_ms = timed(legacy_overlaps, drawn)
+        parts_found, parts_ms = timed(lambda wkt: sorted(find_ward_overlaps(cur, wkt)), drawn)
+        print(f"Overlap check     whole wards {legacy_ms:9.1f} ms   pieces {parts_ms:8.1f} ms   "
+              f"{legacy_ms / parts_ms:6.1f}x   same results: {legacy == parts_found}")
+
+        minx, miny, maxx, maxy = BENCH_AREA
+        points = [(rng.uniform(minx, maxx), rng.uniform(miny, maxy)) for _ in range(args.points)]
+
+        def route_whole(point):
+            cur.execute("SELECT min(id) FROM wards WHERE ST_Contains(geom, ST_SetSRID(ST_MakePoint(%s, %s), 4326));", point)
+            return cur.fetchone()[0]
+
+        def route_parts(point):
+            # Random points practically never land on a cut between pieces
+            cur.execute("SELECT min(ward_id) FROM ward_parts WHERE ST_Contains(geom, ST_SetSRID(ST_MakePoint(%s, %s), 4326));", point)
+            return cur.fetchone()[0]
+
+        whole_ids, whole_ms = timed(route_whole, points)
+        part_ids, part_ms = timed(route_parts, points)
+        print(f"PostGIS routing   whole wards {whole_ms:9.3f} ms   pieces {part_ms:8.3f} ms   "
+              f"{whole_ms / part_ms:6.1f}x   same results: {whole_ids == part_ids}")
+
+        # In-memory locator: the shipped one (pieces) and one fed whole wards
+        locator = WardLocator(check_interval=3600)
+        locator.refresh(cur, force=True)
+        whole_locator = WardLocator(check_interval=3600)
+        whole_locator.refresh(cur, force=True)
+        cur.execute("SELECT id, name, ST_AsGeoJSON(geom) FROM wards WHERE geom IS NOT NULL;")
+        entries = []
+        for ward_id, name, geojson in cur.fetchall():
+            polygons = parse_geojson_polygons(geojson)
+            entries.extend((_bbox([p]), (ward_id, name, p, polygons)) for p in polygons)
+        whole_locator._tree = STRTree(entries)
+
+        whole_hits, whole_mem_ms = timed(lambda p: whole_locator.locate(cur, *p), points)
+        part_hits, part_mem_ms = timed(lambda p: locator.locate(cur, *p), points)
+        print(f"In-memory locator whole wards {whole_mem_ms * 1000:9.1f} us   pieces {part_mem_ms * 1000:8.1f} us   "
+              f"{whole_mem_ms / part_mem_ms:6.1f}x   same results: {whole_hits == part_hits}")
+        if whole_hits != part_hits:
+            return 1
+        agree = [(h[0] if h else None) for h in part_hits] == part_ids
+        print(f"Locator agrees with PostGIS: {agree}")
+        return 0 if legacy == parts_found and whole_ids == part_ids and agree else 1
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,387 @@
+"""
+In-memory index of open (unresolved) complaints for duplicate detection.
+
+Each worker keeps every open complaint's location, category and perceptual
+image hash in memory, bucketed in a grid of DEDUP_GRID_CELL_M cells and by
+category within each cell. Both duplicate rules (see pick_duplicate) are
+then answered from a few grid cells: "a similar photo within N metres" is a
+Hamming-distance check (XOR + popcount) on the hashes those cells hold, and
+"an open same-category issue within N metres" only looks at that category's
+bucket, instead of an SQL radius query and a scan of the nearby rows.
+
+The hashes are persisted in complaints.image_hash; the index is loaded from
+the database in a background thread when a worker starts (callers fall back
+to SQL until it is ready) and then kept in sync by:
+  * this worker applying its own inserts and status changes immediately, and
+  * a delta query on complaints.updated_at every DEDUP_SYNC_INTERVAL seconds
+    for changes made by other workers, so their reports are seen at most
+    that many seconds late.
+
+A report filed on another worker since the last sync is not in the index
+yet, so two copies of the same issue sent to two workers a moment apart
+would both be accepted. When the index finds no duplicate, find_duplicates
+therefore asks the database once more, for complaints changed since the
+window the next sync will read (DEDUP_RECHECK_RECENT, on by default).
+"""
+import datetime
+import logging
+import math
+import os
+import threading
+import time
+
+from helper import get_db_connection, hash_from_db, hamming_distance
+
+log = logging.getLogger(__name__)
+
+DEDUP_SYNC_INTERVAL = float(os.getenv("DEDUP_SYNC_INTERVAL", "2"))
+# Re-read rows touched this long before the last sync, to catch
+# transactions that committed after a sync had already run
+DEDUP_SYNC_MARGIN = float(os.getenv("DEDUP_SYNC_MARGIN", "60"))
+# On an index miss, look in SQL for complaints the next sync would pick up
+DEDUP_RECHECK_RECENT = os.getenv("DEDUP_RECHECK_RECENT", "true").lower() == "true"
+# Hamming distance (of 64 bits) at or below which two photos show the same scene
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "10"))
+# Above this distance two photos are clearly different scenes
+PHASH_DISTINCT_DISTANCE = int(os.getenv("PHASH_DISTINCT_DISTANCE", "24"))
+# Similar photos within this radius are duplicates whatever their category
+IMAGE_DUP_RADIUS_M = float(os.getenv("IMAGE_DUP_RADIUS_M", "50"))
+
+# Same-category reports within this radius are duplicates unless their photos differ
+SPATIAL_DUP_RADIUS_M = 20
+
+# Grid cell size; at least IMAGE_DUP_RADIUS_M keeps lookups to ~3x3 cells
+DEDUP_GRID_CELL_M = float(os.getenv("DEDUP_GRID_CELL_M", str(IMAGE_DUP_RADIUS_M)))
+
+EARTH_RADIUS_M = 6371008.8
+METRES_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+OPEN_COMPLAINT_COLUMNS = "id, ST_Y(geom), ST_X(geom), category, image_hash, ward_id, status"
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def is_open(status):
+    # Mirrors the SQL predicate `status != 'resolved'` (NULL is not open)
+    return status is not None and status != 'resolved'
+
+
+class OpenComplaint:
+    __slots__ = ('id', 'lat', 'lon', 'category', 'image_hash', 'ward_id')
+
+    def __init__(self, id, lat, lon, category, image_hash, ward_id):
+        self.id = id
+        self.lat = lat
+        self.lon = lon
+        self.category = category
+        self.image_hash = image_hash
+        self.ward_id = ward_id
+
+
+def grid_cell(lat, lon, cell_deg):
+    return (int(math.floor(lon / cell_deg)), int(math.floor(lat / cell_deg)))
+
+
+class OpenComplaintIndex:
+    def __init__(self, sync_interval=DEDUP_SYNC_INTERVAL, sync_margin=DEDUP_SYNC_MARGIN, cell_m=DEDUP_GRID_CELL_M):
+        self.sync_interval = sync_interval
+        self.sync_margin = sync_margin
+        self.cell_m = cell_m
+        self.cell_deg = cell_m / METRES_PER_DEGREE
+        self._lock = threading.RLock()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self._entries = {}
+        self._cells = {}   # grid cell -> {category: {complaint id: OpenComplaint}}
+        self._ready = False
+        self._synced_at = None   # database time of the last sync
+        self._checked_at = 0.0
+        self._touched = None     # ids written locally while a sync query runs
+
+    # ---- loading and synchronisation ----
+
+    def _ensure_loading(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._reset()
+            self._pid = os.getpid()
+            threading.Thread(target=self._load, name="dedup-index-loader", daemon=True).start()
+
+    @property
+    def ready(self):
+        self._ensure_loading()
+        return self._ready
+
+    def _load(self):
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT now();")
+            synced_at = cur.fetchone()[0]
+            cur.execute(f"SELECT {OPEN_COMPLAINT_COLUMNS} FROM complaints WHERE status != 'resolved';")
+            rows = cur.fetchall()
+        except Exception as e:
+            log.warning("Duplicate index load failed: %s", e)
+            with self._lock:
+                self._pid = None  # retry on next use
+            return
+        finally:
+            cur.close()
+            conn.close()
+        self.load_rows(rows, synced_at)
+
+    def load_rows(self, rows, synced_at):
+        """Installs a full snapshot of rows shaped like OPEN_COMPLAINT_COLUMNS."""
+        with self._lock:
+            self._pid = os.getpid()
+            for row in rows:
+                self._apply_row(row)
+            self._synced_at = synced_at
+            self._checked_at = time.monotonic()
+            self._ready = True
+
+    def sync(self, cur):
+        """
+        Pulls changes made by other workers, at most every sync_interval.
+        The query runs without the lock, so lookups and local writes are not
+        held up by it; ids written locally meanwhile keep their newer state.
+        """
+        if not self.ready or time.monotonic() - self._checked_at < self.sync_interval:
+            return
+        with self._lock:
+            if self._touched is not None or time.monotonic() - self._checked_at < self.sync_interval:
+                return
+            self._checked_at = time.monotonic()
+            self._touched = set()
+            since = self._synced_at
+        try:
+            cur.execute("SELECT now();")
+            synced_at = cur.fetchone()[0]
+            cur.execute(
+                f"SELECT {OPEN_COMPLAINT_COLUMNS} FROM complaints "
+                f"WHERE updated_at > %s - make_interval(secs => %s);",
+                (since, self.sync_margin)
+            )
+            rows = cur.fetchall()
+        except Exception:
+            with self._lock:
+                self._touched = None
+            raise
+        with self._lock:
+            touched, self._touched = self._touched, None
+            for row in rows:
+                if row[0] not in touched:
+                    self._apply_row(row)
+            self._synced_at = synced_at
+
+    def _apply_row(self, row):
+        complaint_id, lat, lon, category, image_hash, ward_id, status = row
+        self._discard(complaint_id)
+        if is_open(status):
+            entry = OpenComplaint(complaint_id, lat, lon, category, hash_from_db(image_hash), ward_id)
+            self._entries[complaint_id] = entry
+            cell = self._cells.setdefault(grid_cell(lat, lon, self.cell_deg), {})
+            cell.setdefault(category, {})[complaint_id] = entry
+
+    def _discard(self, complaint_id):
+        entry = self._entries.pop(complaint_id, None)
+        if entry is None:
+            return
+        key = grid_cell(entry.lat, entry.lon, self.cell_deg)
+        cell = self._cells.get(key)
+        if cell is None:
+            return
+        bucket = cell.get(entry.category)
+        if bucket is not None:
+            bucket.pop(complaint_id, None)
+            if not bucket:
+                del cell[entry.category]
+        if not cell:
+            del self._cells[key]
+
+    # ---- local writes from this worker ----
+
+    def add(self, complaint_id, lat, lon, category, image_hash, ward_id, status='pending'):
+        self.apply_row((complaint_id, lat, lon, category, image_hash, ward_id, status))
+
+    def apply_row(self, row):
+        """Applies a row shaped like OPEN_COMPLAINT_COLUMNS (e.g. from RETURNING)."""
+        self.apply_rows((row,))
+
+    def apply_rows(self, rows):
+        if not self.ready:
+            return
+        with self._lock:
+            for row in rows:
+                self._apply_row(row)
+                if self._touched is not None:
+                    self._touched.add(row[0])
+
+    # ---- queries ----
+
+    def _cells_within(self, lat, lon, radius_m):
+        """Grid cells that can hold points within radius_m of (lat, lon)."""
+        cx, cy = grid_cell(lat, lon, self.cell_deg)
+        reach_y = math.ceil(radius_m / self.cell_m)
+        # Cells get narrower (in metres) away from the equator
+        reach_x = math.ceil(radius_m / (self.cell_m * max(math.cos(math.radians(lat)), 0.01)))
+        cells = self._cells
+        for x in range(cx - reach_x, cx + reach_x + 1):
+            for y in range(cy - reach_y, cy + reach_y + 1):
+                cell = cells.get((x, y))
+                if cell:
+                    yield cell
+
+    def duplicate_candidates(self, lat, lon, category, image_hash, image_rule=True):
+        """
+        Open complaints either duplicate rule could match, shaped for
+        pick_duplicate: [(id, category, unsigned hash or None, metres)].
+        None while the index is still loading.
+        """
+        if not self.ready:
+            return None
+        candidates = {}
+        with self._lock:
+            for cell in self._cells_within(lat, lon, SPATIAL_DUP_RADIUS_M):
+                bucket = cell.get(category)
+                if not bucket:
+                    continue
+                for entry in bucket.values():
+                    metres = haversine_m(lat, lon, entry.lat, entry.lon)
+                    if metres <= SPATIAL_DUP_RADIUS_M:
+                        candidates[entry.id] = (entry.id, entry.category, entry.image_hash, metres)
+            if image_rule and image_hash is not None:
+                for cell in self._cells_within(lat, lon, IMAGE_DUP_RADIUS_M):
+                    for bucket in cell.values():
+                        for entry in bucket.values():
+                            if entry.image_hash is None or entry.id in candidates:
+                                continue
+                            if hamming_distance(entry.image_hash, image_hash) > PHASH_MAX_DISTANCE:
+                                continue
+                            metres = haversine_m(lat, lon, entry.lat, entry.lon)
+                            if metres <= IMAGE_DUP_RADIUS_M:
+                                candidates[entry.id] = (entry.id, entry.category, entry.image_hash, metres)
+        return list(candidates.values())
+
+    def unsynced_since(self):
+        """Database time from which rows may be missing from the index (None while loading)."""
+        if not self._ready or self._synced_at is None:
+            return None
+        return self._synced_at - datetime.timedelta(seconds=self.sync_margin)
+
+    def stats(self):
+        with self._lock:
+            return {"ready": self._ready, "open_complaints": len(self._entries), "grid_cells": len(self._cells)}
+
+
+open_complaints = OpenComplaintIndex()
+
+# Open complaints near each report that either duplicate rule could match;
+# one query for a whole batch of reports. {recent} optionally narrows it to
+# complaints changed since %(since)s
+DUPLICATE_CANDIDATES_SQL = """
+    SELECT r.idx, c.id, c.category, c.image_hash, c.metres
+    FROM unnest(%(idx)s::int[], %(lon)s::float8[], %(lat)s::float8[], %(category)s::text[])
+        AS r(idx, lon, lat, category)
+    CROSS JOIN LATERAL (
+        SELECT c.id, c.category, c.image_hash,
+               ST_Distance(c.geom::geography, ST_SetSRID(ST_MakePoint(r.lon, r.lat), 4326)::geography) AS metres
+        FROM complaints c
+        WHERE ST_DWithin(c.geom::geography, ST_SetSRID(ST_MakePoint(r.lon, r.lat), 4326)::geography, %(radius)s)
+        AND c.status != 'resolved'
+        AND (c.category = r.category OR (%(image_rule)s AND c.image_hash IS NOT NULL)){recent}
+    ) c;
+"""
+RECENT_FILTER_SQL = "\n        AND c.updated_at > %(since)s"
+
+
+def pick_duplicate(candidates, category, image_hash, image_rule=True):
+    """
+    Applies the duplicate rules to nearby open complaints
+    [(id, category, unsigned hash or None, metres)] and returns the id of
+    the one the report duplicates, or None:
+
+    1. A similar photo (<= PHASH_MAX_DISTANCE bits) within IMAGE_DUP_RADIUS_M,
+       whatever the category: the same pothole filed under another category.
+    2. The same category within SPATIAL_DUP_RADIUS_M, unless both photos are
+       hashed and clearly different (> PHASH_DISTINCT_DISTANCE bits): two
+       distinct issues a few metres apart.
+    """
+    best_image = best_spatial = None
+    for complaint_id, other_category, other_hash, metres in candidates:
+        bits = None
+        if image_hash is not None and other_hash is not None:
+            bits = hamming_distance(other_hash, image_hash)
+        if image_rule and bits is not None and bits <= PHASH_MAX_DISTANCE and metres <= IMAGE_DUP_RADIUS_M:
+            if best_image is None or (bits, metres) < best_image[:2]:
+                best_image = (bits, metres, complaint_id)
+        if (other_category == category and metres <= SPATIAL_DUP_RADIUS_M
+                and (bits is None or bits <= PHASH_DISTINCT_DISTANCE)):
+            if best_spatial is None or metres < best_spatial[0]:
+                best_spatial = (metres, complaint_id)
+    if best_image:
+        return best_image[2]
+    return best_spatial[1] if best_spatial else None
+
+
+def find_duplicates(cur, reports, image_rule=True):
+    """
+    Duplicate complaint id (or None) for each report in [(lon, lat, category,
+    image_hash)]: from the in-memory index once it is loaded, otherwise with
+    a single query for the whole batch.
+    """
+    if not reports:
+        return []
+    open_complaints.sync(cur)
+    found = []
+    for lon, lat, category, image_hash in reports:
+        candidates = open_complaints.duplicate_candidates(lat, lon, category, image_hash, image_rule)
+        if candidates is None:
+            # Index still loading in this worker (cold start)
+            return _find_duplicates_sql(cur, reports, image_rule)
+        found.append(pick_duplicate(candidates, category, image_hash, image_rule))
+
+    since = open_complaints.unsynced_since()
+    missed = [i for i, duplicate in enumerate(found) if duplicate is None]
+    if DEDUP_RECHECK_RECENT and missed and since is not None:
+        # The index had no candidate that matched, so whatever matches among
+        # the recent rows is the answer on its own
+        rechecked = _find_duplicates_sql(cur, [reports[i] for i in missed], image_rule, since)
+        for i, duplicate in zip(missed, rechecked):
+            found[i] = duplicate
+    return found
+
+
+def _find_duplicates_sql(cur, reports, image_rule=True, since=None):
+    sql = DUPLICATE_CANDIDATES_SQL.format(recent=RECENT_FILTER_SQL if since is not None else "")
+    cur.execute(sql, {
+        "since": since,
+        "idx": list(range(len(reports))),
+        "lon": [r[0] for r in reports],
+        "lat": [r[1] for r in reports],
+        "category": [r[2] for r in reports],
+        "radius": max(IMAGE_DUP_RADIUS_M, SPATIAL_DUP_RADIUS_M) if image_rule else SPATIAL_DUP_RADIUS_M,
+        "image_rule": image_rule,
+    })
+    candidates = [[] for _ in reports]
+    for idx, complaint_id, category, image_hash, metres in cur.fetchall():
+        candidates[idx].append((complaint_id, category, hash_from_db(image_hash), metres))
+    return [
+        pick_duplicate(candidates[i], report[2], report[3], image_rule)
+        for i, report in enumerate(reports)
+    ]
+
+
+def find_duplicate(cur, lon, lat, category, image_hash):
+    """Id of an open complaint the new report duplicates, or None (rules in pick_duplicate)."""
+    return find_duplicates(cur, [(lon, lat, category, image_hash)])[0]
@@ -0,0 +1,394 @@
+"""
+Live complaint events for the per-ward Server-Sent Events streams.
+
+The complaints_notify trigger (migration 0013) records every new report,
+status change, vote flush, processed image and ward reassignment in
+complaint_events and announces it with NOTIFY. Each worker process keeps a
+single LISTEN connection in a background thread and fans every
+notification out to the streams subscribed to its ward, so thousands of
+open streams cost one database connection per worker and no polling.
+
+Workers: an open stream holds its request for as long as the client stays
+connected. On gevent workers (SERVER_MODE=async) that is a greenlet; on
+sync or gthread workers it is the worker's only thread, or one of
+WEB_THREADS, and the worker's timeout kills it. So streams are refused
+(503) on threaded workers unless EVENTS_THREADED_MAX_SUBSCRIBERS allows a
+few, e.g. for the development server.
+
+Write cost: the trigger runs inside every write to complaints that changes
+status, votes, image status or ward, so each such row costs one INSERT
+into complaint_events and one NOTIFY, in the writer's transaction, whether
+or not anyone is listening. A vote flush or re-route batch of N rows adds
+N of each. Postgres also serializes the commits of all transactions that
+sent a NOTIFY with a database-wide lock, so notifying writers commit one
+at a time. EVENTS_ENABLED=false only stops the streams; to stop the cost,
+disable the trigger:
+    ALTER TABLE complaints DISABLE TRIGGER complaints_notify;
+
+Backpressure: every subscriber has a bounded queue (EVENTS_QUEUE_SIZE). A
+subscriber that falls behind does not hold the others up or grow without
+bound; its queue is dropped and the stream catches up from the
+complaint_events table instead, as it does when a client reconnects with
+Last-Event-ID. A client more than EVENTS_REPLAY_MAX events behind gets a
+`reset` event telling it to reload its list.
+
+Ordering: event ids come from a sequence when the row is written, not when
+the transaction commits, so an event can become visible after others with
+higher ids. Live delivery follows commit order (NOTIFY is sent at commit);
+a stream remembers the last EVENTS_SEEN_MAX ids it sent and skips only
+those, rather than everything below its newest id. Replay reads from a
+lagged floor: everything after the first event written up to
+EVENTS_REPLAY_LAG seconds before the resume point, minus the ids already
+sent. The SSE id is the newest id sent so far. An event whose transaction
+ran longer than EVENTS_REPLAY_LAG and committed after the stream had moved
+past it can still be missed on replay. A client reconnecting with
+Last-Event-ID may receive events from that lag window a second time; each
+event carries the complaint's full state, so applying it again is harmless.
+"""
+import json
+import logging
+import os
+import select
+import threading
+import time
+from collections import deque
+
+from helper import get_db_connection, get_listen_connection, gevent_patched
+
+log = logging.getLogger(__name__)
+
+EVENTS_ENABLED = os.getenv("EVENTS_ENABLED", "true").lower() == "true"
+EVENTS_CHANNEL = "complaint_events"
+# Events buffered per subscriber before it has to catch up from the table
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+# Open streams per worker process
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "10000"))
+# Open streams per worker on sync/gthread workers, where each one pins a thread
+EVENTS_THREADED_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_THREADED_MAX_SUBSCRIBERS", "0"))
+# Seconds between keep-alive comments on an idle stream
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+# Most events replayed on resume before the client is told to reload instead
+EVENTS_REPLAY_MAX = int(os.getenv("EVENTS_REPLAY_MAX", "1000"))
+# Replay also re-reads events written this many seconds before the resume
+# point, for transactions that committed after it (see Ordering above)
+EVENTS_REPLAY_LAG = float(os.getenv("EVENTS_REPLAY_LAG", "60"))
+# Ids a stream remembers having sent, to skip them when they come again
+EVENTS_SEEN_MAX = int(os.getenv("EVENTS_SEEN_MAX", "4096"))
+EVENTS_RETENTION_HOURS = float(os.getenv("EVENTS_RETENTION_HOURS", "24"))
+EVENTS_PRUNE_INTERVAL = float(os.getenv("EVENTS_PRUNE_INTERVAL", "600"))
+# Reconnection delay for EventSource clients, in milliseconds
+EVENTS_CLIENT_RETRY_MS = 3000
+
+
+# First id of the lag window before event %(after)s, less one; just
+# %(after)s when that event is unknown (pruned, or 0 for "from the start")
+REPLAY_FLOOR_SQL = """
+    SELECT coalesce(min(e.id) - 1, %(after)s) FROM complaint_events e
+    WHERE e.id <= %(after)s
+    AND e.created_at >= (SELECT created_at FROM complaint_events WHERE id = %(after)s)
+                        - make_interval(secs => %(lag)s);
+"""
+
+
+class EventStreamError(Exception):
+    """No stream can be opened right now (e.g. too many subscribers)."""
+
+
+class Subscription:
+    """One open stream: the wards it follows (None for all) and its queue."""
+
+    __slots__ = ("ward_ids", "overflowed", "_queue", "_ready")
+
+    def __init__(self, ward_ids):
+        self.ward_ids = ward_ids
+        self.overflowed = False
+        self._queue = deque()
+        self._ready = threading.Event()
+
+    def push(self, event, limit):
+        if len(self._queue) >= limit:
+            self._queue.clear()
+            self.overflowed = True
+        else:
+            self._queue.append(event)
+        self._ready.set()
+
+    def wait(self, timeout):
+        """Returns the queued events, or [] after `timeout` seconds without any."""
+        if not self._queue and not self.overflowed:
+            self._ready.wait(timeout)
+        self._ready.clear()
+        events = []
+        while self._queue:
+            events.append(self._queue.popleft())
+        return events
+
+
+class SeenIds:
+    """The last `size` event ids a stream sent."""
+
+    __slots__ = ("size", "_order", "_ids")
+
+    def __init__(self, size=EVENTS_SEEN_MAX):
+        self.size = size
+        self._order = deque()
+        self._ids = set()
+
+    def __contains__(self, event_id):
+        return event_id in self._ids
+
+    def add(self, event_id):
+        self._order.append(event_id)
+        self._ids.add(event_id)
+        while len(self._order) > self.size:
+            self._ids.discard(self._order.popleft())
+
+
+class EventHub:
+    def __init__(self, queue_size=EVENTS_QUEUE_SIZE, max_subscribers=EVENTS_MAX_SUBSCRIBERS,
+                 threaded_max_subscribers=EVENTS_THREADED_MAX_SUBSCRIBERS, enabled=EVENTS_ENABLED):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.threaded_max_subscribers = threaded_max_subscribers
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._pid = None
+        self._by_ward = {}   # ward_id -> set of Subscription
+        self._all = set()    # subscriptions following every ward
+        self._count = 0
+        self._connected = False
+        self._stats = {"received": 0, "delivered": 0, "overflows": 0, "reconnects": 0, "pruned": 0}
+
+    # Threads do not survive fork(), so start lazily in each worker process
+    def ensure_started(self):
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._by_ward, self._all, self._count = {}, set(), 0
+            threading.Thread(target=self._run, name="event-listener", daemon=True).start()
+            self._pid = os.getpid()
+
+    def subscribe(self, ward_ids=None):
+        """Registers a stream for `ward_ids` (None: every ward)."""
+        if not self.enabled:
+            raise EventStreamError("Live updates are disabled")
+        self.ensure_started()
+        limit = self.max_subscribers
+        if not gevent_patched():
+            limit = min(limit, self.threaded_max_subscribers)
+            if not limit:
+                raise EventStreamError("Live updates need async workers (SERVER_MODE=async)")
+        sub = Subscription(frozenset(ward_ids) if ward_ids is not None else None)
+        with self._lock:
+            if self._count >= limit:
+                raise EventStreamError("Too many open streams, try again later")
+            if sub.ward_ids is None:
+                self._all.add(sub)
+            else:
+                for ward_id in sub.ward_ids:
+                    self._by_ward.setdefault(ward_id, set()).add(sub)
+            self._count += 1
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            if sub.ward_ids is None:
+                if sub not in self._all:
+                    return
+                self._all.discard(sub)
+            else:
+                found = False
+                for ward_id in sub.ward_ids:
+                    subs = self._by_ward.get(ward_id)
+                    if subs and sub in subs:
+                        found = True
+                        subs.discard(sub)
+                        if not subs:
+                            del self._by_ward[ward_id]
+                if not found:
+                    return
+            self._count -= 1
+
+    def dispatch(self, payload):
+        """Fans one NOTIFY payload out to the subscribers of its ward."""
+        try:
+            event = json.loads(payload)
+            ward_id = event["ward_id"]
+        except (ValueError, KeyError, TypeError):
+            log.warning("Ignoring malformed complaint event: %.200s", payload)
+            return
+        with self._lock:
+            targets = list(self._by_ward.get(ward_id, ())) + list(self._all)
+            self._stats["received"] += 1
+        overflows = 0
+        for sub in targets:
+            was_overflowed = sub.overflowed
+            sub.push(event, self.queue_size)
+            overflows += sub.overflowed and not was_overflowed
+        with self._lock:
+            self._stats["delivered"] += len(targets)
+            self._stats["overflows"] += overflows
+
+    def _catch_up_all(self):
+        """After a gap in the listener, every stream re-reads from the table."""
+        with self._lock:
+            subs = set(self._all)
+            for ward_subs in self._by_ward.values():
+                subs.update(ward_subs)
+        for sub in subs:
+            sub.overflowed = True
+            sub._ready.set()
+
+    def _run(self):
+        backoff = 1
+        next_prune = time.monotonic()
+        while True:
+            conn = None
+            try:
+                conn = get_listen_connection()
+                conn.cursor().execute(f"LISTEN {EVENTS_CHANNEL};")
+                # Streams opened before LISTEN, or across a reconnect, may
+                # have missed events: they re-read from the table
+                self._catch_up_all()
+                self._connected, backoff = True, 1
+                while True:
+                    if time.monotonic() >= next_prune:
+                        self._prune(conn)
+                        next_prune = time.monotonic() + EVENTS_PRUNE_INTERVAL
+                    if select.select([conn], [], [], EVENTS_HEARTBEAT) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.dispatch(conn.notifies.pop(0).payload)
+            except Exception as e:
+                log.warning("Complaint event listener failed: %s", e)
+            finally:
+                self._connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            with self._lock:
+                self._stats["reconnects"] += 1
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _prune(self, conn):
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM complaint_events WHERE created_at < now() - %s * interval '1 hour';",
+                        (EVENTS_RETENTION_HOURS,))
+            with self._lock:
+                self._stats["pruned"] += cur.rowcount
+
+    def replay(self, ward_ids, after, limit=EVENTS_REPLAY_MAX, lag=EVENTS_REPLAY_LAG):
+        """
+        Events for `ward_ids` (None: every ward) after a floor `lag` seconds
+        before event `after` (see Ordering above), oldest first, including
+        ones the caller may have sent already. Returns (events, last_id,
+        complete); when more than `limit` are waiting, complete is False
+        and last_id is the newest event id.
+        """
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute(REPLAY_FLOOR_SQL, {"after": after, "lag": lag})
+            floor = cur.fetchone()[0]
+            if ward_ids is None:
+                cur.execute("""
+                    SELECT id, ward_id, kind, data FROM complaint_events
+                    WHERE id > %s ORDER BY id LIMIT %s;
+                """, (floor, limit + 1))
+            else:
+                cur.execute("""
+                    SELECT id, ward_id, kind, data FROM complaint_events
+                    WHERE ward_id = ANY(%s::int[]) AND id > %s ORDER BY id LIMIT %s;
+                """, (sorted(ward_ids), floor, limit + 1))
+            rows = cur.fetchall()
+            if len(rows) > limit:
+                cur.execute("SELECT coalesce(max(id), 0) FROM complaint_events;")
+                return [], max(cur.fetchone()[0], after), False
+            events = [{"id": row[0], "ward_id": row[1], "kind": row[2], "data": row[3]} for row in rows]
+            return events, max([after] + [e["id"] for e in events]), True
+        finally:
+            conn.rollback()
+            cur.close()
+            conn.close()
+
+    def last_event_id(self):
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT coalesce(max(id), 0) FROM complaint_events;")
+            return cur.fetchone()[0]
+        finally:
+            conn.rollback()
+            cur.close()
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            return {"listening": self._connected and self._pid == os.getpid(),
+                    "subscribers": self._count, "wards": len(self._by_ward), **self._stats}
+
+
+def format_event(event, stream_id=None):
+    """
+    One SSE message. `stream_id` (default: the event's id) is what the
+    client sends back as Last-Event-ID: the newest id the stream has sent,
+    which an out-of-order event must not move backwards.
+    """
+    # ward_id is the stream's ward: for `removed` the complaint has moved on
+    data = json.dumps({"ward_id": event["ward_id"], "complaint": event["data"]}, separators=(',', ':'))
+    return f"id: {event['id'] if stream_id is None else stream_id}\nevent: {event['kind']}\ndata: {data}\n\n"
+
+
+def event_stream(hub, sub, last_id=None, heartbeat=EVENTS_HEARTBEAT, seen_size=EVENTS_SEEN_MAX):
+    """
+    SSE body for one subscription. With `last_id` (Last-Event-ID) the
+    events missed since then are replayed first; without it the stream
+    starts from now. Every event is sent once per stream whatever order
+    its id arrives in (see Ordering above). Unsubscribes when the client
+    goes away.
+    """
+    seen = SeenIds(seen_size)
+    try:
+        yield f"retry: {EVENTS_CLIENT_RETRY_MS}\n\n"
+        if last_id is None:
+            # Anything committed after this reaches the queue
+            last_id = hub.last_event_id()
+        else:
+            # The client has this one; the lagged replay would re-read it
+            seen.add(last_id)
+            sub.overflowed = True
+        while True:
+            if sub.overflowed:
+                # Catch up from the table; the queue may hold some of the
+                # same events, which are skipped as seen below
+                sub.overflowed = False
+                events, newest, complete = hub.replay(sub.ward_ids, last_id)
+                if not complete:
+                    last_id = newest
+                    yield f"id: {last_id}\nevent: reset\ndata: {{}}\n\n"
+                for event in events:
+                    if event["id"] not in seen:
+                        seen.add(event["id"])
+                        last_id = max(last_id, event["id"])
+                        yield format_event(event, last_id)
+                last_id = max(last_id, newest)
+            events = sub.wait(heartbeat)
+            if not events and not sub.overflowed:
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                if event["id"] not in seen:
+                    seen.add(event["id"])
+                    last_id = max(last_id, event["id"])
+                    yield format_event(event, last_id)
+    finally:
+        hub.unsubscribe(sub)
+
+
+event_hub = EventHub()
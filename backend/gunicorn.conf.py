@@ -0,0 +1,35 @@
+"""
+Gunicorn settings:  gunicorn -c gunicorn.conf.py app:app
+
+SERVER_MODE=sync (default) runs the usual sync workers (gthread when
+WEB_THREADS > 1): one OS thread per in-flight request.
+
+SERVER_MODE=async runs the same app on gevent workers: every request is a
+greenlet, sockets (Supabase Storage uploads included) are made cooperative,
+and psycopg2 is switched to its non-blocking mode through psycogreen, so a
+request waiting on Postgres or storage no longer holds an OS thread. One
+worker then serves up to ASYNC_WORKER_CONNECTIONS concurrent requests;
+raise DB_POOL_MAX with it, since requests still share the worker's pool.
+Needs the optional gevent and psycogreen packages (requirements-async.txt).
+"""
+import os
+
+SERVER_MODE = os.getenv("SERVER_MODE", "sync").lower()
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_WORKERS", str(os.cpu_count() or 1)))
+timeout = int(os.getenv("WEB_TIMEOUT", "60"))
+
+if SERVER_MODE == 'async':
+    worker_class = 'gevent'
+    worker_connections = int(os.getenv("ASYNC_WORKER_CONNECTIONS", "1000"))
+else:
+    threads = int(os.getenv("WEB_THREADS", "1"))
+    worker_class = 'gthread' if threads > 1 else 'sync'
+
+
+def post_fork(server, worker):
+    if SERVER_MODE == 'async':
+        # Route libpq's waits through the gevent hub instead of blocking it
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
@@ -1,8 +1,17 @@
+import io
+import logging
 import psycopg2
-from PIL import Image
-from PIL.ExifTags import TAGS, GPSTAGS
+import psycopg2.extensions
+import threading
+import time
+from collections import deque
+from PIL import Image, ImageOps
+from PIL.ExifTags import GPSTAGS
 from dotenv import load_dotenv
 import os
+import metrics
+
+log = logging.getLogger(__name__)
 
 # ---------------------------------------------------------
 # CONFIGURATION
@@ -14,22 +23,286 @@ DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 
+# Connection pool sizing (per worker process)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# Seconds a request may wait for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Connections idle for longer than this are pinged before being handed out
+DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "30"))
+
 # ---------------------------------------------------------
-# HELPER 1: CONNECT TO DATABASE
+# HELPER 1: CONNECT TO DATABASE (Pooled)
 # ---------------------------------------------------------
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up within DB_POOL_TIMEOUT."""
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor that records every statement's latency in metrics (by statement)."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            result = super().execute(query, vars)
+        except Exception:
+            metrics.observe_query(query, time.perf_counter() - start, failed=True)
+            raise
+        metrics.observe_query(query, time.perf_counter() - start)
+        return result
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            result = super().executemany(query, vars_list)
+        except Exception:
+            metrics.observe_query(query, time.perf_counter() - start, failed=True)
+            raise
+        metrics.observe_query(query, time.perf_counter() - start)
+        return result
+
+
+class PooledConnection:
+    """
+    Thin proxy around a psycopg2 connection. Everything is delegated to the
+    real connection except close(), which hands it back to the pool so the
+    existing `conn.close()` calls in the routes keep working unchanged.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.putconn(self._conn)
+            self._conn = None
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise psycopg2.InterfaceError("connection already returned to pool")
+        return getattr(conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Bounded LIFO pool of psycopg2 connections shared by every thread of a
+    worker process. Checkout blocks (up to `timeout`) while the pool is at
+    `maxconn`, and connections that have sat idle are health-checked first.
+    """
+
+    def __init__(self, minconn, maxconn, timeout, ping_after, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = max(maxconn, 1)
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.pid = os.getpid()
+        self._connect_kwargs = connect_kwargs
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, last_used)
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        # Warm up the minimum number of connections
+        for _ in range(min(minconn, self.maxconn)):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        return psycopg2.connect(**self._connect_kwargs)
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        conn, last_used = None, None
+
+        with self._cond:
+            self._waiting += 1
+            try:
+                while not self._idle and self._size >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    self._size += 1
+                self._in_use += 1
+                self._checkouts += 1
+            finally:
+                self._waiting -= 1
+                waited = time.monotonic() - start
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+
+        # Connect / ping outside the lock so other threads are not blocked
+        try:
+            if conn is not None and not self._is_healthy(conn, last_used):
+                self._close_quietly(conn)
+                with self._cond:
+                    self._discarded += 1
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        return PooledConnection(self, conn)
+
+    def putconn(self, conn):
+        discard = bool(conn.closed)
+        if not discard:
+            try:
+                status = conn.info.transaction_status
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    discard = True
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    # Routes that return early never commit; drop their work
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._size -= 1
+                self._discarded += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+        if discard:
+            self._close_quietly(conn)
+
+    def closeall(self):
+        with self._cond:
+            idle = [c for c, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+        for conn in idle:
+            self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pid": self.pid,
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "open": self._size,
+                "idle": len(self._idle),
+                "checked_out": self._in_use,
+                "waiting": self._waiting,
+                "checkouts_total": self._checkouts,
+                "timeouts_total": self._timeouts,
+                "discarded_total": self._discarded,
+                "wait_time_total_s": round(self._wait_total, 6),
+                "wait_time_max_s": round(self._wait_max, 6),
+                "wait_time_avg_s": round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """
+    Returns this process's pool, creating it lazily. Under gunicorn's
+    pre-fork model each worker gets its own pool; a pool inherited from the
+    master across fork() is abandoned (never closed, since the sockets are
+    shared with the parent) and rebuilt in the child.
+    """
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = ConnectionPool(
+                DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_PING_AFTER,
+                host=DB_HOST,
+                database=DB_NAME,
+                user=DB_USER,
+                password=DB_PASS,
+                port=DB_PORT,
+                cursor_factory=TimedCursor
+            )
+        return _pool
+
 def get_db_connection():
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        database=DB_NAME,
-        user=DB_USER,
-        password=DB_PASS,
-        port=DB_PORT
-    )
+    return get_pool().getconn()
+
+def get_listen_connection():
+    """
+    A dedicated autocommit connection outside the pool, for LISTEN: it stays
+    open for the life of the process and must not be handed to requests.
+    """
+    conn = psycopg2.connect(host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASS, port=DB_PORT)
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
     return conn
 
+def get_pool_stats():
+    pool = _pool
+    if pool is None or pool.pid != os.getpid():
+        return {"pid": os.getpid(), "open": 0, "idle": 0, "checked_out": 0, "waiting": 0}
+    return pool.stats()
+
+def gevent_patched():
+    """True when gevent has monkey-patched threading in this process (SERVER_MODE=async)."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
 # ---------------------------------------------------------
 # HELPER 2: EXTRACT GPS FROM IMAGE (Forensic Logic)
 # ---------------------------------------------------------
+GPS_IFD_TAG = 0x8825
+
 def get_decimal_from_dms(dms, ref):
     degrees = dms[0]
     minutes = dms[1]
@@ -39,74 +312,118 @@ def get_decimal_from_dms(dms, ref):
         decimal = -decimal
     return decimal
 
-def extract_gps(image_path):
+def extract_gps_from_image(image):
+    """
+    Reads GPS coordinates from an already opened (not decoded) image.
+    Only the EXIF header parsed by Image.open() is touched, never the pixels.
+    """
     try:
-        image = Image.open(image_path)
-        exif_data = image._getexif()
-        
-        if not exif_data:
+        gps_ifd = image.getexif().get_ifd(GPS_IFD_TAG)
+        if not gps_ifd:
             return None # Reject: No Metadata
 
-        gps_info = {}
-        for tag, value in exif_data.items():
-            tag_name = TAGS.get(tag, tag)
-            if tag_name == "GPSInfo":
-                for t, v in value.items():
-                    sub_tag = GPSTAGS.get(t, t)
-                    gps_info[sub_tag] = v
-        
+        gps_info = {GPSTAGS.get(t, t): v for t, v in gps_ifd.items()}
+
         # Convert to Decimal Lat/Lon
         if 'GPSLatitude' in gps_info and 'GPSLongitude' in gps_info:
-            lat = get_decimal_from_dms(gps_info['GPSLatitude'], gps_info['GPSLatitudeRef'])
-            lon = get_decimal_from_dms(gps_info['GPSLongitude'], gps_info['GPSLongitudeRef'])
-            return lat, lon
+            lat = get_decimal_from_dms(gps_info['GPSLatitude'], gps_info.get('GPSLatitudeRef'))
+            lon = get_decimal_from_dms(gps_info['GPSLongitude'], gps_info.get('GPSLongitudeRef'))
+            return float(lat), float(lon)
         return None 
 
     except Exception as e:
-        print(f"Forensic Error: {e}")
+        log.warning("Forensic Error: %s", e)
         return None
 
 # ---------------------------------------------------------
-# HELPER3: COMPRESS IMAGE
+# HELPER 3: IN-MEMORY IMAGE HANDLING
 # ---------------------------------------------------------
-def compress_image(image_path, quality=80):
+# Formats re-encoded as themselves; anything else (MPO, TIFF, ...) becomes JPEG
+ENCODABLE_FORMATS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+def open_image(data):
+    """Opens an image from bytes. Only the header is parsed until pixels are needed."""
+    return Image.open(io.BytesIO(data))
+
+def compress_image_to_buffer(image, out, quality=80):
     """
-    Reads an image from disk, compresses it, and overwrites 
-    the original file.
+    Decodes `image` (once) and encodes it into `out`, a BytesIO that callers
+    reuse between uploads. Returns (format, extension, content_type).
     """
+    img_format = image.format if image.format in ENCODABLE_FORMATS else 'JPEG'
+
+    # JPEG cannot store alpha or palette images
+    if img_format == 'JPEG' and image.mode not in ('RGB', 'L', 'CMYK'):
+        image = image.convert('RGB')
+
+    out.seek(0)
+    out.truncate()
+    image.save(out, format=img_format, quality=quality, optimize=True)
+    return img_format, ENCODABLE_FORMATS[img_format], Image.MIME[img_format]
+
+def downscale(image, max_dimension):
+    """
+    Shrinks `image` in place so its longest side is at most max_dimension,
+    and turns it upright: the EXIF Orientation tag is applied to the pixels
+    (and dropped), since the re-encoded file carries no EXIF.
+    JPEGs are first decoded at a reduced scale (1/2, 1/4, 1/8) via draft(),
+    so a 12 MP photo bound for 1280 px never has its full pixels decoded.
+    The bound is square, so the reduced scale is the same either way up.
+    Must be called before the pixels are loaded.
+    """
+    width, height = image.size
+    if max(width, height) > max_dimension:
+        ratio = max_dimension / max(width, height)
+        image.draft(image.mode, (int(width * ratio), int(height * ratio)))
+    # Rotate before resizing; loads the pixels (at the draft scale)
+    ImageOps.exif_transpose(image, in_place=True)
+    image.thumbnail((max_dimension, max_dimension))
+    return image
+
+# ---------------------------------------------------------
+# HELPER 4: PERCEPTUAL HASH (near-duplicate photos)
+# ---------------------------------------------------------
+def image_dhash(image):
+    """
+    64-bit difference hash of an opened image. JPEGs are decoded at a
+    reduced scale via draft(), so this costs a fraction of a full decode.
+    Note: draft() changes `image` in place; hash after anything else that
+    needs the full-resolution pixels.
+    """
+    image.draft('L', (64, 64))
+    small = image.convert('L').resize((9, 8), Image.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+def hash_to_db(value):
+    """Unsigned 64-bit hash -> signed BIGINT."""
+    return value - (1 << 64) if value is not None and value >= (1 << 63) else value
+
+def hash_from_db(value):
+    """Signed BIGINT -> unsigned 64-bit hash."""
+    return value & ((1 << 64) - 1) if value is not None else None
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+def inspect_upload(data):
+    """(gps, image_hash) for uploaded image bytes; gps is None when missing or unreadable."""
+    image_hash = None
     try:
-        # Get the original file size for comparison
-        original_size = os.path.getsize(image_path)
-        
-        img = Image.open(image_path)
-        
-        # Convert transparent images to RGB (JPEG requirement)
-        if img.mode in ('RGBA', 'P'):
-            img = img.convert('RGB')
-        
-        # Determine format based on file extension
-        # If normalizing everything to JPEG is desired, set format='JPEG' below.
-        filename = os.path.basename(image_path)
-        _, ext = os.path.splitext(filename)
-        
-        # PIL format names are uppercase (e.g., 'JPEG', 'PNG')
-        img_format = ext.strip('.').upper()
-        if img_format == 'JPG': img_format = 'JPEG'
-        
-        # --- KEY COMPRESSION STEP ---
-        # Save back to the same path with reduced quality
-        img.save(image_path, format=img_format, quality=quality, optimize=True)
-        
-        # Verify compression was successful
-        new_size = os.path.getsize(image_path)
-        
-        # Print compression statistics to console
-        reduction = original_size - new_size
-        print(f"Compression Complete: Original: {original_size} bytes, Compressed: {new_size} bytes. Reduced by {reduction} bytes ({reduction/original_size*100:.2f}%)")
-
-        return True
-    
+        with open_image(data) as image:
+            gps = extract_gps_from_image(image)
+            # Hash last: draft() reduces the decode scale in place
+            try:
+                image_hash = image_dhash(image)
+            except Exception as e:
+                log.warning("Image hash failed: %s", e)
     except Exception as e:
-        print(f"Compression Error: {e}")
-        # Log error but return False so the app can continue if required
-        return False
+        log.warning("Forensic Error: %s", e)
+        return None, None
+    return gps, image_hash
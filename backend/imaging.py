@@ -0,0 +1,368 @@
+"""
+Image processing service: CPU-bound Pillow work on a pool of processes.
+
+Reading EXIF + hashing an upload (request path) and re-encoding it for
+storage (pipeline workers) run in IMAGE_PROCESSES worker processes, so they
+neither block a request thread nor contend for the GIL with the rest of the
+worker. The pool is:
+  * started lazily in each web worker and pre-warmed (every process spawned
+    and Pillow's plugins loaded) on first use,
+  * bounded: at most IMAGE_TASK_QUEUE tasks queued or running; callers wait
+    up to IMAGE_QUEUE_WAIT seconds for a slot, then get ImageServiceBusy,
+  * time-limited: a task running past IMAGE_TASK_TIMEOUT raises
+    ImageTaskTimeout and its process is replaced,
+  * memory-guarded: each process has an address-space limit
+    (IMAGE_WORKER_MEMORY_MB) and refuses images over IMAGE_MAX_PIXELS, so a
+    decompression bomb fails one task instead of the host.
+
+IMAGE_PROCESSES=0 runs everything inline on the calling thread.
+
+Under gevent (SERVER_MODE=async) the pool's feeder thread is a greenlet, and
+its blocking write of a large upload into a full pipe stops the whole hub,
+including the greenlet that reads results back: the pool deadlocks. There,
+uploads are spooled to files in IMAGE_SPOOL_DIR and only their paths travel
+through the pipe.
+"""
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+from helper import gevent_patched, inspect_upload, open_image, downscale, compress_image_to_buffer
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+try:
+    import pillow_avif  # noqa: F401  registers the AVIF plugin on older Pillow
+except ImportError:  # optional dependency
+    pass
+
+IMAGE_PROCESSES = int(os.getenv("IMAGE_PROCESSES", str(os.cpu_count() or 1)))
+# Tasks queued or running at once (each holds an upload in memory)
+IMAGE_TASK_QUEUE = int(os.getenv("IMAGE_TASK_QUEUE", str(max(IMAGE_PROCESSES, 1) * 4)))
+IMAGE_QUEUE_WAIT = float(os.getenv("IMAGE_QUEUE_WAIT", "5"))
+IMAGE_TASK_TIMEOUT = float(os.getenv("IMAGE_TASK_TIMEOUT", "30"))
+# Address-space limit per image process (0 = unlimited)
+IMAGE_WORKER_MEMORY_MB = int(os.getenv("IMAGE_WORKER_MEMORY_MB", "1024"))
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", "64000000"))
+# Stored images are downscaled so their longest side fits this. Half of a
+# typical 4000 px phone photo lets draft() do almost all of the reduction
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "2000"))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+# Feed / card renditions (widths in px), generated alongside the main image
+IMAGE_RENDITION_WIDTHS = tuple(sorted(
+    int(w) for w in os.getenv("IMAGE_RENDITION_WIDTHS", "160,480,1280").split(',') if w.strip()
+))
+IMAGE_RENDITION_QUALITY = int(os.getenv("IMAGE_RENDITION_QUALITY", "70"))
+# Where uploads are handed to the processes under gevent (memory-backed if possible)
+IMAGE_SPOOL_DIR = os.getenv("IMAGE_SPOOL_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+
+# Rendition formats, preferred first; JPEG is the fallback every client
+# decodes. AVIF needs a Pillow build (or the pillow-avif-plugin package)
+# that can write it.
+RENDITION_FORMATS = [
+    ('AVIF', '.avif', 'image/avif'),
+    ('WEBP', '.webp', 'image/webp'),
+    ('JPEG', '.jpg', 'image/jpeg'),
+]
+
+
+class ImageServiceError(Exception):
+    """The image could not be processed for reasons other than its content."""
+
+
+class ImageServiceBusy(ImageServiceError):
+    """No task slot freed up within IMAGE_QUEUE_WAIT seconds."""
+
+
+class ImageTaskTimeout(ImageServiceError):
+    """A task ran longer than IMAGE_TASK_TIMEOUT seconds."""
+
+
+# ---- tasks (run inside the image processes) ----
+
+def _init_process(max_pixels, memory_mb, owner_pid):
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    if memory_mb and resource is not None:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    Image.init()  # load every format plugin once, not on the first upload
+    threading.Thread(target=_exit_with_owner, args=(owner_pid,), name="owner-watch", daemon=True).start()
+
+
+def _exit_with_owner(owner_pid):
+    # An idle pool process waits on a queue it also holds the write end of,
+    # so it never notices a web worker killed without shutdown(); poll instead
+    while True:
+        time.sleep(1)
+        try:
+            os.kill(owner_pid, 0)
+        except ProcessLookupError:
+            os._exit(0)
+        except PermissionError:
+            pass
+
+
+def _warm():
+    return os.getpid()
+
+
+class _Spooled:
+    """Upload bytes written to a file; only the path is pickled."""
+
+    def __init__(self, data, directory):
+        fd, self.path = tempfile.mkstemp(prefix="civicsnap-image-", dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def remove(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _run_spooled(fn, spooled, *args):
+    return fn(spooled.read(), *args)
+
+
+def inspect_task(data):
+    """(gps, image_hash) for upload bytes."""
+    return inspect_upload(data)
+
+
+def encode_task(data, max_dimension, quality):
+    """Downscaled, re-encoded image as (bytes, extension, content_type)."""
+    out = io.BytesIO()
+    with open_image(data) as image:
+        downscale(image, max_dimension)
+        _, extension, content_type = compress_image_to_buffer(image, out, quality=quality)
+    return out.getvalue(), extension, content_type
+
+
+def rendition_formats():
+    """The RENDITION_FORMATS this Pillow build can write."""
+    Image.init()
+    return [f for f in RENDITION_FORMATS if f[0] in Image.SAVE]
+
+
+def ingest_task(data, max_dimension, quality, widths, rendition_quality):
+    """
+    Everything the pipeline stores for one upload, from a single decode:
+    (main_bytes, extension, content_type, renditions) where renditions is
+    [(width, height, extension, content_type, bytes)], one per width that
+    does not upscale (the smallest always) and per writable format.
+    """
+    out = io.BytesIO()
+    with open_image(data) as image:
+        downscale(image, max_dimension)
+        _, extension, content_type = compress_image_to_buffer(image, out, quality=quality)
+        main = out.getvalue()
+
+        base = image if image.mode in ('RGB', 'L') else image.convert('RGB')
+        formats = rendition_formats()
+        renditions = []
+        # Largest first, each resized from the previous one
+        for width in sorted(widths, reverse=True):
+            if width >= base.width and width != min(widths):
+                continue
+            if width < base.width:
+                base = base.copy()
+                base.thumbnail((width, base.height))
+            for img_format, ext, mime in formats:
+                out = io.BytesIO()
+                base.save(out, format=img_format, quality=rendition_quality)
+                renditions.append((base.width, base.height, ext, mime, out.getvalue()))
+    return main, extension, content_type, renditions
+
+
+# ---- service (runs in the web worker) ----
+
+class ImageService:
+    def __init__(self, processes=IMAGE_PROCESSES, queue_size=IMAGE_TASK_QUEUE, queue_wait=IMAGE_QUEUE_WAIT,
+                 task_timeout=IMAGE_TASK_TIMEOUT, memory_mb=IMAGE_WORKER_MEMORY_MB, max_pixels=IMAGE_MAX_PIXELS):
+        self.processes = max(processes, 0)
+        self.queue_size = max(queue_size, 1)
+        self.queue_wait = queue_wait
+        self.task_timeout = task_timeout
+        self.memory_mb = memory_mb
+        self.max_pixels = max_pixels
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+        self._slots = None
+        self._spool = False
+        self._stats = {"completed": 0, "failed": 0, "timeouts": 0, "busy": 0, "restarts": 0}
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._slots = threading.BoundedSemaphore(self.queue_size)
+            self._spool = bool(self.processes) and gevent_patched()
+            if self.processes:
+                self._executor = self._new_executor()
+            else:
+                # Inline mode still applies the decompression-bomb limit
+                Image.MAX_IMAGE_PIXELS = self.max_pixels
+            self._pid = os.getpid()
+
+    def _new_executor(self):
+        # forkserver/spawn: forking a threaded web worker can copy held locks
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=context,
+            initializer=_init_process,
+            initargs=(self.max_pixels, self.memory_mb, os.getpid())
+        )
+        # Pre-warm: spawn every process now rather than on the first uploads
+        for _ in range(self.processes):
+            executor.submit(_warm)
+        return executor
+
+    def start(self):
+        self._ensure_started()
+
+    def _restart(self, broken):
+        """Replaces the pool (a task hung or a process died)."""
+        with self._lock:
+            if self._executor is not broken:
+                return  # another thread already replaced it
+            self._stats["restarts"] += 1
+            self._executor = self._new_executor()
+        # Kill stuck processes; shutdown() alone would wait for them
+        for process in list((getattr(broken, '_processes', None) or {}).values()):
+            process.terminate()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, data, *args):
+        self._ensure_started()
+        if not self._slots.acquire(timeout=self.queue_wait):
+            with self._lock:
+                self._stats["busy"] += 1
+            raise ImageServiceBusy(f"No image processing slot free after {self.queue_wait}s")
+        if not self.processes:
+            return _InlineTask(self._slots, fn, (data,) + args)
+        executor = self._executor
+        spooled = None
+        try:
+            if self._spool:
+                spooled = _Spooled(data, IMAGE_SPOOL_DIR)
+                future = executor.submit(_run_spooled, fn, spooled, *args)
+            else:
+                future = executor.submit(fn, data, *args)
+        except BrokenProcessPool:
+            self._release(spooled)
+            self._restart(executor)
+            raise ImageServiceError("Image processing pool was restarted")
+        except Exception:
+            self._release(spooled)
+            raise
+        future.add_done_callback(lambda _: self._release(spooled))
+        return (executor, future)
+
+    def _release(self, spooled):
+        if spooled is not None:
+            spooled.remove()
+        self._slots.release()
+
+    def _result(self, task):
+        if isinstance(task, _InlineTask):
+            try:
+                result = task.run()
+            except Exception:
+                self._count("failed")
+                raise
+            self._count("completed")
+            return result
+
+        executor, future = task
+        try:
+            result = future.result(timeout=self.task_timeout)
+        except FutureTimeout:
+            self._count("timeouts")
+            if not future.cancel():
+                self._restart(executor)
+            raise ImageTaskTimeout(f"Image task exceeded {self.task_timeout}s")
+        except BrokenProcessPool:
+            self._count("failed")
+            # A process died (e.g. killed for memory); the pool is unusable
+            self._restart(executor)
+            raise ImageServiceError("Image processing process died")
+        except Exception:
+            self._count("failed")
+            raise
+        self._count("completed")
+        return result
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    # ---- public API ----
+
+    def inspect(self, data):
+        """(gps, image_hash) for one upload."""
+        return self._result(self._submit(inspect_task, data))
+
+    def inspect_many(self, uploads):
+        """inspect() for a batch, processed in parallel; results in order."""
+        tasks = [self._submit(inspect_task, data) for data in uploads]
+        return [self._result(task) for task in tasks]
+
+    def encode(self, data, max_dimension=IMAGE_MAX_DIMENSION, quality=IMAGE_QUALITY):
+        """Downscaled, re-encoded upload as (bytes, extension, content_type)."""
+        return self._result(self._submit(encode_task, data, max_dimension, quality))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor, self._pid = self._executor, None, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def ingest(self, data, max_dimension=IMAGE_MAX_DIMENSION, quality=IMAGE_QUALITY,
+               widths=IMAGE_RENDITION_WIDTHS, rendition_quality=IMAGE_RENDITION_QUALITY):
+        """Main image plus renditions (see ingest_task)."""
+        return self._result(self._submit(ingest_task, data, max_dimension, quality, widths, rendition_quality))
+
+    def stats(self):
+        with self._lock:
+            return {"processes": self.processes, "queue_size": self.queue_size, **self._stats}
+
+
+class _InlineTask:
+    """Task for IMAGE_PROCESSES=0: runs on the caller's thread at submission."""
+
+    def __init__(self, slots, fn, args):
+        self.result = self.error = None
+        try:
+            self.result = fn(*args)
+        except Exception as e:
+            self.error = e
+        finally:
+            slots.release()
+
+    def run(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+image_service = ImageService()
@@ -0,0 +1,179 @@
+"""
+Shared query building for the complaint listing endpoints.
+
+Every listing is keyset-paginated on (created_at, id) newest first:
+    ?limit=50&cursor=<next_cursor from the previous page>
+Optional parameters are pushed down into SQL:
+    ?fields=id,status,created_at     column projection
+    ?status=pending,in_progress      status filter
+    ?category=Pothole,Garbage        category filter
+    ?since=2024-01-01&until=...      created_at range (ISO 8601)
+"""
+import base64
+import datetime
+import json
+import os
+
+PAGE_LIMIT_DEFAULT = int(os.getenv("PAGE_LIMIT_DEFAULT", "50"))
+PAGE_LIMIT_MAX = int(os.getenv("PAGE_LIMIT_MAX", "500"))
+
+# Output field -> SQL expression (the `c` alias is the complaints table)
+COMPLAINT_FIELDS = {
+    "id": "c.id",
+    "category": "c.category",
+    "description": "c.description",
+    "status": "c.status",
+    "image_url": "c.image_url",
+    "image_status": "c.image_status",
+    # srcset-ready renditions: {"src", "width", "height", "sources": [{"type", "srcset"}]}
+    "images": "c.image_variants",
+    "created_at": "c.created_at",
+    "phone_number": "c.phone_number",
+    "ward_id": "c.ward_id",
+    "latitude": "ST_Y(c.geom)",
+    "longitude": "ST_X(c.geom)",
+    "upvotes": "COALESCE(c.upvotes, 0)",
+}
+
+
+class ListingError(ValueError):
+    """Invalid listing parameters; the message is safe to return to clients."""
+
+
+def format_timestamp(db_date):
+    """ISO 8601 string with an explicit UTC marker, or None."""
+    if not isinstance(db_date, datetime.datetime):
+        return None
+    iso_date = db_date.isoformat()
+    if not iso_date.endswith('Z') and '+' not in iso_date:
+        iso_date += 'Z'
+    return iso_date
+
+
+def encode_cursor(created_at, row_id):
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ListingError("Invalid cursor")
+
+
+def _parse_list(value):
+    return [v.strip() for v in value.split(',') if v.strip()] if value else []
+
+
+def _parse_date(name, value):
+    try:
+        parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ListingError(f"Invalid {name} date")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+
+class ComplaintListing:
+    """
+    Parses listing query parameters for one endpoint and builds the paged
+    SELECT. `default_fields` is the payload the endpoint returned before
+    projection existed, and also the set of fields clients may request.
+    """
+
+    def __init__(self, args, default_fields):
+        try:
+            limit = int(args.get('limit', PAGE_LIMIT_DEFAULT))
+        except ValueError:
+            raise ListingError("limit must be an integer")
+        if limit < 1:
+            raise ListingError("limit must be positive")
+        self.limit = min(limit, PAGE_LIMIT_MAX)
+
+        requested = _parse_list(args.get('fields'))
+        unknown = [f for f in requested if f not in default_fields]
+        if unknown:
+            raise ListingError(f"Unknown fields: {', '.join(unknown)}")
+        self.fields = requested or list(default_fields)
+
+        self.cursor = self.decode_cursor(args['cursor']) if args.get('cursor') else None
+        self.statuses = [s.lower() for s in _parse_list(args.get('status'))]
+        self.categories = _parse_list(args.get('category'))
+        self.since = _parse_date('since', args['since']) if args.get('since') else None
+        self.until = _parse_date('until', args['until']) if args.get('until') else None
+
+    # Cursor of the sort key; the first two selected columns of every row
+    def decode_cursor(self, cursor):
+        return decode_cursor(cursor)
+
+    def encode_cursor(self, row):
+        return encode_cursor(row[0], row[1])
+
+    def query(self, where=None, params=(), paged=True):
+        """
+        Returns (sql, params). `where` is the endpoint's own scoping
+        predicate (e.g. "c.ward_id = %s") with its `params`. With
+        paged=False the limit and cursor are ignored (full exports).
+        """
+        # created_at and id are always selected to build the next cursor
+        select = ", ".join(COMPLAINT_FIELDS[f] for f in self.fields)
+        conditions, values = self.filters(where, params)
+        if self.cursor and paged:
+            conditions.append("(c.created_at, c.id) < (%s, %s)")
+            values.extend(self.cursor)
+
+        sql = f"""
+            SELECT c.created_at, c.id, {select}
+            FROM complaints c
+            {"WHERE " + " AND ".join(conditions) if conditions else ""}
+            ORDER BY c.created_at DESC, c.id DESC
+            {"LIMIT %s" if paged else ""};
+        """
+        if paged:
+            # One extra row tells us whether another page exists
+            values.append(self.limit + 1)
+        return sql, values
+
+    def filters(self, where=None, params=()):
+        """(conditions, values) for the scoping predicate plus the filter parameters."""
+        conditions, values = [], []
+        if where:
+            conditions.append(where)
+            values.extend(params)
+        if self.statuses:
+            conditions.append("lower(c.status) = ANY(%s)")
+            values.append(self.statuses)
+        if self.categories:
+            conditions.append("c.category = ANY(%s)")
+            values.append(self.categories)
+        if self.since:
+            conditions.append("c.created_at >= %s")
+            values.append(self.since)
+        if self.until:
+            conditions.append("c.created_at < %s")
+            values.append(self.until)
+        return conditions, values
+
+    def format_row(self, row):
+        item = {}
+        for name, value in zip(self.fields, row[2:]):
+            if name == 'id':
+                value = str(value)
+            elif name == 'status':
+                value = value.lower() if value else 'pending'
+            elif name == 'created_at':
+                value = format_timestamp(value)
+            item[name] = value
+        return item
+
+    def page(self, records):
+        """Turns fetched rows into (items, next_cursor)."""
+        has_more = len(records) > self.limit
+        records = records[:self.limit]
+
+        items = [self.format_row(row) for row in records]
+
+        next_cursor = self.encode_cursor(records[-1]) if has_more else None
+        return items, next_cursor
@@ -0,0 +1,284 @@
+"""
+Request, stage and database metrics, exposed in Prometheus text format.
+
+    civicsnap_http_request_duration_seconds{route, method, status}   histogram
+    civicsnap_http_request_size_bytes{route}                         histogram
+    civicsnap_http_response_size_bytes{route}                        histogram
+    civicsnap_http_errors_total{route, status}                       counter (5xx)
+    civicsnap_stage_duration_seconds{stage}                          histogram
+    civicsnap_db_query_duration_seconds{statement}                   histogram
+    civicsnap_db_query_errors_total{statement}                       counter
+
+plus gauges from registered collectors (connection pool, image pipeline,
+vote buffer). Metrics are kept per worker process; scrape every worker or
+run a single worker per container.
+
+Stages are timed with `with span("name"):` anywhere in a request or
+background job. With LOG_FORMAT=json every request is also logged as one
+JSON line carrying its route, status, duration, sizes and stage timings.
+"""
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+log = logging.getLogger("civicsnap")
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # labelvalues -> [per-bucket counts (+Inf last), sum, count]
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(k, list(v[0]), v[1], v[2]) for k, v in self._series.items()]
+        for labelvalues, counts, total, count in sorted(snapshot):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {count}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "civicsnap_http_request_duration_seconds", "HTTP request latency.", ("route", "method", "status"))
+REQUEST_SIZE = Histogram(
+    "civicsnap_http_request_size_bytes", "HTTP request body size.", ("route",), SIZE_BUCKETS)
+RESPONSE_SIZE = Histogram(
+    "civicsnap_http_response_size_bytes", "HTTP response body size (streamed bodies excluded).", ("route",), SIZE_BUCKETS)
+REQUEST_ERRORS = Counter(
+    "civicsnap_http_errors_total", "HTTP responses with a 5xx status.", ("route", "status"))
+STAGE_DURATION = Histogram(
+    "civicsnap_stage_duration_seconds", "Time spent in a named processing stage.", ("stage",))
+DB_QUERY_DURATION = Histogram(
+    "civicsnap_db_query_duration_seconds", "Database statement latency.", ("statement",))
+DB_QUERY_ERRORS = Counter(
+    "civicsnap_db_query_errors_total", "Database statements that raised.", ("statement",))
+
+_METRICS = [REQUEST_DURATION, REQUEST_SIZE, RESPONSE_SIZE, REQUEST_ERRORS,
+            STAGE_DURATION, DB_QUERY_DURATION, DB_QUERY_ERRORS]
+_collectors = []
+
+
+def register_collector(name, help_text, fn):
+    """Adds gauges read at scrape time: fn() returns {label value: number} under label `name`."""
+    _collectors.append((name, help_text, fn))
+
+
+def render():
+    """The whole registry in Prometheus text exposition format."""
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for name, help_text, fn in _collectors:
+        try:
+            values = fn()
+        except Exception as e:
+            log.warning("Metrics collector %s failed: %s", name, e)
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for key, value in sorted(values.items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f'{name}{{key="{_escape(key)}"}} {_number(value)}')
+    return "\n".join(lines) + "\n"
+
+
+# ---- stage spans ----
+
+_current = threading.local()
+
+
+def begin_request():
+    _current.stages = {}
+
+
+def end_request():
+    stages = getattr(_current, 'stages', None)
+    _current.stages = None
+    return stages or {}
+
+
+class span:
+    """Times a block into civicsnap_stage_duration_seconds{stage=name}."""
+
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        STAGE_DURATION.observe(elapsed, self.stage)
+        stages = getattr(_current, 'stages', None)
+        if stages is not None:
+            stages[self.stage] = stages.get(self.stage, 0.0) + elapsed
+        return False
+
+
+# ---- database statements ----
+
+_VERB_RE = re.compile(r"^\s*(\w+)")
+_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+([\w.]+)", re.IGNORECASE)
+_statement_names = {}
+
+
+def statement_name(sql):
+    """Low-cardinality label for a statement: "<verb> <first table>"."""
+    # Pre-merged statements (bytes, e.g. execute_values pages) embed their
+    # values, so only plain query strings are worth caching
+    cacheable = isinstance(sql, str)
+    if isinstance(sql, bytes):
+        sql = sql[:512].decode(errors='replace')
+    sql = str(sql)
+    name = _statement_names.get(sql) if cacheable else None
+    if name is None:
+        verb = _VERB_RE.match(sql)
+        table = _TABLE_RE.search(sql)
+        name = verb.group(1).upper() if verb else "OTHER"
+        if table:
+            name = f"{name} {table.group(1).lower()}"
+        if cacheable and len(_statement_names) < 4096:
+            _statement_names[sql] = name
+    return name
+
+
+def observe_query(sql, elapsed, failed=False):
+    name = statement_name(sql)
+    DB_QUERY_DURATION.observe(elapsed, name)
+    if failed:
+        DB_QUERY_ERRORS.inc(name)
+
+
+# ---- logging ----
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    handler = logging.StreamHandler()
+    if LOG_FORMAT == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+
+
+# ---- Flask integration ----
+
+def init_app(app):
+    """Installs the per-request hooks on a Flask app."""
+    from flask import request
+
+    @app.before_request
+    def _start_timer():
+        request.environ['civicsnap.start'] = time.perf_counter()
+        begin_request()
+
+    @app.after_request
+    def _record(response):
+        start = request.environ.get('civicsnap.start')
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        status = response.status_code
+        REQUEST_DURATION.observe(elapsed, route, request.method, str(status))
+        request_size = request.content_length or 0
+        REQUEST_SIZE.observe(request_size, route)
+        response_size = None if response.is_streamed else response.calculate_content_length()
+        if response_size is not None:
+            RESPONSE_SIZE.observe(response_size, route)
+        if status >= 500:
+            REQUEST_ERRORS.inc(route, str(status))
+        stages = end_request()
+        if LOG_FORMAT == 'json':
+            log.info("request", extra={"fields": {
+                "route": route, "method": request.method, "status": status,
+                "duration_ms": round(elapsed * 1000, 3),
+                "request_bytes": request_size, "response_bytes": response_size,
+                "stages_ms": {k: round(v * 1000, 3) for k, v in stages.items()},
+            }})
+        return response
@@ -0,0 +1,246 @@
+"""
+Schema migration tool for the CivicSnap backend.
+
+Usage:
+    python migrate.py            # apply all pending migrations
+    python migrate.py status     # list applied / pending migrations
+    python migrate.py explain    # verify the planner can use the indexes
+
+Migrations are the numbered *.sql files in ./migrations. Each one runs in
+its own transaction and is recorded in the `schema_migrations` table.
+"""
+import json
+import os
+import sys
+
+from helper import get_db_connection
+from ward_index import WARD_OVERLAP_SQL, WARD_PART_VERTICES
+from search import SEARCH_TEXT_SQL
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# ---------------------------------------------------------
+# MIGRATION DISCOVERY
+# ---------------------------------------------------------
+def list_migrations():
+    """Returns [(version, name, path)] sorted by version."""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not filename.endswith('.sql'):
+            continue
+        version, _, rest = filename.partition('_')
+        if not version.isdigit():
+            continue
+        migrations.append((int(version), os.path.splitext(rest)[0], os.path.join(MIGRATIONS_DIR, filename)))
+    return migrations
+
+def ensure_migrations_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+def applied_versions(cur):
+    cur.execute("SELECT version FROM schema_migrations;")
+    return {row[0] for row in cur.fetchall()}
+
+# ---------------------------------------------------------
+# COMMANDS
+# ---------------------------------------------------------
+def migrate():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        ensure_migrations_table(cur)
+        conn.commit()
+        done = applied_versions(cur)
+
+        pending = [m for m in list_migrations() if m[0] not in done]
+        if not pending:
+            print("Database is up to date.")
+            return 0
+
+        for version, name, path in pending:
+            with open(path) as f:
+                sql = f.read()
+            print(f"Applying {version:04d}_{name} ...")
+            try:
+                cur.execute(sql)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s);",
+                    (version, name)
+                )
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"Migration {version:04d}_{name} failed: {e}")
+                return 1
+        print(f"Applied {len(pending)} migration(s).")
+        return 0
+    finally:
+        cur.close()
+        conn.close()
+
+def status():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        ensure_migrations_table(cur)
+        conn.commit()
+        done = applied_versions(cur)
+        for version, name, _ in list_migrations():
+            state = "applied" if version in done else "pending"
+            print(f"{version:04d}_{name}: {state}")
+        return 0
+    finally:
+        cur.close()
+        conn.close()
+
+# Hot queries from app.py and the index each one must be able to use.
+EXPLAIN_CHECKS = [
+    (
+        "report_issue duplicate check",
+        """
+            SELECT id FROM complaints
+            WHERE ST_DWithin(geom::geography, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography, 20)
+            AND status != 'resolved';
+        """,
+        (76.5, 9.5),
+        "complaints_open_geog_gist"
+    ),
+    (
+        "ward routing",
+        "SELECT id, name FROM wards WHERE ST_Contains(geom, ST_SetSRID(ST_MakePoint(%s, %s), 4326));",
+        (76.5, 9.5),
+        "wards_geom_gist"
+    ),
+    (
+        "get_user_complaints",
+        """
+            SELECT c.id FROM complaints c WHERE c.phone_number = %s
+            ORDER BY c.created_at DESC, c.id DESC LIMIT 51;
+        """,
+        ("0000000000",),
+        "complaints_phone_created_id_idx"
+    ),
+    (
+        "get_complaints_by_location",
+        """
+            SELECT c.id FROM complaints c WHERE c.ward_id = %s
+            AND (c.created_at, c.id) < (now(), 2147483647)
+            ORDER BY c.created_at DESC, c.id DESC LIMIT 51;
+        """,
+        (1,),
+        "complaints_ward_created_id_idx"
+    ),
+    (
+        "get_all_complaints (ward scoped)",
+        """
+            SELECT c.id FROM complaints c WHERE c.ward_id = ANY(%s::int[])
+            ORDER BY c.created_at DESC, c.id DESC LIMIT 51;
+        """,
+        ([1, 2],),
+        "complaints_ward_created_id_idx"
+    ),
+    (
+        "get_all_complaints (all wards)",
+        "SELECT c.id FROM complaints c ORDER BY c.created_at DESC, c.id DESC LIMIT 51;",
+        (),
+        "complaints_created_id_idx"
+    ),
+    (
+        "create_ward overlap check",
+        WARD_OVERLAP_SQL,
+        {"wkt": "POLYGON((76.4 9.4, 76.6 9.4, 76.6 9.6, 76.4 9.6, 76.4 9.4))", "vertices": WARD_PART_VERTICES},
+        "ward_parts_geom_gist"
+    ),
+    (
+        "get_admin_stats top upvoted",
+        """
+            SELECT w.id, c.id FROM unnest(%s::int[]) AS w(id)
+            CROSS JOIN LATERAL (
+                SELECT id FROM complaints WHERE ward_id = w.id AND status IS DISTINCT FROM 'resolved'
+                ORDER BY upvotes DESC, id DESC LIMIT 5
+            ) c;
+        """,
+        ([1, 2],),
+        "complaints_ward_upvotes_idx"
+    ),
+    (
+        "search_complaints full text",
+        "SELECT c.id FROM complaints c WHERE c.search_vector @@ websearch_to_tsquery('english', %s);",
+        ("broken streetlight",),
+        "complaints_search_vector_idx"
+    ),
+    (
+        "search_complaints typo match",
+        f"SELECT c.id FROM complaints c WHERE %s <%% {SEARCH_TEXT_SQL};",
+        ("stretlight",),
+        "complaints_search_trgm_idx"
+    ),
+    (
+        "duplicate index sync",
+        "SELECT id FROM complaints WHERE updated_at > now() - make_interval(secs => %s);",
+        (60,),
+        "complaints_updated_at_idx"
+    ),
+    (
+        "live update stream resume",
+        """
+            SELECT id, ward_id, kind, data FROM complaint_events
+            WHERE ward_id = ANY(%s::int[]) AND id > %s ORDER BY id LIMIT 1001;
+        """,
+        ([1], 0),
+        "complaint_events_ward_id_idx"
+    ),
+]
+
+def _plan_indexes(node, found):
+    if 'Index Name' in node:
+        found.add(node['Index Name'])
+    for child in node.get('Plans', []):
+        _plan_indexes(child, found)
+    return found
+
+def plan_indexes(cur, query, params):
+    """Names of the indexes in the planner's plan for `query`."""
+    cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return _plan_indexes(plan[0]['Plan'], set())
+
+def explain():
+    """
+    EXPLAINs each hot query and checks the expected index shows up in the
+    plan. Sequential scans are disabled for the check so the result does
+    not depend on how many rows the target database happens to hold.
+    tests/test_migrations.py runs the same checks under pytest.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    failures = 0
+    try:
+        cur.execute("SET LOCAL enable_seqscan = off;")
+        for label, query, params, expected in EXPLAIN_CHECKS:
+            used = plan_indexes(cur, query, params)
+            ok = expected in used
+            failures += 0 if ok else 1
+            print(f"[{'OK' if ok else 'FAIL'}] {label}: expected {expected}, plan uses {sorted(used) or 'no index'}")
+        return 1 if failures else 0
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'migrate'
+    commands = {'migrate': migrate, 'status': status, 'explain': explain}
+    if command not in commands:
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(commands[command]())
@@ -0,0 +1,31 @@
+-- 0001: Spatial and filter indexes for complaints and wards
+
+-- Spatial routing: ST_Contains(wards.geom, point)
+CREATE INDEX IF NOT EXISTS wards_geom_gist ON wards USING GIST (geom);
+
+-- Bounding-box / geometry queries on complaint points
+CREATE INDEX IF NOT EXISTS complaints_geom_gist ON complaints USING GIST (geom);
+
+-- Duplicate check in report_issue:
+--   ST_DWithin(geom::geography, <point>::geography, 20) AND status != 'resolved'
+-- A plain geometry index cannot serve the geography cast, so index the
+-- exact expression, and only for rows that can still be duplicates.
+CREATE INDEX IF NOT EXISTS complaints_open_geog_gist
+    ON complaints USING GIST ((geom::geography))
+    WHERE status <> 'resolved';
+
+-- get_user_complaints: WHERE phone_number = ? ORDER BY created_at DESC
+CREATE INDEX IF NOT EXISTS complaints_phone_created_idx
+    ON complaints (phone_number, created_at DESC);
+
+-- get_complaints_by_location / get_all_complaints (ward scoped):
+--   WHERE ward_id = ? / ward_id = ANY(?) ORDER BY created_at DESC
+CREATE INDEX IF NOT EXISTS complaints_ward_created_idx
+    ON complaints (ward_id, created_at DESC);
+
+-- get_all_complaints (no ward restriction): ORDER BY created_at DESC
+CREATE INDEX IF NOT EXISTS complaints_created_idx
+    ON complaints (created_at DESC);
+
+-- assign_ward_admin / cascades from wards look admin_wards up by ward
+CREATE INDEX IF NOT EXISTS admin_wards_ward_idx ON public.admin_wards (ward_id);
@@ -0,0 +1,25 @@
+-- 0002: Version counters used by in-process caches to detect changes made
+-- by other workers (e.g. the ward polygon index).
+
+CREATE TABLE IF NOT EXISTS cache_versions (
+    name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO cache_versions (name) VALUES ('wards') ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION public.bump_cache_version()
+RETURNS TRIGGER AS $$
+BEGIN
+  UPDATE cache_versions
+     SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+   WHERE name = TG_ARGV[0];
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS wards_bump_version ON wards;
+CREATE TRIGGER wards_bump_version
+  AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON wards
+  FOR EACH STATEMENT EXECUTE PROCEDURE public.bump_cache_version('wards');
@@ -0,0 +1,6 @@
+-- 0003: Track background image processing per complaint.
+-- Existing rows already have their image uploaded, hence the 'ready' default;
+-- report_issue inserts new rows as 'pending' until the pipeline finishes.
+
+ALTER TABLE complaints
+    ADD COLUMN IF NOT EXISTS image_status VARCHAR(20) NOT NULL DEFAULT 'ready';
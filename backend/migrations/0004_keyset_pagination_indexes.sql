@@ -0,0 +1,19 @@
+-- 0004: Keyset pagination on (created_at, id) for the listing endpoints.
+-- The row comparison (created_at, id) < (?, ?) needs non-null keys.
+
+UPDATE complaints SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL;
+ALTER TABLE complaints ALTER COLUMN created_at SET NOT NULL;
+
+-- Replace the 0001 listing indexes with ones that include the id tiebreaker
+DROP INDEX IF EXISTS complaints_phone_created_idx;
+DROP INDEX IF EXISTS complaints_ward_created_idx;
+DROP INDEX IF EXISTS complaints_created_idx;
+
+CREATE INDEX IF NOT EXISTS complaints_phone_created_id_idx
+    ON complaints (phone_number, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS complaints_ward_created_id_idx
+    ON complaints (ward_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS complaints_created_id_idx
+    ON complaints (created_at DESC, id DESC);
@@ -0,0 +1,11 @@
+-- 0005: One row per (complaint, voter) so a voter is only counted once.
+-- complaints.upvotes stays as the denormalized, eventually consistent total.
+
+CREATE TABLE IF NOT EXISTS complaint_votes (
+    complaint_id INTEGER NOT NULL REFERENCES complaints(id) ON DELETE CASCADE,
+    voter_id VARCHAR(200) NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (complaint_id, voter_id)
+);
+
+UPDATE complaints SET upvotes = 0 WHERE upvotes IS NULL;
@@ -0,0 +1,25 @@
+-- 0006: Perceptual image hash per complaint, plus an updated_at column that
+-- lets each worker's in-memory duplicate index pick up changes made by
+-- other workers with a cheap delta query.
+
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS image_hash BIGINT;
+
+ALTER TABLE complaints
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+CREATE OR REPLACE FUNCTION public.touch_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at := CURRENT_TIMESTAMP;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Only changes the duplicate index cares about; vote counters and image
+-- URLs do not bump updated_at
+DROP TRIGGER IF EXISTS complaints_touch_updated_at ON complaints;
+CREATE TRIGGER complaints_touch_updated_at
+  BEFORE UPDATE OF status, category, geom, image_hash, ward_id ON complaints
+  FOR EACH ROW EXECUTE PROCEDURE public.touch_updated_at();
+
+CREATE INDEX IF NOT EXISTS complaints_updated_at_idx ON complaints (updated_at);
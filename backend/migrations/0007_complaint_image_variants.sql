@@ -0,0 +1,4 @@
+-- 0007: Resized renditions of each complaint photo (srcset-ready JSON built
+-- by the image pipeline; see pipeline.build_variants).
+
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS image_variants JSONB;
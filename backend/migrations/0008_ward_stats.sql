@@ -0,0 +1,154 @@
+-- 0008: Per-ward statistics for the admin dashboard, kept up to date by
+-- triggers on complaints so a summary reads O(wards) rows instead of
+-- aggregating every complaint. Inserts (single and batch reports), status
+-- changes and ward reassignment all go through the triggers in the writing
+-- transaction; upvotes stay on complaints and the top-voted issues per ward
+-- come straight off complaints_ward_upvotes_idx.
+--
+-- Complaints without a ward are counted under ward_id 0. Days are UTC.
+
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS resolved_at TIMESTAMP WITH TIME ZONE;
+
+-- Best guess for complaints resolved before this migration: the last change
+UPDATE complaints SET resolved_at = updated_at
+WHERE lower(status) = 'resolved' AND resolved_at IS NULL;
+
+CREATE TABLE IF NOT EXISTS ward_status_counts (
+    ward_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    category TEXT NOT NULL,
+    complaints BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (ward_id, status, category)
+);
+
+CREATE TABLE IF NOT EXISTS ward_resolution_stats (
+    ward_id INTEGER PRIMARY KEY,
+    resolved BIGINT NOT NULL DEFAULT 0,
+    resolution_seconds DOUBLE PRECISION NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS ward_daily_counts (
+    ward_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    reported BIGINT NOT NULL DEFAULT 0,
+    resolved BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (ward_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS complaints_ward_upvotes_idx
+    ON complaints (ward_id, upvotes DESC, id DESC);
+
+-- Stamp resolved_at on the way into 'resolved' and clear it on the way out
+CREATE OR REPLACE FUNCTION public.set_resolved_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF lower(NEW.status) = 'resolved' THEN
+    IF TG_OP = 'INSERT' OR lower(OLD.status) IS DISTINCT FROM 'resolved' THEN
+      NEW.resolved_at := COALESCE(NEW.resolved_at, CURRENT_TIMESTAMP);
+    END IF;
+  ELSE
+    NEW.resolved_at := NULL;
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS complaints_set_resolved_at ON complaints;
+CREATE TRIGGER complaints_set_resolved_at
+  BEFORE INSERT OR UPDATE OF status ON complaints
+  FOR EACH ROW EXECUTE PROCEDURE public.set_resolved_at();
+
+-- Adds (sign = 1) or removes (sign = -1) one complaint's contribution
+CREATE OR REPLACE FUNCTION public.ward_stats_add(
+  p_ward_id INTEGER, p_status TEXT, p_category TEXT,
+  p_created_at TIMESTAMP WITH TIME ZONE, p_resolved_at TIMESTAMP WITH TIME ZONE, sign INTEGER)
+RETURNS VOID AS $$
+DECLARE
+  ward INTEGER := COALESCE(p_ward_id, 0);
+BEGIN
+  INSERT INTO ward_status_counts AS s (ward_id, status, category, complaints)
+  VALUES (ward, lower(COALESCE(p_status, 'pending')), COALESCE(p_category, 'Uncategorized'), sign)
+  ON CONFLICT (ward_id, status, category) DO UPDATE SET complaints = s.complaints + EXCLUDED.complaints;
+
+  INSERT INTO ward_daily_counts AS d (ward_id, day, reported)
+  VALUES (ward, (p_created_at AT TIME ZONE 'UTC')::date, sign)
+  ON CONFLICT (ward_id, day) DO UPDATE SET reported = d.reported + EXCLUDED.reported;
+
+  IF p_resolved_at IS NOT NULL THEN
+    INSERT INTO ward_daily_counts AS d (ward_id, day, resolved)
+    VALUES (ward, (p_resolved_at AT TIME ZONE 'UTC')::date, sign)
+    ON CONFLICT (ward_id, day) DO UPDATE SET resolved = d.resolved + EXCLUDED.resolved;
+
+    INSERT INTO ward_resolution_stats AS r (ward_id, resolved, resolution_seconds)
+    VALUES (ward, sign, sign * GREATEST(EXTRACT(EPOCH FROM p_resolved_at - p_created_at), 0))
+    ON CONFLICT (ward_id) DO UPDATE SET
+      resolved = r.resolved + EXCLUDED.resolved,
+      resolution_seconds = r.resolution_seconds + EXCLUDED.resolution_seconds;
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.complaints_ward_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM public.ward_stats_add(OLD.ward_id, OLD.status, OLD.category, OLD.created_at, OLD.resolved_at, -1);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM public.ward_stats_add(NEW.ward_id, NEW.status, NEW.category, NEW.created_at, NEW.resolved_at, 1);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS complaints_ward_stats_insert ON complaints;
+CREATE TRIGGER complaints_ward_stats_insert
+  AFTER INSERT ON complaints
+  FOR EACH ROW EXECUTE PROCEDURE public.complaints_ward_stats();
+
+-- Vote flushes and image updates touch other columns and skip this entirely
+DROP TRIGGER IF EXISTS complaints_ward_stats_update ON complaints;
+CREATE TRIGGER complaints_ward_stats_update
+  AFTER UPDATE OF status, category, ward_id, resolved_at ON complaints
+  FOR EACH ROW
+  WHEN (OLD.status IS DISTINCT FROM NEW.status
+        OR OLD.category IS DISTINCT FROM NEW.category
+        OR OLD.ward_id IS DISTINCT FROM NEW.ward_id
+        OR OLD.resolved_at IS DISTINCT FROM NEW.resolved_at)
+  EXECUTE PROCEDURE public.complaints_ward_stats();
+
+DROP TRIGGER IF EXISTS complaints_ward_stats_delete ON complaints;
+CREATE TRIGGER complaints_ward_stats_delete
+  AFTER DELETE ON complaints
+  FOR EACH ROW EXECUTE PROCEDURE public.complaints_ward_stats();
+
+-- Full rebuild from complaints: the initial backfill, and a repair tool
+-- (SELECT rebuild_ward_stats();) should the tables ever drift
+CREATE OR REPLACE FUNCTION public.rebuild_ward_stats()
+RETURNS VOID AS $$
+BEGIN
+  LOCK TABLE complaints IN SHARE MODE;
+  TRUNCATE ward_status_counts, ward_resolution_stats, ward_daily_counts;
+
+  INSERT INTO ward_status_counts (ward_id, status, category, complaints)
+  SELECT COALESCE(ward_id, 0), lower(COALESCE(status, 'pending')), COALESCE(category, 'Uncategorized'), count(*)
+  FROM complaints GROUP BY 1, 2, 3;
+
+  INSERT INTO ward_resolution_stats (ward_id, resolved, resolution_seconds)
+  SELECT COALESCE(ward_id, 0), count(*), sum(GREATEST(EXTRACT(EPOCH FROM resolved_at - created_at), 0))
+  FROM complaints WHERE resolved_at IS NOT NULL GROUP BY 1;
+
+  INSERT INTO ward_daily_counts (ward_id, day, reported, resolved)
+  SELECT ward_id, day, sum(reported), sum(resolved)
+  FROM (
+    SELECT COALESCE(ward_id, 0) AS ward_id, (created_at AT TIME ZONE 'UTC')::date AS day, 1 AS reported, 0 AS resolved
+    FROM complaints
+    UNION ALL
+    SELECT COALESCE(ward_id, 0), (resolved_at AT TIME ZONE 'UTC')::date, 0, 1
+    FROM complaints WHERE resolved_at IS NOT NULL
+  ) events
+  GROUP BY ward_id, day;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT public.rebuild_ward_stats();
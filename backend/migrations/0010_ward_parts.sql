@@ -0,0 +1,42 @@
+-- 0010: Ward boundaries cut into small pieces (at most 64 vertices each)
+-- with ST_Subdivide. Hand-drawn wards can have thousands of vertices; every
+-- spatial predicate against them walks all of those, and their bounding
+-- boxes are too coarse for the GiST index to rule much out. Pieces have
+-- tight boxes and cheap predicates. The pieces are derived data, rebuilt by
+-- a trigger whenever a ward is created or its boundary changes, and removed
+-- with the ward by the foreign key.
+
+CREATE TABLE IF NOT EXISTS ward_parts (
+    id SERIAL PRIMARY KEY,
+    ward_id INTEGER NOT NULL REFERENCES wards(id) ON DELETE CASCADE,
+    geom GEOMETRY(Polygon, 4326) NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ward_parts_geom_gist ON ward_parts USING GIST (geom);
+CREATE INDEX IF NOT EXISTS ward_parts_ward_idx ON ward_parts (ward_id);
+
+CREATE OR REPLACE FUNCTION public.subdivide_ward()
+RETURNS TRIGGER AS $$
+BEGIN
+  DELETE FROM ward_parts WHERE ward_id = NEW.id;
+  IF NEW.geom IS NOT NULL THEN
+    INSERT INTO ward_parts (ward_id, geom)
+    SELECT NEW.id, d.geom
+    FROM ST_Subdivide(NEW.geom, 64) AS piece, ST_Dump(piece) AS d
+    WHERE ST_GeometryType(d.geom) = 'ST_Polygon';
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS wards_subdivide ON wards;
+CREATE TRIGGER wards_subdivide
+  AFTER INSERT OR UPDATE OF geom ON wards
+  FOR EACH ROW EXECUTE PROCEDURE public.subdivide_ward();
+
+-- Backfill the wards that already exist
+DELETE FROM ward_parts;
+INSERT INTO ward_parts (ward_id, geom)
+SELECT w.id, d.geom
+FROM wards w, ST_Subdivide(w.geom, 64) AS piece, ST_Dump(piece) AS d
+WHERE w.geom IS NOT NULL AND ST_GeometryType(d.geom) = 'ST_Polygon';
@@ -0,0 +1,37 @@
+-- 0011: Background re-routing of complaints after ward boundary changes.
+-- create_ward and delete_ward only record a job; reroute.py recomputes
+-- complaints.ward_id for the affected complaints in small batches, so a
+-- boundary edit never updates a whole ward's complaints in one statement.
+--
+-- A deleted ward is first only marked (deleted_at) and loses its pieces,
+-- which takes it out of routing, the map and the overlap check at once;
+-- the row itself is removed by its job once no complaint points at it.
+
+ALTER TABLE wards ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE;
+
+CREATE TABLE IF NOT EXISTS reroute_jobs (
+    id SERIAL PRIMARY KEY,
+    kind TEXT NOT NULL CHECK (kind IN ('ward_created', 'ward_deleted')),
+    ward_id INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'done', 'failed')),
+    -- Resume point: the ward piece being scanned and the last complaint id done in it
+    part_cursor INTEGER NOT NULL DEFAULT 0,
+    complaint_cursor INTEGER NOT NULL DEFAULT 0,
+    total BIGINT,
+    processed BIGINT NOT NULL DEFAULT 0,
+    moved BIGINT NOT NULL DEFAULT 0,
+    batches INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Workers claim the oldest unfinished job
+CREATE INDEX IF NOT EXISTS reroute_jobs_open_idx
+    ON reroute_jobs (id) WHERE status IN ('pending', 'running');
+
+-- Deleting a ward batch by batch reads its complaints by ward, then by id
+CREATE INDEX IF NOT EXISTS complaints_ward_id_idx ON complaints (ward_id, id);
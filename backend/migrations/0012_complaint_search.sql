@@ -0,0 +1,20 @@
+-- 0012: Full-text search over complaint categories and descriptions
+-- (search.py). Adding the generated column rewrites complaints once.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Category words rank above description words; English stemming so
+-- "leaking" finds "leak"
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(category, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS complaints_search_vector_idx
+    ON complaints USING GIN (search_vector);
+
+-- Typo tolerance: `query <% text` (word similarity). The expression must
+-- match SEARCH_TEXT_SQL in search.py for the planner to use the index.
+CREATE INDEX IF NOT EXISTS complaints_search_trgm_idx
+    ON complaints USING GIN ((coalesce(category, '') || ' ' || coalesce(description, '')) gin_trgm_ops);
@@ -0,0 +1,87 @@
+-- 0013: Live complaint events for the per-ward streams (events.py).
+-- A trigger on complaints records every new report, status change, vote
+-- flush, processed image and ward reassignment in complaint_events and
+-- announces it with pg_notify on the 'complaint_events' channel, in the
+-- writing transaction: listeners only hear about committed changes.
+-- The table is what reconnecting clients resume from (Last-Event-ID);
+-- events.py prunes it after EVENTS_RETENTION_HOURS.
+--
+-- Complaints without a ward have no stream, so they produce no events.
+--
+-- Cost: every complaints write the trigger fires for adds one INSERT and one
+-- NOTIFY to the writing transaction, and Postgres serializes the commits of
+-- notifying transactions behind a database-wide lock. To turn it off:
+--   ALTER TABLE complaints DISABLE TRIGGER complaints_notify;
+
+CREATE TABLE IF NOT EXISTS complaint_events (
+    id BIGSERIAL PRIMARY KEY,
+    ward_id INTEGER NOT NULL,
+    complaint_id INTEGER NOT NULL,
+    kind TEXT NOT NULL CHECK (kind IN ('created', 'status', 'votes', 'image', 'added', 'removed')),
+    data JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Resume: WHERE ward_id = ANY(...) AND id > last ORDER BY id
+CREATE INDEX IF NOT EXISTS complaint_events_ward_id_idx ON complaint_events (ward_id, id);
+-- Retention
+CREATE INDEX IF NOT EXISTS complaint_events_created_idx ON complaint_events (created_at);
+
+-- Records one event and notifies it. The payload leaves out the image
+-- renditions and cuts the description, so it stays far below NOTIFY's
+-- 8000 byte limit.
+CREATE OR REPLACE FUNCTION public.complaint_event(event_kind TEXT, event_ward INTEGER, c complaints)
+RETURNS void AS $$
+DECLARE
+  event_data JSONB;
+  event_id BIGINT;
+BEGIN
+  IF event_ward IS NULL THEN
+    RETURN;
+  END IF;
+  event_data := jsonb_build_object(
+    'id', c.id::text,
+    'category', c.category,
+    'description', left(c.description, 280),
+    'status', lower(coalesce(c.status, 'pending')),
+    'image_status', c.image_status,
+    'image_url', c.image_url,
+    'ward_id', c.ward_id,
+    'latitude', ST_Y(c.geom),
+    'longitude', ST_X(c.geom),
+    'upvotes', coalesce(c.upvotes, 0),
+    'created_at', c.created_at
+  );
+  INSERT INTO complaint_events (ward_id, complaint_id, kind, data)
+  VALUES (event_ward, c.id, event_kind, event_data)
+  RETURNING id INTO event_id;
+  PERFORM pg_notify('complaint_events', jsonb_build_object(
+    'id', event_id, 'ward_id', event_ward, 'kind', event_kind, 'data', event_data
+  )::text);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.complaints_notify()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM public.complaint_event('created', NEW.ward_id, NEW);
+  ELSIF NEW.ward_id IS DISTINCT FROM OLD.ward_id THEN
+    -- Re-routed by a ward edit: leaves one stream, joins another
+    PERFORM public.complaint_event('removed', OLD.ward_id, NEW);
+    PERFORM public.complaint_event('added', NEW.ward_id, NEW);
+  ELSIF NEW.status IS DISTINCT FROM OLD.status THEN
+    PERFORM public.complaint_event('status', NEW.ward_id, NEW);
+  ELSIF NEW.upvotes IS DISTINCT FROM OLD.upvotes THEN
+    PERFORM public.complaint_event('votes', NEW.ward_id, NEW);
+  ELSIF NEW.image_status IS DISTINCT FROM OLD.image_status THEN
+    PERFORM public.complaint_event('image', NEW.ward_id, NEW);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS complaints_notify ON complaints;
+CREATE TRIGGER complaints_notify
+  AFTER INSERT OR UPDATE OF status, upvotes, image_status, ward_id ON complaints
+  FOR EACH ROW EXECUTE PROCEDURE public.complaints_notify();
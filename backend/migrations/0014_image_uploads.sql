@@ -0,0 +1,23 @@
+-- 0014: Keep the upload of each complaint until its image is processed.
+-- report_issue and the batch route save the bytes in the same transaction
+-- as the complaint; the image pipeline deletes the row when the job ends
+-- (ready or failed). Jobs only live in a worker's memory, so a row whose
+-- claim is older than IMAGE_RECOVERY_AFTER was left by a worker that died
+-- mid-job and is claimed and run again by another one (pipeline.py).
+
+CREATE TABLE IF NOT EXISTS image_uploads (
+    complaint_id INTEGER PRIMARY KEY REFERENCES complaints(id) ON DELETE CASCADE,
+    data BYTEA NOT NULL,
+    extension TEXT NOT NULL DEFAULT '',
+    content_type TEXT,
+    claimed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    recoveries INTEGER NOT NULL DEFAULT 0
+);
+
+-- Recovery scans for the oldest claims
+CREATE INDEX IF NOT EXISTS image_uploads_claimed_at_idx ON image_uploads (claimed_at);
+
+-- Complaints already stuck in 'pending' by a restart have no bytes left to
+-- retry with
+UPDATE complaints SET image_status = 'failed'
+WHERE image_status = 'pending' AND created_at < now() - interval '1 hour';
@@ -0,0 +1,18 @@
+-- 0016: Keep only a reference to each pending upload in the database.
+-- 0014 stored the whole image as BYTEA in the report's transaction, so
+-- every report paid WAL and TOAST writes for its photo. The bytes now go
+-- to a file in IMAGE_UPLOAD_DIR (memory-backed /dev/shm by default) on the
+-- host that took the report; the row records the file and that host.
+-- `data` stays, nullable, for rows written before this migration.
+--
+-- `deferred` marks a job that did not fit in its worker's queue; the
+-- host's recovery thread queues it as soon as there is room (pipeline.py).
+
+ALTER TABLE image_uploads
+    ALTER COLUMN data DROP NOT NULL,
+    ADD COLUMN IF NOT EXISTS path TEXT,
+    ADD COLUMN IF NOT EXISTS host TEXT,
+    ADD COLUMN IF NOT EXISTS deferred BOOLEAN NOT NULL DEFAULT false;
+
+-- Rows deferred by the previous code
+UPDATE image_uploads SET deferred = true, claimed_at = now() WHERE claimed_at = '-infinity';
@@ -0,0 +1,449 @@
+"""
+Background image ingestion pipeline.
+
+report_issue only validates GPS, checks duplicates and inserts the complaint
+with image_status = 'pending'. The upload bytes are then handed to a pool of
+worker threads that have it downscaled and re-encoded on the image processes
+(imaging.image_service), upload it to storage and fill in
+complaints.image_url (image_status = 'ready'), retrying failed attempts with
+exponential backoff before giving up (image_status = 'failed').
+
+The upload bytes are also written to a file in IMAGE_UPLOAD_DIR, and
+image_uploads (migrations 0014, 0016) records that file and this host in
+the same transaction as the complaint; both are removed when the job ends.
+The bytes stay out of Postgres, so a report does not pay WAL and TOAST
+writes for its photo. Jobs only live in the worker's memory, so when a
+worker dies mid-job (restart, crash, deploy) its rows stay behind; every
+worker's recovery thread re-claims this host's rows left unfinished for
+IMAGE_RECOVERY_AFTER seconds and runs them again, so a complaint cannot
+stay image_status = 'pending' forever. Rows of another host are taken over
+after IMAGE_ORPHAN_AFTER seconds (that host is presumed gone); unless
+IMAGE_UPLOAD_DIR is shared between hosts their file is gone with it, and
+the image is marked failed.
+
+When the queue is full, submit() does not process the job on the request
+thread: it marks the row deferred and drops the bytes, and the recovery
+thread queues deferred rows, oldest first, as soon as the workers have made
+room. A deferral does not count as a recovery.
+"""
+import atexit
+import logging
+import os
+import queue
+import socket
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+from psycopg2.extras import Json, execute_values
+
+from helper import get_db_connection
+from imaging import image_service, ImageServiceBusy
+from metrics import span
+from response_cache import feed_cache
+from storage import get_storage
+
+log = logging.getLogger(__name__)
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+# Jobs carry the upload bytes, so the queue bound is also a memory bound
+IMAGE_QUEUE_SIZE = int(os.getenv("IMAGE_QUEUE_SIZE", "64"))
+IMAGE_MAX_ATTEMPTS = int(os.getenv("IMAGE_MAX_ATTEMPTS", "5"))
+# Delay before retry n is IMAGE_RETRY_BACKOFF * 2**(n-1) seconds
+IMAGE_RETRY_BACKOFF = float(os.getenv("IMAGE_RETRY_BACKOFF", "1"))
+# How long to keep draining the queue when the process exits
+IMAGE_DRAIN_TIMEOUT = float(os.getenv("IMAGE_DRAIN_TIMEOUT", "30"))
+# Seconds before an unfinished upload is taken to be orphaned by a dead
+# worker; above the longest queue wait plus retries, as a job still running
+# elsewhere would be processed twice
+IMAGE_RECOVERY_AFTER = float(os.getenv("IMAGE_RECOVERY_AFTER", "600"))
+# Seconds between checks for orphaned and deferred uploads
+IMAGE_RECOVERY_INTERVAL = float(os.getenv("IMAGE_RECOVERY_INTERVAL", "60"))
+# Where pending uploads are kept until processed (shared between the
+# workers of a host; share it between hosts to recover across them)
+IMAGE_UPLOAD_DIR = os.getenv("IMAGE_UPLOAD_DIR", os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "civicsnap-uploads"))
+# Seconds before another host's unfinished uploads are taken over
+IMAGE_ORPHAN_AFTER = float(os.getenv("IMAGE_ORPHAN_AFTER", "3600"))
+HOST = socket.gethostname()
+# Times an upload is recovered before it is marked failed (e.g. an image
+# that keeps crashing its worker)
+IMAGE_MAX_RECOVERIES = int(os.getenv("IMAGE_MAX_RECOVERIES", "3"))
+
+
+def build_variants(renditions):
+    """
+    The srcset-ready map stored in complaints.image_variants, from
+    [(width, height, content_type, url)] in preferred-format order:
+        {"src": <largest JPEG>, "width": ..., "height": ...,
+         "sources": [{"type": "image/webp", "srcset": "<url> 160w, <url> 480w, ..."},
+                     {"type": "image/jpeg", "srcset": ...}]}
+    `sources` is a list (JSONB does not keep key order) so it maps straight
+    onto <picture><source> elements, preferred format first.
+    """
+    if not renditions:
+        return None
+    srcsets = {}
+    for width, height, content_type, url in renditions:
+        srcsets.setdefault(content_type, []).append((width, url))
+    fallback = max(renditions, key=lambda r: (r[2] == 'image/jpeg', r[0]))
+    return {
+        "src": fallback[3],
+        "width": fallback[0],
+        "height": fallback[1],
+        "sources": [
+            {"type": content_type, "srcset": ", ".join(f"{url} {width}w" for width, url in sorted(entries))}
+            for content_type, entries in srcsets.items()
+        ],
+    }
+
+
+@dataclass
+class ImageJob:
+    complaint_id: int
+    data: bytes
+    # Used as-is if the image cannot be re-encoded
+    extension: str
+    content_type: str
+    attempts: int = 0
+
+    @property
+    def key(self):
+        # Derived from the complaint so retries and recovered jobs overwrite
+        # their own object instead of leaving orphans in storage
+        return f"complaints/{self.complaint_id}/original"
+
+
+def upload_path(complaint_id):
+    return os.path.join(IMAGE_UPLOAD_DIR, str(complaint_id))
+
+
+def save_uploads(cur, jobs):
+    """
+    Writes the upload bytes of `jobs` to IMAGE_UPLOAD_DIR and records them
+    in image_uploads, inside the caller's transaction, so they can be
+    recovered if this worker dies before they are processed. Call before
+    committing the complaints, submit after. Files of a transaction that
+    rolls back are swept by the recovery thread.
+    """
+    if not jobs:
+        return
+    os.makedirs(IMAGE_UPLOAD_DIR, exist_ok=True)
+    for job in jobs:
+        with open(upload_path(job.complaint_id), 'wb') as f:
+            f.write(job.data)
+    execute_values(cur, """
+        INSERT INTO image_uploads (complaint_id, path, host, extension, content_type) VALUES %s;
+    """, [(job.complaint_id, upload_path(job.complaint_id), HOST, job.extension or '', job.content_type)
+          for job in jobs])
+
+
+def remove_upload(complaint_id):
+    try:
+        os.unlink(upload_path(complaint_id))
+    except FileNotFoundError:
+        pass
+
+
+def _read_upload(data, path):
+    if data is not None:
+        return bytes(data)  # saved before migration 0016
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class ImagePipeline:
+    def __init__(self, workers=IMAGE_WORKERS, queue_size=IMAGE_QUEUE_SIZE,
+                 max_attempts=IMAGE_MAX_ATTEMPTS, backoff=IMAGE_RETRY_BACKOFF,
+                 recovery_after=IMAGE_RECOVERY_AFTER, recovery_interval=IMAGE_RECOVERY_INTERVAL):
+        self.workers = max(workers, 1)
+        self.queue_size = queue_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.recovery_after = recovery_after
+        self.recovery_interval = recovery_interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._in_flight = 0
+        self._deferred = False
+        self._wake = threading.Event()
+        self._stats = {"completed": 0, "failed": 0, "retried": 0, "recovered": 0, "deferred": 0}
+
+    # Threads do not survive fork(), so start lazily in each worker process
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._in_flight = 0
+            for i in range(self.workers):
+                threading.Thread(target=self._run, name=f"image-worker-{i}", daemon=True).start()
+            threading.Thread(target=self._recover_loop, name="image-recovery", daemon=True).start()
+            self._pid = os.getpid()
+
+    def submit(self, job):
+        self.ensure_started()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            # Backpressure: the saved upload waits for recover() instead of
+            # being processed on the caller's (request) thread
+            self._defer(job)
+
+    def _defer(self, job):
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("UPDATE image_uploads SET deferred = true, claimed_at = now() WHERE complaint_id = %s;",
+                        (job.complaint_id,))
+            conn.commit()
+        except Exception as e:
+            # The row keeps its claim and is recovered after recovery_after
+            conn.rollback()
+            log.warning("Could not defer image job for complaint %s: %s", job.complaint_id, e)
+        finally:
+            cur.close()
+            conn.close()
+        with self._lock:
+            self._deferred = True
+            self._stats["deferred"] += 1
+        self._finish(job)
+
+    def _retry_later(self, job):
+        delay = self.backoff * (2 ** (job.attempts - 1))
+        with self._lock:
+            self._stats["retried"] += 1
+        timer = threading.Timer(delay, self._queue.put, args=(job,))
+        timer.daemon = True
+        timer.start()
+
+    def _recover_loop(self):
+        while True:
+            self._wake.wait(self.recovery_interval)
+            self._wake.clear()
+            try:
+                self.recover()
+                self.sweep()
+            except Exception as e:
+                log.warning("Image upload recovery failed: %s", e)
+
+    def recover(self):
+        """
+        Claims this host's deferred uploads, then uploads left unfinished
+        for recovery_after seconds (their worker died) or, from other hosts,
+        for IMAGE_ORPHAN_AFTER seconds, and queues them again, as many as
+        the queue has room for. Returns the number claimed.
+        """
+        room = self.queue_size - self._queue.qsize()
+        if room <= 0:
+            return 0
+        with self._lock:
+            self._deferred = False
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                WITH stale AS (
+                    SELECT complaint_id, deferred AND host = %(host)s AS deferred FROM image_uploads
+                    WHERE (host = %(host)s AND (deferred OR claimed_at < now() - make_interval(secs => %(after)s)))
+                    OR (host IS DISTINCT FROM %(host)s AND claimed_at < now() - make_interval(secs => %(orphan)s))
+                    ORDER BY 2 DESC, claimed_at LIMIT %(room)s FOR UPDATE SKIP LOCKED
+                )
+                UPDATE image_uploads u
+                SET claimed_at = now(), deferred = false, host = %(host)s,
+                    recoveries = u.recoveries + CASE WHEN stale.deferred THEN 0 ELSE 1 END
+                FROM stale WHERE u.complaint_id = stale.complaint_id
+                RETURNING u.complaint_id, u.data, u.path, u.extension, u.content_type, u.recoveries, stale.deferred;
+            """, {"host": HOST, "after": self.recovery_after, "orphan": IMAGE_ORPHAN_AFTER, "room": room})
+            rows = cur.fetchall()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+        for complaint_id, data, path, extension, content_type, recoveries, deferred in rows:
+            job = ImageJob(complaint_id=complaint_id, data=None, extension=extension, content_type=content_type)
+            with self._lock:
+                self._in_flight += 1
+            if recoveries > IMAGE_MAX_RECOVERIES:
+                log.error("Image job for complaint %s gave up after %d recoveries", complaint_id, recoveries - 1)
+                self._mark_failed(job)
+                self._finish(job)
+                continue
+            try:
+                job.data = _read_upload(data, path)
+            except OSError as e:
+                # Another host's file, or lost with a restart of the host
+                log.error("Upload for complaint %s is gone: %s", complaint_id, e)
+                self._mark_failed(job)
+                self._finish(job)
+                continue
+            if not deferred:
+                log.warning("Recovering unfinished image job for complaint %s", complaint_id)
+                with self._lock:
+                    self._stats["recovered"] += 1
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                # Submissions took the room in the meantime
+                self._defer(job)
+        if len(rows) == room:
+            with self._lock:
+                self._deferred = True  # there may be more waiting
+        return len(rows)
+
+    def sweep(self):
+        """
+        Removes files in IMAGE_UPLOAD_DIR older than recovery_after whose
+        image_uploads row is gone (its transaction rolled back, or the
+        complaint was deleted). Returns the number removed.
+        """
+        cutoff = time.time() - self.recovery_after
+        try:
+            names = os.listdir(IMAGE_UPLOAD_DIR)
+        except FileNotFoundError:
+            return 0
+        old = {}
+        for name in names:
+            try:
+                if name.isdigit() and os.stat(os.path.join(IMAGE_UPLOAD_DIR, name)).st_mtime < cutoff:
+                    old[int(name)] = name
+            except FileNotFoundError:
+                pass
+        if not old:
+            return 0
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT complaint_id FROM image_uploads WHERE complaint_id = ANY(%s);", (sorted(old),))
+            pending = {row[0] for row in cur.fetchall()}
+        finally:
+            conn.rollback()
+            cur.close()
+            conn.close()
+        orphans = set(old) - pending
+        for complaint_id in orphans:
+            remove_upload(complaint_id)
+        return len(orphans)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._process(job)
+            finally:
+                self._queue.task_done()
+            # Deferred uploads are picked up once half the queue is free
+            if self._deferred and self._queue.qsize() <= self.queue_size // 2:
+                self._wake.set()
+
+    def _process(self, job):
+        job.attempts += 1
+        try:
+            self._handle(job)
+        except Exception as e:
+            if job.attempts < self.max_attempts:
+                log.warning("Image job for complaint %s failed (attempt %d): %s", job.complaint_id, job.attempts, e)
+                self._retry_later(job)
+                return
+            log.error("Image job for complaint %s gave up after %d attempts: %s", job.complaint_id, job.attempts, e)
+            self._mark_failed(job)
+        self._finish(job)
+
+    def _finish(self, job):
+        job.data = None
+        with self._lock:
+            self._in_flight -= 1
+
+    def _handle(self, job):
+        storage = get_storage()
+        variants = None
+        try:
+            with span("compression"):
+                encoded, extension, content_type, renditions = image_service.ingest(job.data)
+        except ImageServiceBusy:
+            raise  # retried with backoff
+        except Exception as e:
+            # Keep the original bytes rather than lose the evidence photo
+            log.warning("Compression Error: %s", e)
+            with span("storage_upload"):
+                public_url = storage.upload(f"{job.key}{job.extension}", job.data, job.content_type)
+        else:
+            with span("storage_upload"):
+                public_url = storage.upload(f"{job.key}{extension}", encoded, content_type)
+                # Deterministic keys: a retried job overwrites its own renditions too
+                variants = build_variants([
+                    (width, height, content_type, storage.upload(f"complaints/{job.complaint_id}/{width}{ext}", data, content_type))
+                    for width, height, ext, content_type, data in renditions
+                ])
+
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            with span("db_update"):
+                cur.execute(
+                    "UPDATE complaints SET image_url = %s, image_variants = %s, image_status = 'ready' WHERE id = %s RETURNING ward_id;",
+                    (public_url, Json(variants) if variants else None, job.complaint_id)
+                )
+                row = cur.fetchone()
+                cur.execute("DELETE FROM image_uploads WHERE complaint_id = %s;", (job.complaint_id,))
+                conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+        remove_upload(job.complaint_id)
+        # The feed shows image_url / images, so the ward's cached pages are stale now
+        feed_cache.invalidate(row[0] if row else None)
+        with self._lock:
+            self._stats["completed"] += 1
+
+    def _mark_failed(self, job):
+        with self._lock:
+            self._stats["failed"] += 1
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("UPDATE complaints SET image_status = 'failed' WHERE id = %s;", (job.complaint_id,))
+            cur.execute("DELETE FROM image_uploads WHERE complaint_id = %s;", (job.complaint_id,))
+            conn.commit()
+            remove_upload(job.complaint_id)
+        except Exception as e:
+            conn.rollback()
+            log.error("Could not mark image for complaint %s as failed: %s", job.complaint_id, e)
+        finally:
+            cur.close()
+            conn.close()
+
+    def drain(self, timeout=IMAGE_DRAIN_TIMEOUT):
+        """Waits (up to `timeout`) for queued and retrying jobs to finish."""
+        if self._pid != os.getpid():
+            return True
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self._in_flight == 0:
+                    return True
+            time.sleep(0.1)
+        return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queued": self._queue.qsize() if self._queue else 0,
+                "in_flight": self._in_flight,
+                **self._stats
+            }
+
+
+image_pipeline = ImagePipeline()
+atexit.register(image_pipeline.drain)
@@ -0,0 +1,275 @@
+"""
+Background re-routing of complaints after ward boundary changes.
+
+create_ward and delete_ward only record a row in reroute_jobs (migration
+0011) and return. Every worker process runs a RerouteWorker thread that
+claims the oldest unfinished job with FOR UPDATE SKIP LOCKED and advances it
+by one batch of at most REROUTE_BATCH_SIZE complaints per transaction:
+
+  ward_created  complaints whose point falls in the new ward's bounding box
+                pieces (ward_parts, scanned piece by piece in id order) are
+                moved to the ward when it contains them
+  ward_deleted  complaints still pointing at the deleted ward are routed to
+                whichever live ward contains them, or to none; once none is
+                left the ward row itself is removed
+
+The job row holds the resume point and is updated in the same transaction
+as the batch, so a job picks up where it stopped after a crash or restart,
+and no statement locks more than one batch of complaints.
+"""
+import logging
+import os
+import threading
+import time
+
+from helper import get_db_connection
+from ward_admins import release_ward_admins
+
+log = logging.getLogger(__name__)
+
+REROUTE_ENABLED = os.getenv("REROUTE_ENABLED", "true").lower() == "true"
+REROUTE_BATCH_SIZE = int(os.getenv("REROUTE_BATCH_SIZE", "1000"))
+# Idle wait between checks for new jobs from other workers
+REROUTE_POLL_INTERVAL = float(os.getenv("REROUTE_POLL_INTERVAL", "5"))
+# Pause between batches, leaving room for regular traffic
+REROUTE_BATCH_PAUSE = float(os.getenv("REROUTE_BATCH_PAUSE", "0.05"))
+# Consecutive failed batches (e.g. deadlocks with other writers) before a job is marked failed
+REROUTE_MAX_ATTEMPTS = int(os.getenv("REROUTE_MAX_ATTEMPTS", "5"))
+
+JOB_COLUMNS = ("id, kind, ward_id, status, total, processed, moved, batches, attempts, error, "
+               "created_at, started_at, updated_at, finished_at")
+
+# Live ward containing each complaint (exact ST_Contains on the whole ward,
+# candidates found through the ward_parts index)
+ROUTE_SQL = """
+    (SELECT w.id FROM ward_parts p JOIN wards w ON w.id = p.ward_id
+     WHERE p.geom && c.geom AND w.deleted_at IS NULL AND ST_Contains(w.geom, c.geom)
+     ORDER BY w.id LIMIT 1)
+"""
+
+DELETED_BATCH_SQL = f"""
+    WITH batch AS (
+        SELECT id FROM complaints WHERE ward_id = %(ward)s
+        ORDER BY id LIMIT %(limit)s FOR UPDATE
+    ), moved AS (
+        UPDATE complaints c SET ward_id = {ROUTE_SQL}
+        FROM batch WHERE c.id = batch.id
+        RETURNING c.id, c.ward_id
+    )
+    SELECT count(*), array_remove(array_agg(DISTINCT ward_id), NULL) FROM moved;
+"""
+
+CREATED_BATCH_SQL = """
+    WITH batch AS (
+        SELECT c.id, c.ward_id FROM complaints c, ward_parts p
+        WHERE p.id = %(part)s AND c.geom && p.geom AND c.id > %(after)s
+        ORDER BY c.id LIMIT %(limit)s
+    ), moved AS (
+        UPDATE complaints c SET ward_id = w.id
+        FROM batch, wards w
+        WHERE c.id = batch.id AND w.id = %(ward)s AND w.deleted_at IS NULL
+        AND c.ward_id IS DISTINCT FROM w.id AND ST_Contains(w.geom, c.geom)
+        RETURNING c.id
+    )
+    SELECT count(*), max(batch.id),
+           (SELECT count(*) FROM moved),
+           array_remove(array_agg(DISTINCT batch.ward_id) FILTER (WHERE batch.id IN (SELECT id FROM moved)), NULL)
+    FROM batch;
+"""
+
+
+def enqueue_job(cur, kind, ward_id):
+    """Records a job inside the caller's transaction. Returns its id."""
+    cur.execute("INSERT INTO reroute_jobs (kind, ward_id) VALUES (%s, %s) RETURNING id;", (kind, ward_id))
+    return cur.fetchone()[0]
+
+
+def job_to_dict(row):
+    job = dict(zip([c.strip() for c in JOB_COLUMNS.split(',')], row))
+    for key in ("created_at", "started_at", "updated_at", "finished_at"):
+        job[key] = job[key].isoformat() if job[key] else None
+    total = job["total"]
+    job["progress"] = 1.0 if job["status"] == 'done' else (
+        round(min(job["processed"] / total, 0.99), 4) if total else 0.0
+    )
+    return job
+
+
+class RerouteWorker:
+    def __init__(self, batch_size=REROUTE_BATCH_SIZE, poll_interval=REROUTE_POLL_INTERVAL,
+                 batch_pause=REROUTE_BATCH_PAUSE, max_attempts=REROUTE_MAX_ATTEMPTS, enabled=REROUTE_ENABLED):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.batch_pause = batch_pause
+        self.max_attempts = max_attempts
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+        # Called with the set of ward ids whose complaints changed after a batch commits
+        self.on_batch = None
+        self._stats = {"batches": 0, "moved": 0, "jobs_finished": 0, "errors": 0}
+
+    # Threads do not survive fork(), so start lazily in each worker process
+    def ensure_started(self):
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name="reroute-worker", daemon=True).start()
+            self._pid = os.getpid()
+
+    def notify(self):
+        """A job was just recorded by this process: start on it right away."""
+        self.ensure_started()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            try:
+                worked = self.run_batch()
+            except Exception as e:
+                log.warning("Re-routing batch failed: %s", e)
+                with self._lock:
+                    self._stats["errors"] += 1
+                worked = False
+            if worked:
+                time.sleep(self.batch_pause)
+                continue
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def run_batch(self):
+        """Advances the oldest unclaimed job by one batch. False when idle."""
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT id, kind, ward_id, status, part_cursor, complaint_cursor, total, attempts
+                FROM reroute_jobs WHERE status IN ('pending', 'running')
+                ORDER BY id LIMIT 1 FOR UPDATE SKIP LOCKED;
+            """)
+            job = cur.fetchone()
+            if job is None:
+                conn.rollback()
+                return False
+            job_id = job[0]
+            cur.execute("SAVEPOINT batch;")
+            try:
+                touched = self._advance(cur, *job)
+            except Exception as e:
+                cur.execute("ROLLBACK TO SAVEPOINT batch;")
+                attempts = job[7] + 1
+                failed = attempts >= self.max_attempts
+                cur.execute("""
+                    UPDATE reroute_jobs SET attempts = %s, error = %s,
+                           status = CASE WHEN %s THEN 'failed' ELSE status END,
+                           updated_at = CURRENT_TIMESTAMP,
+                           finished_at = CASE WHEN %s THEN CURRENT_TIMESTAMP END
+                    WHERE id = %s;
+                """, (attempts, str(e), failed, failed, job_id))
+                conn.commit()
+                log.warning("Re-routing job %s failed (attempt %d): %s", job_id, attempts, e)
+                with self._lock:
+                    self._stats["errors"] += 1
+                return False
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+        if touched and self.on_batch is not None:
+            try:
+                self.on_batch(touched)
+            except Exception as e:
+                log.warning("Re-routing hook failed: %s", e)
+        return True
+
+    def _advance(self, cur, job_id, kind, ward_id, status, part_cursor, complaint_cursor, total, attempts):
+        if status == 'pending':
+            total = self._count(cur, kind, ward_id)
+            cur.execute("""
+                UPDATE reroute_jobs SET status = 'running', total = %s, started_at = CURRENT_TIMESTAMP
+                WHERE id = %s;
+            """, (total, job_id))
+
+        if kind == 'ward_deleted':
+            cur.execute(DELETED_BATCH_SQL, {"ward": ward_id, "limit": self.batch_size})
+            processed, new_wards = cur.fetchone()
+            moved, touched = processed, set(new_wards or ())
+            touched.add(ward_id)
+            done = processed == 0
+            if done:
+                # Nothing points at the ward any more; a report routed by a
+                # worker whose ward index was not reloaded yet just means
+                # one more batch. delete_ward already released the ward's
+                # admins; this covers wards deleted before it did
+                release_ward_admins(cur, ward_id)
+                cur.execute("DELETE FROM wards WHERE id = %s AND deleted_at IS NOT NULL "
+                            "AND NOT EXISTS (SELECT 1 FROM complaints WHERE ward_id = %s);", (ward_id, ward_id))
+                done = cur.rowcount == 1 or not self._ward_exists(cur, ward_id)
+        else:
+            processed, moved, touched, part_cursor, complaint_cursor, done = self._advance_created(
+                cur, ward_id, part_cursor, complaint_cursor)
+            if moved:
+                touched.add(ward_id)
+
+        cur.execute("""
+            UPDATE reroute_jobs
+            SET processed = processed + %s, moved = moved + %s, batches = batches + 1, attempts = 0,
+                part_cursor = %s, complaint_cursor = %s, updated_at = CURRENT_TIMESTAMP,
+                status = CASE WHEN %s THEN 'done' ELSE status END,
+                finished_at = CASE WHEN %s THEN CURRENT_TIMESTAMP END
+            WHERE id = %s;
+        """, (processed, moved, part_cursor, complaint_cursor, done, done, job_id))
+
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["moved"] += moved
+            self._stats["jobs_finished"] += 1 if done else 0
+        return touched if moved else set()
+
+    def _advance_created(self, cur, ward_id, part_cursor, complaint_cursor):
+        """One batch from the current piece; moves to the next piece when it is exhausted."""
+        if part_cursor == 0:
+            part_cursor = self._next_part(cur, ward_id, 0)
+        if part_cursor is None:
+            return 0, 0, set(), 0, 0, True
+        cur.execute(CREATED_BATCH_SQL, {
+            "part": part_cursor, "after": complaint_cursor, "ward": ward_id, "limit": self.batch_size
+        })
+        processed, last_id, moved, old_wards = cur.fetchone()
+        if processed < self.batch_size:
+            next_part = self._next_part(cur, ward_id, part_cursor)
+            if next_part is None:
+                return processed, moved, set(old_wards or ()), part_cursor, last_id or complaint_cursor, True
+            return processed, moved, set(old_wards or ()), next_part, 0, False
+        return processed, moved, set(old_wards or ()), part_cursor, last_id, False
+
+    def _next_part(self, cur, ward_id, after):
+        cur.execute("SELECT min(id) FROM ward_parts WHERE ward_id = %s AND id > %s;", (ward_id, after))
+        return cur.fetchone()[0]
+
+    def _ward_exists(self, cur, ward_id):
+        cur.execute("SELECT 1 FROM wards WHERE id = %s;", (ward_id,))
+        return cur.fetchone() is not None
+
+    def _count(self, cur, kind, ward_id):
+        """Complaints the job will look at, for progress reporting."""
+        if kind == 'ward_deleted':
+            cur.execute("SELECT count(*) FROM complaints WHERE ward_id = %s;", (ward_id,))
+        else:
+            cur.execute("SELECT count(*) FROM ward_parts p JOIN complaints c ON c.geom && p.geom WHERE p.ward_id = %s;",
+                        (ward_id,))
+        return cur.fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            return {"running": self._pid == os.getpid(), **self._stats}
+
+
+reroute_worker = RerouteWorker()
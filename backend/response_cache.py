@@ -0,0 +1,305 @@
+"""
+Response cache for read endpoints whose data only changes on known writes.
+
+Entries are grouped into scopes (the ward feed uses one scope per ward). A
+scope has a generation token that is part of every key stored under it, and
+invalidating the scope just replaces the token: older entries become
+unreachable and age out. A reader takes the token before it queries, so a
+write that lands while a response is being built can never be cached under
+the new generation.
+
+RESPONSE_CACHE_BACKEND picks where entries live:
+  memory  per-process LRU with a TTL (default with a single worker).
+          Invalidations only reach the worker that made the write; other
+          workers serve their copy for at most RESPONSE_CACHE_TTL seconds.
+  local   files under RESPONSE_CACHE_DIR, shared by every worker on the host
+          (default when WEB_WORKERS > 1, so every worker sees invalidations;
+          also a stand-in for a shared cache in development). Swept every
+          RESPONSE_CACHE_SWEEP_INTERVAL seconds and capped at
+          RESPONSE_CACHE_MAX_ENTRIES files per host.
+  redis   a Redis server at RESPONSE_CACHE_URL, shared by every host (needs
+          the optional `redis` package)
+  off     no caching
+"""
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+# Same default as gunicorn.conf.py: one worker per CPU
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", str(os.cpu_count() or 1)))
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "local" if WEB_WORKERS > 1 else "memory").lower()
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", "response_cache")
+RESPONSE_CACHE_SWEEP_INTERVAL = float(os.getenv("RESPONSE_CACHE_SWEEP_INTERVAL", "60"))
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+
+
+class MemoryBackend:
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._generations = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generation(self, scope):
+        with self._lock:
+            return str(self._generations.get(scope, 0))
+
+    def bump(self, scope):
+        with self._lock:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+
+
+class LocalBackend:
+    """
+    Shares entries between worker processes through the filesystem, as
+    <scope>/<generation>/<digest> files. Expired files are deleted when they
+    are read, and every sweep_interval seconds one writer sweeps the tree:
+    it deletes expired files and directories of old generations, then the
+    oldest files beyond max_entries.
+    """
+
+    def __init__(self, root=RESPONSE_CACHE_DIR, max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+                 sweep_interval=RESPONSE_CACHE_SWEEP_INTERVAL):
+        self.root = os.path.abspath(root)
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._sweep_lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+        os.makedirs(os.path.join(self.root, "_generations"), exist_ok=True)
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def get(self, key):
+        path = os.path.join(self.root, key)
+        try:
+            with open(path, 'rb') as f:
+                expires_at = float(f.readline())
+                if expires_at >= time.time():
+                    return f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        self._remove(path)
+        return None
+
+    def set(self, key, value, ttl):
+        self._write(os.path.join(self.root, key), f"{time.time() + ttl}\n".encode() + value)
+        if time.monotonic() >= self._next_sweep and self._sweep_lock.acquire(blocking=False):
+            try:
+                self._next_sweep = time.monotonic() + self.sweep_interval
+                self.sweep()
+            finally:
+                self._sweep_lock.release()
+
+    def sweep(self):
+        """Deletes expired and unreachable entries, then caps the rest. Returns the number deleted."""
+        now = time.time()
+        removed = 0
+        entries = []  # (mtime, path) of live entries
+        for scope in os.listdir(self.root):
+            scope_dir = os.path.join(self.root, scope)
+            if scope == "_generations" or not os.path.isdir(scope_dir):
+                continue
+            current = self.generation(scope)
+            try:
+                generations = os.listdir(scope_dir)
+            except FileNotFoundError:  # removed by a concurrent bump()
+                continue
+            for generation in generations:
+                generation_dir = os.path.join(scope_dir, generation)
+                # bump() removes the old generation, but a reader that took the
+                # token before the bump can still store a page under it
+                try:
+                    names = os.listdir(generation_dir)
+                except FileNotFoundError:
+                    continue
+                if generation != current:
+                    shutil.rmtree(generation_dir, ignore_errors=True)
+                    removed += len(names)
+                    continue
+                for name in names:
+                    path = os.path.join(generation_dir, name)
+                    try:
+                        with open(path, 'rb') as f:
+                            mtime = os.fstat(f.fileno()).st_mtime
+                            # Leftovers of a writer that died mid-write
+                            expired = (mtime + self.sweep_interval < now if name.endswith(".tmp")
+                                       else float(f.readline()) < now)
+                    except FileNotFoundError:
+                        continue
+                    except ValueError:
+                        expired = True
+                    if expired:
+                        self._remove(path)
+                        removed += 1
+                    elif not name.endswith(".tmp"):
+                        entries.append((mtime, path))
+        entries.sort()
+        for _, path in entries[:max(len(entries) - self.max_entries, 0)]:
+            self._remove(path)
+            removed += 1
+        return removed
+
+    def generation(self, scope):
+        try:
+            with open(os.path.join(self.root, "_generations", scope), 'rb') as f:
+                return f.read().decode()
+        except FileNotFoundError:
+            return "0"
+
+    def bump(self, scope):
+        # A random token (not a counter) so concurrent bumps cannot collide
+        self._write(os.path.join(self.root, "_generations", scope), uuid.uuid4().hex.encode())
+        shutil.rmtree(os.path.join(self.root, scope), ignore_errors=True)
+
+
+class RedisBackend:
+    def __init__(self, url=RESPONSE_CACHE_URL):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl):
+        self.client.set(key, value, ex=max(int(ttl), 1))
+
+    def generation(self, scope):
+        value = self.client.get(f"gen:{scope}")
+        return value.decode() if value else "0"
+
+    def bump(self, scope):
+        self.client.incr(f"gen:{scope}")
+
+
+def make_backend(name=RESPONSE_CACHE_BACKEND):
+    if name == 'off':
+        return None
+    if name == 'local':
+        return LocalBackend()
+    if name == 'redis':
+        return RedisBackend()
+    return MemoryBackend()
+
+
+class ResponseCache:
+    """
+    Serialized responses keyed by (scope, request parameters). Backend errors
+    are logged and treated as misses, so the cache can never fail a request.
+    """
+
+    def __init__(self, name, ttl=RESPONSE_CACHE_TTL, backend_name=RESPONSE_CACHE_BACKEND):
+        self.name = name
+        self.ttl = ttl
+        self.backend_name = backend_name
+        self._lock = threading.Lock()
+        self._backend = None
+        self._backend_ready = False
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0, "errors": 0}
+
+    def _get_backend(self):
+        if not self._backend_ready:
+            with self._lock:
+                if not self._backend_ready:
+                    self._backend = make_backend(self.backend_name)
+                    self._backend_ready = True
+        return self._backend
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _scope(self, scope):
+        return f"{self.name}-{scope}"
+
+    def lookup(self, scope, params):
+        """
+        Returns (body, key): the cached body (or None on a miss) and the key
+        to store the freshly built body under with store().
+        """
+        backend = self._get_backend()
+        if backend is None:
+            return None, None
+        scope = self._scope(scope)
+        digest = hashlib.sha1(repr(sorted(params)).encode()).hexdigest()
+        try:
+            key = f"{scope}/{backend.generation(scope)}/{digest}"
+            body = backend.get(key)
+        except Exception as e:
+            log.warning("Response cache lookup failed: %s", e)
+            self._count("errors")
+            return None, None
+        self._count("hits" if body is not None else "misses")
+        return body, key
+
+    def store(self, key, body):
+        backend = self._get_backend()
+        if backend is None or key is None:
+            return
+        try:
+            backend.set(key, body, self.ttl)
+        except Exception as e:
+            log.warning("Response cache store failed: %s", e)
+            self._count("errors")
+            return
+        self._count("stores")
+
+    def invalidate(self, *scopes):
+        """Drops every entry of the given scopes (None scopes are ignored)."""
+        backend = self._get_backend()
+        if backend is None:
+            return
+        for scope in {s for s in scopes if s is not None}:
+            try:
+                backend.bump(self._scope(scope))
+            except Exception as e:
+                log.warning("Response cache invalidation failed: %s", e)
+                self._count("errors")
+                continue
+            self._count("invalidations")
+
+    def stats(self):
+        with self._lock:
+            return {"ttl": self.ttl, **self._stats}
+
+
+# GET /api/v1/complaints/ward, one scope per ward id
+feed_cache = ResponseCache("feed")
@@ -0,0 +1,163 @@
+"""
+Full-text search over complaint descriptions and categories.
+
+    ?q=broken streetlight&lat=9.5&lon=76.5&radius_m=2000&limit=20&cursor=...
+
+A complaint matches when its search_vector (migration 0012: category
+weighted above description, English stemming, GIN indexed) matches the
+query, or when the query is word-similar to its text (pg_trgm, trigram GIN
+index), which catches typos such as "stretlight". Results are ranked by
+
+    score = (ts_rank_cd + SEARCH_TRGM_WEIGHT * word_similarity)
+            / (1 + distance_m / SEARCH_DISTANCE_SCALE_M)
+
+with the distance term only when a point is given, and keyset-paginated on
+(score, id). Only a bounded window of matches is ranked: the
+SEARCH_CANDIDATE_LIMIT newest ones, or the nearest ones when a point is
+given. A common word can match a large share of the table, and ranking
+every match (ts_rank_cd and word_similarity per row, then a sort) is what
+made such queries slow; the window is picked through the indexes and costs
+at most that many rows whatever the query. Matches outside it are not
+returned, so a very broad query should be narrowed by place or date. The listing filters (status, category, since, until) and field
+projection work as in listing.py; the endpoint adds its own scoping, e.g.
+the admin's wards.
+"""
+import base64
+import json
+import os
+
+from listing import COMPLAINT_FIELDS, ComplaintListing, ListingError
+
+SEARCH_QUERY_MAX_LENGTH = 200
+# Weight of trigram similarity next to the full-text rank (0..1 each)
+SEARCH_TRGM_WEIGHT = float(os.getenv("SEARCH_TRGM_WEIGHT", "0.3"))
+# Distance at which a result's score is halved
+SEARCH_DISTANCE_SCALE_M = float(os.getenv("SEARCH_DISTANCE_SCALE_M", "1000"))
+SEARCH_RADIUS_MAX_M = 50000
+# Matches ranked per query (see above); pages beyond it come back empty
+SEARCH_CANDIDATE_LIMIT = int(os.getenv("SEARCH_CANDIDATE_LIMIT", "2000"))
+
+# Text the trigram index is built on; must match migration 0012 exactly
+SEARCH_TEXT_SQL = "(coalesce(c.category, '') || ' ' || coalesce(c.description, ''))"
+
+
+class ComplaintSearch(ComplaintListing):
+    """
+    Parses the search parameters on top of the listing ones and builds the
+    ranked, paged SELECT. Rows start with (score, id) for the cursor.
+    """
+
+    def __init__(self, args, default_fields):
+        self.text = (args.get('q') or '').strip()
+        if not self.text:
+            raise ListingError("q is required")
+        if len(self.text) > SEARCH_QUERY_MAX_LENGTH:
+            raise ListingError(f"q must be at most {SEARCH_QUERY_MAX_LENGTH} characters")
+
+        self.point = None
+        if args.get('lat') or args.get('lon'):
+            try:
+                lat, lon = float(args['lat']), float(args['lon'])
+            except (KeyError, ValueError):
+                raise ListingError("lat and lon must both be numbers")
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                raise ListingError("lat/lon out of range")
+            self.point = (lon, lat)
+
+        self.radius = None
+        if args.get('radius_m'):
+            if self.point is None:
+                raise ListingError("radius_m needs lat and lon")
+            try:
+                self.radius = float(args['radius_m'])
+            except ValueError:
+                raise ListingError("radius_m must be a number")
+            if not 0 < self.radius <= SEARCH_RADIUS_MAX_M:
+                raise ListingError(f"radius_m must be between 0 and {SEARCH_RADIUS_MAX_M}")
+
+        super().__init__(args, default_fields)
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            score, row_id = json.loads(raw)
+            return float(score), int(row_id)
+        except Exception:
+            raise ListingError("Invalid cursor")
+
+    def encode_cursor(self, row):
+        raw = json.dumps([row[0], row[1]]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def query(self, where=None, params=(), paged=True):
+        """
+        Returns (sql, params) like ComplaintListing.query. Rows are
+        (score, id, *fields); the filters apply before ranking.
+        """
+        relevance = f"ts_rank_cd(c.search_vector, c.tsq, 32) + %s * word_similarity(%s, {SEARCH_TEXT_SQL})"
+        values = [SEARCH_TRGM_WEIGHT, self.text]
+        origin, carried, distance, score = "", "", "NULL::float8", relevance
+        window = "c.created_at DESC, c.id DESC"
+        if self.point is not None:
+            origin = "CROSS JOIN (SELECT ST_SetSRID(ST_MakePoint(%s, %s), 4326) AS pt) origin"
+            carried = ", origin.pt"
+            distance = "ST_Distance(c.geom::geography, c.pt::geography)"
+            score = f"({relevance}) / (1 + {distance} / %s)"
+            values.append(SEARCH_DISTANCE_SCALE_M)
+            # Nearest first, through the geometry GiST index (KNN); the point
+            # is spelled out because index ordering needs a constant operand
+            window = "c.geom <-> ST_SetSRID(ST_MakePoint(%s, %s), 4326), c.id DESC"
+
+        values.append(self.text)
+        if self.point is not None:
+            values.extend(self.point)
+
+        conditions, filter_values = self.filters(where, params)
+        conditions.insert(0, f"(c.search_vector @@ query.tsq OR %s <%% {SEARCH_TEXT_SQL})")
+        values.append(self.text)
+        values.extend(filter_values)
+        if self.radius is not None:
+            conditions.append("ST_DWithin(c.geom::geography, origin.pt::geography, %s)")
+            values.append(self.radius)
+        if self.point is not None:
+            values.extend(self.point)
+        values.append(SEARCH_CANDIDATE_LIMIT)
+
+        # Score is rounded so the cursor round-trips exactly through JSON
+        columns = [f"round(({score})::numeric, 8)::float8 AS score", "c.id AS id", f"{distance} AS distance_m"]
+        columns += [f"{COMPLAINT_FIELDS[f]} AS {f}" for f in self.fields if f in COMPLAINT_FIELDS and f != 'id']
+        select = ", ".join(f"ranked.{f}" for f in self.fields)
+
+        outer_where = ""
+        if self.cursor and paged:
+            outer_where = "WHERE (ranked.score, ranked.id) < (%s, %s)"
+            values.extend(self.cursor)
+
+        # Filters apply in the window, so every candidate is a real result
+        sql = f"""
+            SELECT ranked.score, ranked.id, {select}
+            FROM (
+                SELECT {", ".join(columns)}
+                FROM (
+                    SELECT c.*, query.tsq{carried}
+                    FROM complaints c
+                    CROSS JOIN websearch_to_tsquery('english', %s) AS query(tsq)
+                    {origin}
+                    WHERE {" AND ".join(conditions)}
+                    ORDER BY {window}
+                    LIMIT %s
+                ) c
+            ) ranked
+            {outer_where}
+            ORDER BY ranked.score DESC, ranked.id DESC
+            {"LIMIT %s" if paged else ""};
+        """
+        if paged:
+            values.append(self.limit + 1)
+        return sql, values
+
+    def format_row(self, row):
+        item = super().format_row(row)
+        if item.get('distance_m') is not None:
+            item['distance_m'] = round(item['distance_m'], 1)
+        return item
@@ -0,0 +1,77 @@
+"""
+Object storage backends for complaint images.
+
+STORAGE_BACKEND=supabase (default) uploads to the Supabase Storage bucket.
+STORAGE_BACKEND=local writes to LOCAL_STORAGE_DIR and serves the files from
+the API itself (/media/<key>), so the upload pipeline runs fully offline.
+"""
+import os
+import threading
+import uuid
+
+from dotenv import load_dotenv
+
+load_dotenv()
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").lower()
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET")
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "local_storage")
+LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL", "/media")
+
+
+class SupabaseStorage:
+    def __init__(self, url, key, bucket):
+        from supabase import create_client
+        self.client = create_client(url, key)
+        self.bucket = bucket
+
+    def upload(self, key, data, content_type):
+        """Uploads `data` (bytes-like) under `key` and returns its public URL."""
+        bucket = self.client.storage.from_(self.bucket)
+        # upsert keeps retries of a half-finished job idempotent
+        bucket.upload(
+            path=key, file=bytes(data),
+            file_options={"content-type": content_type, "upsert": "true"}
+        )
+        return bucket.get_public_url(key)
+
+
+class LocalStorage:
+    """Filesystem stand-in for Supabase Storage (development and tests)."""
+
+    def __init__(self, root, base_url):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip('/')
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def upload(self, key, data, content_type):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a half-written object
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return f"{self.base_url}/{key}"
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                if STORAGE_BACKEND == 'local':
+                    _storage = LocalStorage(LOCAL_STORAGE_DIR, LOCAL_STORAGE_URL)
+                else:
+                    _storage = SupabaseStorage(SUPABASE_URL, SUPABASE_KEY, SUPABASE_BUCKET)
+    return _storage
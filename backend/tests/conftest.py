@@ -0,0 +1,37 @@
+"""
+Shared fixtures. Pure-logic tests run anywhere; tests that need PostgreSQL/
+PostGIS take the `db_cursor` fixture and are skipped unless DB_HOST and
+DB_NAME point at a migrated database (python migrate.py).
+"""
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Inline image work: no process pool is started for tests
+os.environ.setdefault("IMAGE_PROCESSES", "0")
+
+
+def database_configured():
+    from helper import DB_HOST, DB_NAME
+    return bool(DB_HOST and DB_NAME)
+
+
+@pytest.fixture
+def db_cursor():
+    """A cursor on the configured database; everything is rolled back."""
+    if not database_configured():
+        pytest.skip("no database configured (set DB_HOST / DB_NAME)")
+    from helper import get_db_connection
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        yield cur
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
@@ -0,0 +1,13 @@
+import pytest
+
+from app import app
+
+
+@pytest.mark.parametrize("method, path", [
+    ("GET", "/api/v1/admin/reroute-jobs"),
+    ("GET", "/api/v1/admin/reroute-jobs/1"),
+    ("POST", "/api/v1/admin/reroute-jobs/1/retry"),
+])
+def test_reroute_job_routes_need_a_user(method, path):
+    response = app.test_client().open(path, method=method)
+    assert response.status_code == 401
@@ -0,0 +1,161 @@
+import datetime
+import random
+import threading
+
+import dedup
+from dedup import (IMAGE_DUP_RADIUS_M, PHASH_DISTINCT_DISTANCE, PHASH_MAX_DISTANCE, SPATIAL_DUP_RADIUS_M,
+                   OpenComplaintIndex, find_duplicates, haversine_m, pick_duplicate)
+from helper import hash_to_db
+
+HASH = 0xF0F0F0F0F0F0F0F0
+
+
+def flip(value, bits):
+    """`value` with its lowest `bits` bits inverted."""
+    return value ^ ((1 << bits) - 1)
+
+
+def test_no_candidates():
+    assert pick_duplicate([], "pothole", HASH) is None
+
+
+def test_same_category_nearby_is_a_duplicate():
+    candidates = [(1, "pothole", None, SPATIAL_DUP_RADIUS_M - 1), (2, "pothole", None, 5)]
+    assert pick_duplicate(candidates, "pothole", None) == 2
+
+
+def test_same_category_too_far_is_not():
+    assert pick_duplicate([(1, "pothole", None, SPATIAL_DUP_RADIUS_M + 1)], "pothole", None) is None
+
+
+def test_clearly_different_photos_are_distinct_issues():
+    candidates = [(1, "pothole", flip(HASH, PHASH_DISTINCT_DISTANCE + 1), 3)]
+    assert pick_duplicate(candidates, "pothole", HASH) is None
+    candidates = [(1, "pothole", flip(HASH, PHASH_DISTINCT_DISTANCE), 3)]
+    assert pick_duplicate(candidates, "pothole", HASH) == 1
+
+
+def test_similar_photo_matches_across_categories():
+    candidates = [(1, "garbage", flip(HASH, PHASH_MAX_DISTANCE), IMAGE_DUP_RADIUS_M)]
+    assert pick_duplicate(candidates, "pothole", HASH) == 1
+    assert pick_duplicate(candidates, "pothole", HASH, image_rule=False) is None
+
+
+def test_photo_match_wins_over_nearer_same_category():
+    candidates = [(1, "pothole", None, 1), (2, "garbage", flip(HASH, 2), 30), (3, "garbage", flip(HASH, 1), 40)]
+    assert pick_duplicate(candidates, "pothole", HASH) == 3
+
+
+def test_index_candidates_match_brute_force():
+    rng = random.Random(7)
+    base_lat, base_lon = 9.5, 76.5
+    categories = ["pothole", "garbage", "streetlight"]
+    rows = []
+    for complaint_id in range(1, 3001):
+        image_hash = rng.choice([None, flip(HASH, rng.randint(0, 16)), rng.getrandbits(64)])
+        rows.append((
+            complaint_id,
+            base_lat + rng.uniform(-0.003, 0.003),
+            base_lon + rng.uniform(-0.003, 0.003),
+            rng.choice(categories),
+            hash_to_db(image_hash),
+            1,
+            rng.choice(["pending", "in_progress", "resolved", None]),
+        ))
+    index = OpenComplaintIndex(cell_m=25)
+    index.load_rows(rows, synced_at=None)
+
+    for _ in range(200):
+        lat = base_lat + rng.uniform(-0.003, 0.003)
+        lon = base_lon + rng.uniform(-0.003, 0.003)
+        category = rng.choice(categories)
+        image_hash = rng.choice([None, HASH])
+        expected = []
+        for complaint_id, c_lat, c_lon, c_category, c_hash, _, status in rows:
+            if status is None or status == "resolved":
+                continue
+            unsigned = c_hash & ((1 << 64) - 1) if c_hash is not None else None
+            metres = haversine_m(lat, lon, c_lat, c_lon)
+            expected.append((complaint_id, c_category, unsigned, metres))
+        candidates = index.duplicate_candidates(lat, lon, category, image_hash)
+        assert pick_duplicate(candidates, category, image_hash) == pick_duplicate(expected, category, image_hash)
+
+
+class RecordingCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_index_miss_is_rechecked_for_recent_rows(monkeypatch):
+    synced_at = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    index = OpenComplaintIndex(sync_margin=60)
+    index.load_rows([(1, 9.5, 76.5, "pothole", None, 1, "pending")], synced_at=synced_at)
+    monkeypatch.setattr(dedup, "open_complaints", index)
+
+    # A hit in memory needs no query
+    cur = RecordingCursor([])
+    assert find_duplicates(cur, [(76.5, 9.5, "pothole", None)]) == [1]
+    assert cur.executed == []
+
+    # A miss asks for rows changed since the window the next sync reads; a
+    # report another worker filed there is the duplicate
+    cur = RecordingCursor([(0, 7, "garbage", None, 3.0)])
+    assert find_duplicates(cur, [(76.5, 9.5, "pothole", None), (76.5, 9.5, "garbage", None)]) == [1, 7]
+    (sql, params), = cur.executed
+    assert "updated_at > %(since)s" in sql
+    assert params["since"] == synced_at - datetime.timedelta(seconds=60)
+    assert params["category"] == ["garbage"]
+
+
+class SyncCursor:
+    """Returns `rows` for the sync query; `during_query` runs while it is in flight."""
+
+    def __init__(self, now, rows, during_query):
+        self.now = now
+        self.rows = rows
+        self.during_query = during_query
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchone(self):
+        return (self.now,)
+
+    def fetchall(self):
+        self.during_query()
+        return self.rows
+
+
+def test_sync_queries_without_the_lock():
+    synced_at = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    index = OpenComplaintIndex(sync_interval=0)
+    index.load_rows([(1, 9.5, 76.5, "pothole", None, 1, "pending")], synced_at=synced_at)
+    acquired = []
+
+    def use_index():
+        acquired.append(index._lock.acquire(timeout=1))
+        index._lock.release()
+
+    def during_query():
+        # Another thread can use the index, and this worker resolves
+        # complaint 1 after the query read it as still open
+        thread = threading.Thread(target=use_index)
+        thread.start()
+        thread.join()
+        index.apply_row((1, 9.5, 76.5, "pothole", None, 1, "resolved"))
+
+    now = synced_at + datetime.timedelta(seconds=5)
+    cur = SyncCursor(now, [(1, 9.5, 76.5, "pothole", None, 1, "pending"),
+                           (2, 9.5, 76.5, "pothole", None, 1, "pending")], during_query)
+    index.sync(cur)
+
+    assert acquired == [True]
+    assert [c[0] for c in index.duplicate_candidates(9.5, 76.5, "pothole", None)] == [2]
+    assert index.unsynced_since() == now - datetime.timedelta(seconds=index.sync_margin)
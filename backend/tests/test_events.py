@@ -0,0 +1,135 @@
+import json
+import os
+
+import pytest
+
+from events import EventHub, EventStreamError, SeenIds, Subscription, event_stream, format_event
+
+
+def event(event_id, ward_id=1):
+    return {"id": event_id, "ward_id": ward_id, "kind": "updated", "data": {"id": 10}}
+
+
+def test_queue_delivers_in_order():
+    sub = Subscription(frozenset({1}))
+    for i in range(3):
+        sub.push(event(i), limit=5)
+    assert [e["id"] for e in sub.wait(0)] == [0, 1, 2]
+    assert not sub.overflowed
+    assert sub.wait(0) == []
+
+
+def test_overflow_drops_the_queue():
+    sub = Subscription(frozenset({1}))
+    for i in range(4):
+        sub.push(event(i), limit=3)
+    # The fourth push found the queue full: everything is dropped and the
+    # stream has to catch up from the table
+    assert sub.overflowed
+    assert sub.wait(0) == []
+    sub.overflowed = False
+    sub.push(event(4), limit=3)
+    assert [e["id"] for e in sub.wait(0)] == [4]
+
+
+def test_hub_fans_out_by_ward_and_counts_overflows():
+    # pytest runs unpatched, like a threaded worker
+    hub = EventHub(queue_size=2, max_subscribers=3, threaded_max_subscribers=5)
+    # No listener thread: dispatch is driven by hand
+    hub._pid = os.getpid()
+    ward_1, ward_2, every = hub.subscribe([1]), hub.subscribe([2]), hub.subscribe(None)
+    with pytest.raises(EventStreamError):
+        hub.subscribe([1])
+
+    for i in range(3):
+        hub.dispatch(json.dumps(event(i, ward_id=1)))
+    hub.dispatch("not json")
+    assert ward_1.overflowed and every.overflowed
+    assert ward_2.wait(0) == [] and not ward_2.overflowed
+    assert hub.stats()["overflows"] == 2
+
+    hub.unsubscribe(ward_1)
+    hub.unsubscribe(ward_1)
+    assert hub.stats()["subscribers"] == 2
+
+
+def test_threaded_workers_refuse_streams_by_default():
+    hub = EventHub(max_subscribers=10, threaded_max_subscribers=0)
+    hub._pid = os.getpid()
+    with pytest.raises(EventStreamError, match="SERVER_MODE=async"):
+        hub.subscribe([1])
+    assert hub.stats()["subscribers"] == 0
+
+
+def test_format_event():
+    text = format_event(event(7, ward_id=3))
+    assert text.startswith("id: 7\nevent: updated\ndata: ")
+    assert text.endswith("\n\n")
+    assert json.loads(text.split("data: ", 1)[1]) == {"ward_id": 3, "complaint": {"id": 10}}
+
+
+def test_seen_ids_forget_the_oldest():
+    seen = SeenIds(size=2)
+    for i in (1, 2, 3):
+        seen.add(i)
+    assert 1 not in seen and 2 in seen and 3 in seen
+
+
+class ReplayHub:
+    """Stands in for EventHub: replay() serves fixed rows, nothing is listening."""
+
+    def __init__(self, rows, newest=0):
+        self.rows = rows
+        self.newest = newest
+        self.replayed_after = []
+        self.unsubscribed = False
+
+    def last_event_id(self):
+        return self.newest
+
+    def replay(self, ward_ids, after):
+        self.replayed_after.append(after)
+        return list(self.rows), max([after] + [e["id"] for e in self.rows]), True
+
+    def unsubscribe(self, sub):
+        self.unsubscribed = True
+
+
+def sent_ids(messages):
+    """The SSE id of each event message."""
+    return [int(m.split("\n", 1)[0][4:]) for m in messages if m.startswith("id: ")]
+
+
+def test_stream_delivers_late_commits_once():
+    hub = ReplayHub([], newest=10)
+    sub = Subscription(frozenset({1}))
+    stream = event_stream(hub, sub, heartbeat=0)
+    assert next(stream).startswith("retry:")
+
+    # Event 9 commits after event 11: it is still sent, and the stream id
+    # does not go back; a repeat of 11 is skipped
+    for event_id in (11, 9, 11, 12):
+        sub.push(event(event_id), limit=10)
+    messages = [next(stream) for _ in range(3)]
+    assert sent_ids(messages) == [11, 11, 12]
+    assert [json.loads(m.split("data: ", 1)[1])["complaint"] for m in messages] == [{"id": 10}] * 3
+    stream.close()
+    assert hub.unsubscribed
+
+
+def test_resume_skips_what_was_already_sent():
+    # The replay window starts before the resume point: 7 was sent before
+    # the reconnect, 6 committed late and was not
+    hub = ReplayHub([event(6), event(7), event(8)])
+    sub = Subscription(frozenset({1}))
+    stream = event_stream(hub, sub, last_id=7, heartbeat=0)
+    next(stream)
+    messages = [next(stream), next(stream)]
+    assert hub.replayed_after == [7]
+    assert sent_ids(messages) == [7, 8]
+    assert "event: updated" in messages[0]
+
+    # A later catch-up re-reads the same window; nothing is sent twice
+    sub.overflowed = True
+    assert next(stream) == ": keep-alive\n\n"
+    stream.close()
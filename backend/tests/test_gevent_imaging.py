@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("gevent")
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_image_pool_under_gevent():
+    # Its own process: monkey-patching must happen before anything else is imported
+    env = {k: v for k, v in os.environ.items() if k != "IMAGE_PROCESSES"}
+    result = subprocess.run(
+        [sys.executable, os.path.join(BACKEND, "benchmarks", "gevent_image_check.py"),
+         "--images", "6", "--processes", "2", "--size", "1600", "1200"],
+        cwd=BACKEND, env=env, capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,33 @@
+import io
+
+from PIL import Image
+
+from imaging import ingest_task
+
+ORIENTATION = 0x0112
+
+
+def _rotated_jpeg():
+    """A 400x200 photo, red left and blue right, tagged to be shown turned 90° clockwise."""
+    image = Image.new("RGB", (400, 200), "blue")
+    image.paste("red", (0, 0, 200, 200))
+    exif = Image.Exif()
+    exif[ORIENTATION] = 6
+    out = io.BytesIO()
+    image.save(out, format="JPEG", exif=exif)
+    return out.getvalue()
+
+
+def test_ingest_applies_exif_orientation():
+    main, extension, _, renditions = ingest_task(_rotated_jpeg(), 100, 80, [40], 70)
+    assert extension == ".jpg"
+
+    with Image.open(io.BytesIO(main)) as image:
+        assert image.size == (50, 100)
+        assert image.getexif().get(ORIENTATION) is None
+        # The left of the stored pixels is the top once upright
+        top, bottom = image.getpixel((25, 10)), image.getpixel((25, 90))
+    assert top[0] > 200 and top[2] < 60
+    assert bottom[2] > 200 and bottom[0] < 60
+
+    assert {(w, h) for w, h, *_ in renditions} == {(40, 80)}
@@ -0,0 +1,42 @@
+import datetime
+
+import pytest
+
+from listing import PAGE_LIMIT_MAX, ComplaintListing, ListingError, decode_cursor, encode_cursor
+
+FIELDS = ["id", "category", "status"]
+
+
+@pytest.mark.parametrize("created_at", [
+    datetime.datetime(2024, 3, 1, 12, 30, 45, 123456, tzinfo=datetime.timezone.utc),
+    datetime.datetime(2024, 3, 1, 18, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=5, minutes=30))),
+    datetime.datetime(2024, 3, 1, 12, 30),
+])
+def test_cursor_round_trip(created_at):
+    cursor = encode_cursor(created_at, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "bnVsbA", "WzEsMiwzXQ"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ListingError):
+        decode_cursor(cursor)
+
+
+def test_listing_cursor_and_limit():
+    created_at = datetime.datetime(2024, 3, 1, tzinfo=datetime.timezone.utc)
+    listing = ComplaintListing({"cursor": encode_cursor(created_at, 7), "limit": "100000"}, FIELDS)
+    assert listing.cursor == (created_at, 7)
+    assert listing.limit == PAGE_LIMIT_MAX
+    assert listing.encode_cursor((created_at, 7, "pothole")) == encode_cursor(created_at, 7)
+
+    sql, params = listing.query("c.ward_id = %s", (3,))
+    assert "(c.created_at, c.id) < (%s, %s)" in sql
+    assert params[0] == 3 and created_at in params and 7 in params
+
+
+@pytest.mark.parametrize("args", [{"limit": "0"}, {"limit": "x"}, {"fields": "id,secret"}, {"since": "yesterday"}])
+def test_listing_rejects_bad_arguments(args):
+    with pytest.raises(ListingError):
+        ComplaintListing(args, FIELDS)
@@ -0,0 +1,19 @@
+import pytest
+
+from migrate import EXPLAIN_CHECKS, list_migrations, plan_indexes
+
+
+def test_migration_versions_are_unique_and_ordered():
+    versions = [version for version, _, _ in list_migrations()]
+    assert versions
+    assert versions == sorted(set(versions))
+
+
+@pytest.mark.parametrize("label, query, params, expected", EXPLAIN_CHECKS,
+                         ids=[check[0] for check in EXPLAIN_CHECKS])
+def test_hot_query_uses_index(db_cursor, label, query, params, expected):
+    # Same setup as `python migrate.py explain`: the plan must not depend on
+    # how many rows the test database holds
+    db_cursor.execute("SET LOCAL enable_seqscan = off;")
+    used = plan_indexes(db_cursor, query, params)
+    assert expected in used, f"{label}: plan uses {sorted(used) or 'no index'}"
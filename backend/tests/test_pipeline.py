@@ -0,0 +1,90 @@
+import os
+import queue
+
+import pipeline
+from pipeline import ImageJob, ImagePipeline, build_variants
+
+
+def test_job_key_is_stable_across_attempts():
+    first = ImageJob(complaint_id=42, data=b"x", extension=".jpg", content_type="image/jpeg")
+    retry = ImageJob(complaint_id=42, data=b"x", extension=".jpg", content_type="image/jpeg", attempts=3)
+    assert first.key == retry.key == "complaints/42/original"
+    assert ImageJob(complaint_id=43, data=b"x", extension=".jpg", content_type="image/jpeg").key != first.key
+
+
+def test_build_variants():
+    assert build_variants([]) is None
+    variants = build_variants([
+        (160, 120, "image/webp", "u/160.webp"),
+        (480, 360, "image/webp", "u/480.webp"),
+        (480, 360, "image/jpeg", "u/480.jpg"),
+        (160, 120, "image/jpeg", "u/160.jpg"),
+    ])
+    assert variants["src"] == "u/480.jpg"
+    assert (variants["width"], variants["height"]) == (480, 360)
+    assert variants["sources"] == [
+        {"type": "image/webp", "srcset": "u/160.webp 160w, u/480.webp 480w"},
+        {"type": "image/jpeg", "srcset": "u/160.jpg 160w, u/480.jpg 480w"},
+    ]
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.executed = []
+        self.committed = False
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_full_queue_defers_to_recovery(monkeypatch):
+    conn = RecordingConnection()
+    monkeypatch.setattr(pipeline, "get_db_connection", lambda: conn)
+    image_pipeline = ImagePipeline(queue_size=1)
+    # No worker threads: the queue stays full
+    image_pipeline._pid = os.getpid()
+    image_pipeline._queue = queue.Queue(maxsize=1)
+    image_pipeline._queue.put_nowait(ImageJob(complaint_id=1, data=b"x", extension=".jpg", content_type="image/jpeg"))
+
+    def process_inline(job):
+        raise AssertionError("processed on the request thread")
+    monkeypatch.setattr(image_pipeline, "_process", process_inline)
+
+    job = ImageJob(complaint_id=2, data=b"y", extension=".jpg", content_type="image/jpeg")
+    image_pipeline.submit(job)
+    (sql, params), = conn.executed
+    assert "deferred = true" in sql and params == (2,)
+    assert conn.committed and job.data is None
+    assert image_pipeline.stats()["deferred"] == 1
+    assert image_pipeline.stats()["in_flight"] == 0
+
+
+def test_uploads_are_saved_as_files(monkeypatch, tmp_path):
+    monkeypatch.setattr(pipeline, "IMAGE_UPLOAD_DIR", str(tmp_path / "uploads"))
+    inserted = []
+    monkeypatch.setattr(pipeline, "execute_values", lambda cur, sql, rows: inserted.append(rows))
+    jobs = [ImageJob(complaint_id=i, data=bytes([i]) * 10, extension=".jpg", content_type="image/jpeg") for i in (3, 4)]
+    pipeline.save_uploads(None, jobs)
+
+    rows, = inserted
+    # Only the reference goes to the database
+    assert b"\x03" * 10 not in repr(rows).encode()
+    assert [row[1] for row in rows] == [pipeline.upload_path(3), pipeline.upload_path(4)]
+    assert pipeline._read_upload(None, pipeline.upload_path(3)) == b"\x03" * 10
+    assert pipeline._read_upload(memoryview(b"old"), None) == b"old"
+
+    pipeline.remove_upload(3)
+    pipeline.remove_upload(3)
+    assert sorted(os.listdir(tmp_path / "uploads")) == ["4"]
@@ -0,0 +1,42 @@
+import os
+import time
+
+from response_cache import LocalBackend
+
+
+def _files(root):
+    return sorted(
+        os.path.relpath(os.path.join(d, name), root)
+        for d, _, names in os.walk(root) for name in names
+        if not d.endswith("_generations")
+    )
+
+
+def test_expired_entries_are_deleted_on_read(tmp_path):
+    backend = LocalBackend(str(tmp_path))
+    backend.set("feed-1/0/page", b"body", ttl=-1)
+    assert backend.get("feed-1/0/page") is None
+    assert _files(tmp_path) == []
+
+
+def test_sweep_removes_expired_and_old_generations_and_caps(tmp_path):
+    backend = LocalBackend(str(tmp_path), max_entries=2)
+    backend.set("feed-1/0/old", b"x", ttl=30)
+    backend.bump("feed-1")
+    # A page stored under the token read before the bump
+    backend.set("feed-1/0/late", b"x", ttl=30)
+    generation = backend.generation("feed-1")
+    backend.set(f"feed-1/{generation}/expired", b"x", ttl=-1)
+    for i, name in enumerate(["a", "b", "c"]):
+        backend.set(f"feed-1/{generation}/{name}", b"x", ttl=30)
+        os.utime(os.path.join(tmp_path, "feed-1", generation, name), (time.time() + i, time.time() + i))
+
+    assert backend.sweep() == 3
+    assert _files(tmp_path) == [f"feed-1/{generation}/b", f"feed-1/{generation}/c"]
+
+
+def test_set_sweeps_once_the_interval_has_passed(tmp_path):
+    backend = LocalBackend(str(tmp_path), sweep_interval=0)
+    backend.set("feed-1/0/expired", b"x", ttl=-1)
+    backend.set("feed-1/0/page", b"x", ttl=30)
+    assert _files(tmp_path) == ["feed-1/0/page"]
@@ -0,0 +1,69 @@
+import pytest
+
+import search as search_module
+from listing import ListingError
+from search import SEARCH_CANDIDATE_LIMIT, ComplaintSearch
+
+FIELDS = ["id", "category", "status"]
+
+
+def test_search_cursor_round_trip():
+    search = ComplaintSearch({"q": "streetlight"}, FIELDS)
+    for score, row_id in [(0.0, 1), (0.1 + 0.2, 99), (1e-9, 2 ** 31 - 1), (12.5, 3)]:
+        cursor = search.encode_cursor((score, row_id, "pothole"))
+        assert search.decode_cursor(cursor) == (score, row_id)
+
+
+def test_search_cursor_is_parsed_from_arguments():
+    first = ComplaintSearch({"q": "streetlight"}, FIELDS)
+    cursor = first.encode_cursor((0.75, 10))
+    assert ComplaintSearch({"q": "streetlight", "cursor": cursor}, FIELDS).cursor == (0.75, 10)
+
+
+@pytest.mark.parametrize("args", [
+    {},
+    {"q": "x", "cursor": "bm90IGEgY3Vyc29y"},
+    {"q": "x", "lat": "9.5"},
+    {"q": "x", "radius_m": "100"},
+    {"q": "x", "lat": "91", "lon": "0"},
+])
+def test_search_rejects_bad_arguments(args):
+    with pytest.raises(ListingError):
+        ComplaintSearch(args, FIELDS)
+
+
+@pytest.mark.parametrize("args, window", [
+    ({"q": "pothole"}, "ORDER BY c.created_at DESC"),
+    ({"q": "pothole", "lat": "9.5", "lon": "76.5", "radius_m": "2000"}, "ORDER BY c.geom <->"),
+])
+def test_search_ranks_a_bounded_window(args, window):
+    sql, values = ComplaintSearch(args, FIELDS).query("c.ward_id = %s", (3,))
+    assert sql.count("%s") == len(values)
+    # The window is cut before the ranking sort
+    assert sql.index(window) < sql.index("LIMIT %s") < sql.index("ORDER BY ranked.score")
+    assert values[-2] == SEARCH_CANDIDATE_LIMIT
+
+
+def test_matches_outside_the_window_are_not_returned(db_cursor, monkeypatch):
+    # A made-up word, so rows already in the database cannot match
+    word = "zqxlamppost"
+    ids = []
+    for description, age in [(f"{word} {word} {word}", "10 years"), (f"near the {word}", "1 day"), (f"a {word}", "0 days")]:
+        db_cursor.execute(
+            "INSERT INTO complaints (category, description, created_at) VALUES ('Streetlight', %s, now() - %s::interval) RETURNING id;",
+            (description, age)
+        )
+        ids.append(db_cursor.fetchone()[0])
+    oldest = ids[0]
+
+    def result_ids():
+        sql, values = ComplaintSearch({"q": word}, FIELDS).query()
+        db_cursor.execute(sql, values)
+        return [row[1] for row in db_cursor.fetchall()]
+
+    # The oldest complaint is the best match, but only the newest
+    # SEARCH_CANDIDATE_LIMIT matches are ranked
+    monkeypatch.setattr(search_module, "SEARCH_CANDIDATE_LIMIT", 3)
+    assert result_ids()[0] == oldest
+    monkeypatch.setattr(search_module, "SEARCH_CANDIDATE_LIMIT", 2)
+    assert sorted(result_ids()) == sorted(ids[1:])
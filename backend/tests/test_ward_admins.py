@@ -0,0 +1,34 @@
+import uuid
+
+import pytest
+
+from ward_admins import AssignmentError, parse_assignments
+
+A = str(uuid.UUID(int=1))
+B = str(uuid.UUID(int=2))
+
+
+def test_list_form():
+    payload = {"assignments": [{"ward_id": 3, "user_ids": [B, A, A.upper()]}, {"ward_id": "4", "user_ids": []}]}
+    assert parse_assignments(payload) == {3: [A, B], 4: []}
+
+
+def test_mapping_form():
+    assert parse_assignments({"assignments": {"3": [A], "5": None}}) == {3: [A], 5: []}
+
+
+@pytest.mark.parametrize("payload", [
+    None,
+    [],
+    {},
+    {"assignments": []},
+    {"assignments": ["3"]},
+    {"assignments": [{"ward_id": "three", "user_ids": []}]},
+    {"assignments": [{"ward_id": 3, "user_ids": A}]},
+    {"assignments": [{"ward_id": 3, "user_ids": ["not-a-uuid"]}]},
+    {"assignments": [{"ward_id": 3, "user_ids": [A]}, {"ward_id": "3", "user_ids": [B]}]},
+])
+def test_invalid_payloads(payload):
+    with pytest.raises(AssignmentError) as excinfo:
+        parse_assignments(payload)
+    assert excinfo.value.status == 400
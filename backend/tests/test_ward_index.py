@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from ward_index import (ROUTING_QUERY, STRTree, WardLocator, parse_geojson_polygons, polygon_contains,
+                        polygon_position, sample_points)
+
+# 10 x 10 square with a 2 x 2 hole in the middle
+SQUARE_WITH_HOLE = [
+    [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0)],
+    [(4.0, 4.0), (6.0, 4.0), (6.0, 6.0), (4.0, 6.0)],
+]
+
+
+@pytest.mark.parametrize("point, expected", [
+    ((1.0, 1.0), 1),      # inside
+    ((5.0, 5.0), -1),     # inside the hole
+    ((11.0, 5.0), -1),    # outside
+    ((0.0, 5.0), 0),      # on the exterior edge
+    ((10.0, 10.0), 0),    # on an exterior vertex
+    ((4.0, 5.0), 0),      # on the hole's edge
+    ((6.0, 6.0), 0),      # on a hole vertex
+])
+def test_polygon_position(point, expected):
+    assert polygon_position(SQUARE_WITH_HOLE, *point) == expected
+
+
+def test_boundary_is_not_contained():
+    # Same as ST_Contains: the boundary belongs to neither side
+    assert not polygon_contains(SQUARE_WITH_HOLE, 0.0, 5.0)
+    assert polygon_contains(SQUARE_WITH_HOLE, 0.5, 5.0)
+
+
+def test_concave_polygon():
+    # U shape open at the top
+    u_shape = [[(0, 0), (3, 0), (3, 3), (2, 3), (2, 1), (1, 1), (1, 3), (0, 3)]]
+    assert polygon_contains(u_shape, 0.5, 2.5)
+    assert polygon_contains(u_shape, 2.5, 2.5)
+    assert not polygon_contains(u_shape, 1.5, 2.5)
+    assert polygon_contains(u_shape, 1.5, 0.5)
+
+
+def test_parse_geojson_drops_closing_vertex():
+    polygons = parse_geojson_polygons(
+        '{"type": "MultiPolygon", "coordinates": [[[[0, 0], [1, 0], [1, 1], [0, 0]]], [[[2, 2], [3, 2], [3, 3], [2, 2]]]]}'
+    )
+    assert polygons == [[[(0.0, 0.0), (1.0, 0.0), (1.0, 1.0)]], [[(2.0, 2.0), (3.0, 2.0), (3.0, 3.0)]]]
+    assert parse_geojson_polygons({"type": "Point", "coordinates": [0, 0]}) == []
+
+
+@pytest.mark.parametrize("count", [0, 1, 7, 8, 9, 64, 500])
+def test_rtree_matches_brute_force(count):
+    rng = random.Random(count)
+    entries = []
+    for i in range(count):
+        x, y = rng.uniform(0, 100), rng.uniform(0, 100)
+        entries.append(((x, y, x + rng.uniform(0, 10), y + rng.uniform(0, 10)), i))
+    tree = STRTree(entries)
+    for _ in range(500):
+        x, y = rng.uniform(-5, 115), rng.uniform(-5, 115)
+        expected = sorted(i for (x1, y1, x2, y2), i in entries if x1 <= x <= x2 and y1 <= y <= y2)
+        assert sorted(tree.query_point(x, y)) == expected
+    # Box corners are inside their box
+    for (x1, y1, _, _), i in entries:
+        assert i in tree.query_point(x1, y1)
+
+
+def test_sample_points_cover_every_vertex():
+    tree = STRTree([((0.0, 0.0, 10.0, 10.0), (1, "a", SQUARE_WITH_HOLE, [SQUARE_WITH_HOLE]))])
+    points = sample_points(tree, 50, random.Random(1))
+    assert set(p for ring in SQUARE_WITH_HOLE for p in ring) <= set(points)
+    assert len(points) == 2 * 8 + 50
+
+
+def test_locator_agrees_with_postgis(db_cursor):
+    """Randomized comparison against ST_Contains, as benchmarks/ward_locator_check.py."""
+    locator = WardLocator()
+    locator.refresh(db_cursor, force=True)
+    if locator._tree.root is None:
+        pytest.skip("the database has no wards")
+    points = sample_points(locator._tree, 2000, random.Random(42))
+    mismatches = []
+    for lon, lat in points:
+        local = locator.locate(db_cursor, lon, lat)
+        db_cursor.execute(ROUTING_QUERY, (lon, lat))
+        remote = db_cursor.fetchone()
+        if (local[0] if local else None) != (remote[0] if remote else None):
+            mismatches.append((lon, lat, local, remote))
+    assert not mismatches, mismatches[:20]
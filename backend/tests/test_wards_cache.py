@@ -0,0 +1,24 @@
+import gzip
+
+import wards_cache
+from wards_cache import CachedPayload
+
+BODY = b'{"status": "Success", "data": [' + b'{"id": 1, "name": "Ward", "geom": null}, ' * 200 + b']}'
+
+
+def test_full_sets_are_precompressed_at_high_levels():
+    payload = CachedPayload("wards-1-full-all", BODY, precompress=True)
+    assert payload._gzip is not None
+    assert gzip.decompress(payload.gzip) == BODY
+    if wards_cache.brotli is not None:
+        assert payload._br is not None
+
+
+def test_bbox_payloads_compress_on_demand():
+    payload = CachedPayload("wards-1-z10-76.4-9.4-76.6-9.6", BODY)
+    assert payload._gzip is None and payload._br is None
+    first = payload.gzip
+    assert gzip.decompress(first) == BODY
+    assert payload.gzip is first
+    # gzip was asked for, so no brotli pass ran
+    assert payload._br is None
@@ -0,0 +1,160 @@
+"""
+Mapbox Vector Tiles for the complaints and wards layers.
+
+Tiles are rendered by PostGIS (ST_AsMVT / ST_AsMVTGeom) and cached on disk
+under TILE_CACHE_DIR/<layer>/<z>/<x>/<y>.mvt. Complaint tiles are dropped
+for every zoom level covering a point when a complaint is inserted or its
+status changes; the whole wards layer is dropped on ward edits. Cached
+tiles also expire after TILE_CACHE_TTL seconds as a backstop (other hosts,
+writes racing an invalidation).
+
+At zoom levels up to TILE_CLUSTER_MAX_ZOOM complaints are aggregated into
+grid clusters carrying a count instead of one feature per complaint.
+"""
+import math
+import os
+import shutil
+import time
+import uuid
+
+from helper import get_db_connection
+
+TILE_CACHE_DIR = os.getenv("TILE_CACHE_DIR", "tile_cache")
+TILE_CACHE_TTL = float(os.getenv("TILE_CACHE_TTL", "3600"))
+TILE_CLUSTER_MAX_ZOOM = int(os.getenv("TILE_CLUSTER_MAX_ZOOM", "13"))
+# Cluster cell size in tile pixels (a tile is 256 px wide)
+TILE_CLUSTER_PIXELS = 32
+TILE_MAX_ZOOM = 22
+TILE_EXTENT = 4096
+
+LAYERS = ('complaints', 'wards')
+
+COMPLAINTS_SQL = """
+    WITH bounds AS (SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS geom),
+    mvtgeom AS (
+        SELECT ST_AsMVTGeom(ST_Transform(c.geom, 3857), bounds.geom, %(extent)s) AS geom,
+               c.id, c.category, lower(COALESCE(c.status, 'pending')) AS status
+        FROM complaints c, bounds
+        WHERE c.geom && ST_Transform(bounds.geom, 4326)
+    )
+    SELECT ST_AsMVT(mvtgeom, 'complaints', %(extent)s, 'geom') FROM mvtgeom;
+"""
+
+COMPLAINT_CLUSTERS_SQL = """
+    WITH bounds AS (SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS geom),
+    points AS (
+        SELECT ST_Transform(c.geom, 3857) AS geom, c.category, lower(COALESCE(c.status, 'pending')) AS status
+        FROM complaints c, bounds
+        WHERE c.geom && ST_Transform(bounds.geom, 4326)
+    ),
+    clusters AS (
+        SELECT ST_Centroid(ST_Collect(p.geom)) AS geom,
+               count(*) AS count,
+               count(*) FILTER (WHERE p.status <> 'resolved') AS open_count,
+               mode() WITHIN GROUP (ORDER BY p.category) AS category,
+               mode() WITHIN GROUP (ORDER BY p.status) AS status
+        FROM points p
+        GROUP BY floor(ST_X(p.geom) / %(cell)s), floor(ST_Y(p.geom) / %(cell)s)
+    ),
+    mvtgeom AS (
+        SELECT ST_AsMVTGeom(clusters.geom, bounds.geom, %(extent)s) AS geom,
+               clusters.count, clusters.open_count, clusters.category, clusters.status
+        FROM clusters, bounds
+    )
+    SELECT ST_AsMVT(mvtgeom, 'complaints', %(extent)s, 'geom') FROM mvtgeom;
+"""
+
+WARDS_SQL = """
+    WITH bounds AS (SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS geom),
+    mvtgeom AS (
+        SELECT ST_AsMVTGeom(ST_Transform(w.geom, 3857), bounds.geom, %(extent)s) AS geom,
+               w.id, w.name
+        FROM wards w, bounds
+        WHERE w.geom && ST_Transform(bounds.geom, 4326) AND w.deleted_at IS NULL
+    )
+    SELECT ST_AsMVT(mvtgeom, 'wards', %(extent)s, 'geom') FROM mvtgeom;
+"""
+
+# Web Mercator world width in metres
+WORLD_SIZE = 2 * math.pi * 6378137
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= TILE_MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_for_point(lon, lat, z):
+    """XYZ tile containing a WGS84 point at zoom z."""
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def _tile_path(layer, z, x, y):
+    return os.path.join(TILE_CACHE_DIR, layer, str(z), str(x), f"{y}.mvt")
+
+
+def _render(layer, z, x, y):
+    params = {"z": z, "x": x, "y": y, "extent": TILE_EXTENT}
+    if layer == 'wards':
+        sql = WARDS_SQL
+    elif z <= TILE_CLUSTER_MAX_ZOOM:
+        sql = COMPLAINT_CLUSTERS_SQL
+        params["cell"] = WORLD_SIZE / (2 ** z) / (256 / TILE_CLUSTER_PIXELS)
+    else:
+        sql = COMPLAINTS_SQL
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        row = cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+    return bytes(row[0]) if row and row[0] is not None else b""
+
+
+def get_tile(layer, z, x, y):
+    """Returns the tile bytes, from the disk cache when fresh."""
+    path = _tile_path(layer, z, x, y)
+    try:
+        if time.time() - os.path.getmtime(path) < TILE_CACHE_TTL:
+            with open(path, 'rb') as f:
+                return f.read()
+    except OSError:
+        pass
+
+    data = _render(layer, z, x, y)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return data
+
+
+def invalidate_point(lon, lat):
+    """Drops every cached complaints tile that contains (lon, lat)."""
+    for z in range(TILE_MAX_ZOOM + 1):
+        x, y = tile_for_point(lon, lat, z)
+        try:
+            os.remove(_tile_path('complaints', z, x, y))
+        except OSError:
+            pass
+
+
+def invalidate_layer(layer):
+    """Drops a whole layer (e.g. wards after a boundary edit)."""
+    layer_dir = os.path.join(TILE_CACHE_DIR, layer)
+    if not os.path.isdir(layer_dir):
+        return
+    # Rename first so no reader sees a half-deleted layer
+    trash = f"{layer_dir}.{uuid.uuid4().hex}.old"
+    try:
+        os.replace(layer_dir, trash)
+    except OSError:
+        return
+    shutil.rmtree(trash, ignore_errors=True)
@@ -0,0 +1,141 @@
+"""
+Buffered upvote counting.
+
+vote_issue only records (complaint, voter) in an in-process buffer. A
+background thread flushes the buffer every VOTE_FLUSH_INTERVAL seconds, or
+as soon as VOTE_FLUSH_SIZE votes are pending, in one transaction:
+
+  1. insert the votes into complaint_votes, skipping voters already counted
+  2. add the number of newly inserted votes per complaint to
+     complaints.upvotes with a single UPDATE
+
+so a viral complaint costs one row lock and one commit per batch rather
+than per click, and complaints.upvotes is eventually consistent.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+
+from helper import get_db_connection
+
+log = logging.getLogger(__name__)
+
+VOTE_FLUSH_INTERVAL = float(os.getenv("VOTE_FLUSH_INTERVAL", "1"))
+VOTE_FLUSH_SIZE = int(os.getenv("VOTE_FLUSH_SIZE", "500"))
+
+
+class VoteBuffer:
+    def __init__(self, flush_interval=VOTE_FLUSH_INTERVAL, flush_size=VOTE_FLUSH_SIZE):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = set()
+        self._pid = None
+        self._stats = {"accepted": 0, "duplicates": 0, "flushed": 0, "flushes": 0, "errors": 0}
+
+    # Threads do not survive fork(), so start lazily in each worker process
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pending = set()
+            threading.Thread(target=self._run, name="vote-flusher", daemon=True).start()
+            self._pid = os.getpid()
+
+    def add(self, complaint_id, voter_id):
+        """Queues a vote. Returns False if the same vote is already pending."""
+        self._ensure_started()
+        key = (complaint_id, voter_id)
+        with self._lock:
+            if key in self._pending:
+                self._stats["duplicates"] += 1
+                return False
+            self._pending.add(key)
+            self._stats["accepted"] += 1
+            if len(self._pending) >= self.flush_size:
+                self._wakeup.set()
+        return True
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                log.warning("Vote flush failed: %s", e)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, set()
+            if not batch:
+                return {}
+
+            complaint_ids = [c for c, _ in batch]
+            voter_ids = [v for _, v in batch]
+            conn = get_db_connection()
+            cur = conn.cursor()
+            try:
+                cur.execute("""
+                    INSERT INTO complaint_votes (complaint_id, voter_id)
+                    SELECT v.complaint_id, v.voter_id
+                    FROM unnest(%s::int[], %s::text[]) AS v(complaint_id, voter_id)
+                    JOIN complaints c ON c.id = v.complaint_id
+                    ON CONFLICT (complaint_id, voter_id) DO NOTHING
+                    RETURNING complaint_id;
+                """, (complaint_ids, voter_ids))
+                counts = Counter(row[0] for row in cur.fetchall())
+
+                if counts:
+                    ids = sorted(counts)
+                    # Lock in id order so concurrent flushes from other
+                    # workers cannot deadlock on the same complaints. The
+                    # INSERT above already holds KEY SHARE locks on them
+                    # (foreign key checks, taken in no particular order);
+                    # NO KEY UPDATE does not conflict with KEY SHARE, where
+                    # FOR UPDATE would wait on the other flush's key locks
+                    cur.execute("SELECT id FROM complaints WHERE id = ANY(%s) ORDER BY id FOR NO KEY UPDATE;", (ids,))
+                    cur.execute("""
+                        UPDATE complaints c
+                        SET upvotes = COALESCE(c.upvotes, 0) + v.n
+                        FROM unnest(%s::int[], %s::int[]) AS v(id, n)
+                        WHERE c.id = v.id;
+                    """, (ids, [counts[i] for i in ids]))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                # Put the batch back so the next flush retries it
+                with self._lock:
+                    self._pending |= batch
+                    self._stats["errors"] += 1
+                raise
+            finally:
+                cur.close()
+                conn.close()
+
+            with self._lock:
+                self._stats["flushed"] += sum(counts.values())
+                self._stats["flushes"] += 1
+            return dict(counts)
+
+    def stats(self):
+        with self._lock:
+            return {"pending": len(self._pending), **self._stats}
+
+
+vote_buffer = VoteBuffer()
+
+@atexit.register
+def _flush_on_exit():
+    if vote_buffer._pid == os.getpid():
+        try:
+            vote_buffer.flush()
+        except Exception as e:
+            log.error("Vote flush at exit failed: %s", e)
@@ -0,0 +1,148 @@
+"""
+Ward admin assignments (admin_wards) and the profile roles derived from them.
+
+apply_assignments() takes {ward_id: [user ids]} and makes each listed ward's
+admins exactly those users, with a fixed number of set-based statements
+whatever the number of wards and users:
+
+  1. lock the listed wards (serializes concurrent assignments to them)
+  2. delete the mappings of those wards that are not wanted any more
+  3. insert the wanted mappings that are missing
+  4. recompute the role of the users whose mappings changed: admin while
+     they have a ward, citizen once they lost their last one
+
+Profiles nobody touched are never read, so the cost follows the size of the
+change, not the number of profiles.
+
+release_ward_admins() drops every mapping of a ward being deleted and
+recomputes those users' roles the same way. An admin with no wards sees
+every ward, so a deleted ward's admins must not keep the role once they
+lose their last ward.
+"""
+import uuid
+
+
+class AssignmentError(ValueError):
+    """Invalid assignment request; the message is safe to return to clients."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_assignments(payload):
+    """
+    Accepts {"assignments": [{"ward_id": 3, "user_ids": [...]}, ...]} or
+    {"assignments": {"3": [...], ...}} and returns {ward_id: [UUID strings]}.
+    """
+    raw = payload.get('assignments') if isinstance(payload, dict) else None
+    if isinstance(raw, dict):
+        raw = [{"ward_id": ward_id, "user_ids": user_ids} for ward_id, user_ids in raw.items()]
+    if not isinstance(raw, list) or not raw:
+        raise AssignmentError("assignments must be a non-empty list of {ward_id, user_ids}")
+
+    assignments = {}
+    for item in raw:
+        if not isinstance(item, dict):
+            raise AssignmentError("Each assignment must be an object with ward_id and user_ids")
+        try:
+            ward_id = int(item.get('ward_id'))
+        except (TypeError, ValueError):
+            raise AssignmentError(f"Invalid ward_id: {item.get('ward_id')!r}")
+        user_ids = item.get('user_ids') or []
+        if not isinstance(user_ids, list):
+            raise AssignmentError(f"user_ids for ward {ward_id} must be a list")
+        try:
+            users = {str(uuid.UUID(str(uid))) for uid in user_ids}
+        except ValueError:
+            raise AssignmentError(f"Invalid user id in the assignment for ward {ward_id}")
+        if ward_id in assignments:
+            raise AssignmentError(f"Ward {ward_id} is listed more than once")
+        assignments[ward_id] = sorted(users)
+    return assignments
+
+
+def apply_assignments(cur, assignments):
+    """
+    Replaces the admins of every ward in `assignments` ({ward_id: [user ids]})
+    inside the caller's transaction. Raises AssignmentError (404) for unknown
+    wards or users. Returns counts of mappings added/removed and roles changed.
+    """
+    ward_ids = sorted(assignments)
+    pair_users = [uid for ward_id in ward_ids for uid in assignments[ward_id]]
+    pair_wards = [ward_id for ward_id in ward_ids for _ in assignments[ward_id]]
+
+    # FOR NO KEY UPDATE still lets admin_wards' foreign key checks through
+    cur.execute("SELECT id FROM wards WHERE id = ANY(%s::int[]) AND deleted_at IS NULL ORDER BY id FOR NO KEY UPDATE;", (ward_ids,))
+    missing = set(ward_ids) - {row[0] for row in cur.fetchall()}
+    if missing:
+        raise AssignmentError(f"Ward(s) not found: {', '.join(map(str, sorted(missing)))}", 404)
+
+    users = sorted(set(pair_users))
+    if users:
+        cur.execute("SELECT id::text FROM public.profiles WHERE id = ANY(%s::uuid[]);", (users,))
+        unknown = set(users) - {row[0] for row in cur.fetchall()}
+        if unknown:
+            raise AssignmentError(f"User(s) not found: {', '.join(sorted(unknown))}", 404)
+
+    cur.execute("""
+        DELETE FROM public.admin_wards aw
+        WHERE aw.ward_id = ANY(%s::int[])
+        AND NOT EXISTS (
+            SELECT 1 FROM unnest(%s::uuid[], %s::int[]) AS wanted(user_id, ward_id)
+            WHERE wanted.user_id = aw.user_id AND wanted.ward_id = aw.ward_id
+        )
+        RETURNING aw.user_id::text;
+    """, (ward_ids, pair_users, pair_wards))
+    removed = [row[0] for row in cur.fetchall()]
+
+    cur.execute("""
+        INSERT INTO public.admin_wards (user_id, ward_id)
+        SELECT user_id, ward_id FROM unnest(%s::uuid[], %s::int[]) AS wanted(user_id, ward_id)
+        ON CONFLICT (user_id, ward_id) DO NOTHING
+        RETURNING user_id::text;
+    """, (pair_users, pair_wards))
+    added = [row[0] for row in cur.fetchall()]
+
+    promoted, demoted = recompute_roles(cur, set(removed) | set(added))
+    return {
+        "wards": len(ward_ids),
+        "added": len(added),
+        "removed": len(removed),
+        "promoted": promoted,
+        "demoted": demoted,
+    }
+
+
+def recompute_roles(cur, user_ids):
+    """
+    Sets each listed user's role from their mappings: admin while they have
+    a ward, citizen once they lost their last one. Returns (promoted, demoted).
+    """
+    affected = sorted(user_ids)
+    if not affected:
+        return 0, 0
+    cur.execute("""
+        UPDATE public.profiles p
+        SET role = CASE WHEN has_ward THEN 'admin' ELSE 'citizen' END
+        FROM (
+            SELECT u.id, EXISTS (SELECT 1 FROM public.admin_wards aw WHERE aw.user_id = u.id) AS has_ward
+            FROM unnest(%s::uuid[]) AS u(id)
+        ) changed
+        WHERE p.id = changed.id
+        AND ((changed.has_ward AND p.role IS DISTINCT FROM 'admin')
+             OR (NOT changed.has_ward AND p.role = 'admin'))
+        RETURNING p.role;
+    """, (affected,))
+    roles = [row[0] for row in cur.fetchall()]
+    return roles.count('admin'), roles.count('citizen')
+
+
+def release_ward_admins(cur, ward_id):
+    """
+    Removes every admin mapping of `ward_id` inside the caller's transaction
+    and demotes the users left without a ward. Returns the number demoted.
+    """
+    cur.execute("DELETE FROM public.admin_wards WHERE ward_id = %s RETURNING user_id::text;", (ward_id,))
+    _, demoted = recompute_roles(cur, {row[0] for row in cur.fetchall()})
+    return demoted
@@ -0,0 +1,327 @@
+"""
+In-process ward locator.
+
+Ward boundaries only change through create_ward / delete_ward, so instead of
+asking PostGIS `ST_Contains` on every request, each worker keeps all ward
+polygons in memory behind an STR-packed R-tree of bounding boxes and refines
+candidates with an exact point-in-polygon test. The tree holds the ward_parts
+pieces (ST_Subdivide, migration 0010) rather than whole wards, so a lookup
+tests one small piece instead of every vertex of a hand-drawn boundary.
+
+Also holds the PostGIS overlap validation used when a ward is drawn, and
+the point sampling used to check the locator against PostGIS.
+
+Semantics match `ST_Contains(ward.geom, point)`: points on a ward boundary
+(or on the boundary of a hole) are not contained by that ward.
+"""
+import json
+import math
+import os
+import threading
+import time
+
+# Seconds between checks of the shared ward-set version (other workers)
+WARD_INDEX_CHECK_INTERVAL = float(os.getenv("WARD_INDEX_CHECK_INTERVAL", "5"))
+RTREE_NODE_CAPACITY = 8
+
+# ---------------------------------------------------------
+# GEOMETRY: exact point-in-polygon
+# ---------------------------------------------------------
+def _on_segment(px, py, x1, y1, x2, y2):
+    if (x2 - x1) * (py - y1) - (y2 - y1) * (px - x1) != 0:
+        return False
+    return min(x1, x2) <= px <= max(x1, x2) and min(y1, y2) <= py <= max(y1, y2)
+
+def _ring_position(px, py, ring):
+    """Returns 1 if inside the ring, 0 if on its boundary, -1 if outside."""
+    inside = False
+    n = len(ring)
+    for i in range(n):
+        x1, y1 = ring[i]
+        x2, y2 = ring[(i + 1) % n]
+        if _on_segment(px, py, x1, y1, x2, y2):
+            return 0
+        if (y1 > py) != (y2 > py):
+            x_cross = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+            if px < x_cross:
+                inside = not inside
+    return 1 if inside else -1
+
+def polygon_position(polygon, px, py):
+    """
+    1 inside, 0 on the boundary, -1 outside. `polygon` is a list of rings
+    (exterior first, then holes).
+    """
+    position = _ring_position(px, py, polygon[0])
+    if position != 1:
+        return position
+    for hole in polygon[1:]:
+        position = _ring_position(px, py, hole)
+        if position != -1:
+            return -position
+    return 1
+
+def polygon_contains(polygon, px, py):
+    return polygon_position(polygon, px, py) == 1
+
+def _bbox(polygons):
+    xs = [x for polygon in polygons for x, _ in polygon[0]]
+    ys = [y for polygon in polygons for _, y in polygon[0]]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+def parse_geojson_polygons(geojson):
+    """Returns a list of polygons (each a list of rings) from a GeoJSON geometry."""
+    geom = json.loads(geojson) if isinstance(geojson, str) else geojson
+    if geom['type'] == 'Polygon':
+        raw = [geom['coordinates']]
+    elif geom['type'] == 'MultiPolygon':
+        raw = geom['coordinates']
+    else:
+        return []
+    polygons = []
+    for rings in raw:
+        # GeoJSON rings repeat the first vertex at the end; drop it
+        polygons.append([[(float(x), float(y)) for x, y in ring[:-1]] for ring in rings])
+    return polygons
+
+# ---------------------------------------------------------
+# SPATIAL INDEX: STR-packed R-tree over bounding boxes
+# ---------------------------------------------------------
+class _Node:
+    __slots__ = ('bbox', 'children', 'items')
+
+    def __init__(self, bbox, children=None, items=None):
+        self.bbox = bbox
+        self.children = children
+        self.items = items
+
+def _union(boxes):
+    return (
+        min(b[0] for b in boxes), min(b[1] for b in boxes),
+        max(b[2] for b in boxes), max(b[3] for b in boxes)
+    )
+
+def _str_pack(entries, capacity):
+    """Sort-Tile-Recursive packing of (bbox, payload) entries into one tree level."""
+    if not entries:
+        return []
+    count = len(entries)
+    node_count = -(-count // capacity)
+    slab_count = math.ceil(math.sqrt(node_count))
+    slab_size = slab_count * capacity
+
+    by_x = sorted(entries, key=lambda e: (e[0][0] + e[0][2]) / 2)
+    groups = []
+    for s in range(0, count, slab_size):
+        slab = sorted(by_x[s:s + slab_size], key=lambda e: (e[0][1] + e[0][3]) / 2)
+        for g in range(0, len(slab), capacity):
+            groups.append(slab[g:g + capacity])
+    return groups
+
+class STRTree:
+    def __init__(self, entries, capacity=RTREE_NODE_CAPACITY):
+        level = [_Node(_union([e[0] for e in group]), items=group) for group in _str_pack(entries, capacity)]
+        while len(level) > 1:
+            parents = _str_pack([(node.bbox, node) for node in level], capacity)
+            level = [_Node(_union([e[0] for e in group]), children=[e[1] for e in group]) for group in parents]
+        self.root = level[0] if level else None
+
+    def query_point(self, x, y):
+        if self.root is None:
+            return []
+        hits, stack = [], [self.root]
+        while stack:
+            node = stack.pop()
+            b = node.bbox
+            if not (b[0] <= x <= b[2] and b[1] <= y <= b[3]):
+                continue
+            if node.items is not None:
+                for bbox, payload in node.items:
+                    if bbox[0] <= x <= bbox[2] and bbox[1] <= y <= bbox[3]:
+                        hits.append(payload)
+            else:
+                stack.extend(node.children)
+        return hits
+
+# ---------------------------------------------------------
+# WARD LOCATOR
+# ---------------------------------------------------------
+class WardLocator:
+    """
+    Maps a (lon, lat) point to its ward using an in-memory index.
+
+    The index is (re)loaded lazily from the database. It is rebuilt when
+    invalidate() is called by this worker after a ward edit, or when the
+    shared `cache_versions['wards']` counter (bumped by a trigger on the
+    wards table) shows another worker changed the ward set.
+    """
+
+    def __init__(self, check_interval=WARD_INDEX_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._tree = None
+        self._version = None
+        self._checked_at = 0.0
+        self._stale = True
+
+    def invalidate(self):
+        self._stale = True
+
+    @property
+    def version(self):
+        return self._version
+
+    def _current_version(self, cur):
+        cur.execute("SELECT version FROM cache_versions WHERE name = 'wards';")
+        row = cur.fetchone()
+        return row[0] if row else 0
+
+    def _load(self, cur, version):
+        cur.execute("""
+            SELECT w.id, w.name, ST_AsGeoJSON(w.geom),
+                   array_remove(array_agg(ST_AsGeoJSON(p.geom)), NULL)
+            FROM wards w
+            LEFT JOIN ward_parts p ON p.ward_id = w.id
+            WHERE w.geom IS NOT NULL AND w.deleted_at IS NULL
+            GROUP BY w.id;
+        """)
+        entries = []
+        for ward_id, name, geojson, parts in cur.fetchall():
+            polygons = parse_geojson_polygons(geojson)
+            if not polygons:
+                continue
+            # A ward without parts is indexed whole
+            pieces = [piece for part in parts for piece in parse_geojson_polygons(part)] or polygons
+            for piece in pieces:
+                entries.append((_bbox([piece]), (ward_id, name, piece, polygons)))
+        self._tree = STRTree(entries)
+        self._version = version
+
+    def refresh(self, cur, force=False):
+        now = time.monotonic()
+        if not force and not self._stale and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not force and not self._stale and now - self._checked_at < self.check_interval:
+                return
+            # Clear the flag before reading so an invalidate() racing with
+            # this reload forces another one
+            stale, self._stale = self._stale, False
+            try:
+                version = self._current_version(cur)
+                if force or stale or self._tree is None or version != self._version:
+                    self._load(cur, version)
+            except Exception:
+                self._stale = True
+                raise
+            self._checked_at = now
+
+    def locate(self, cur, lon, lat):
+        """Returns (ward_id, ward_name) or None. `cur` is only used to refresh."""
+        self.refresh(cur)
+        matches = set()
+        for ward_id, name, piece, polygons in self._tree.query_point(lon, lat):
+            if (ward_id, name) in matches:
+                continue
+            position = polygon_position(piece, lon, lat)
+            # On a piece's edge: a cut inside the ward or the ward's own
+            # boundary, which only the whole polygon can tell apart
+            if position == 1 or (position == 0 and any(polygon_contains(p, lon, lat) for p in polygons)):
+                matches.add((ward_id, name))
+        return min(matches) if matches else None
+
+
+ward_locator = WardLocator()
+
+
+# ---------------------------------------------------------
+# CHECKING THE LOCATOR AGAINST POSTGIS
+# ---------------------------------------------------------
+# The lookup the locator replaces; tests and benchmarks/ward_locator_check.py
+# compare locate() with it
+ROUTING_QUERY = """
+    SELECT id, name FROM wards
+    WHERE ST_Contains(geom, ST_SetSRID(ST_MakePoint(%s, %s), 4326))
+    AND deleted_at IS NULL
+    ORDER BY id LIMIT 1;
+"""
+
+def sample_points(tree, samples, rng):
+    """
+    Points that exercise a locator built on `tree`: every vertex and edge
+    midpoint of each indexed ward piece, plus about `samples` random points
+    in (and 10% around) the pieces' bounding boxes, shuffled.
+    """
+    wards = []  # one entry per ward piece
+    stack = [tree.root] if tree.root else []
+    while stack:
+        node = stack.pop()
+        if node.items is not None:
+            wards.extend(node.items)
+        else:
+            stack.extend(node.children)
+
+    points = []
+    for bbox, (_, _, piece, _) in wards:
+        # Vertices and edge midpoints (of the ward_parts pieces, so cuts
+        # inside a ward too) exercise the boundary rules
+        for ring in piece:
+            for i, (x1, y1) in enumerate(ring):
+                x2, y2 = ring[(i + 1) % len(ring)]
+                points.append((x1, y1))
+                points.append(((x1 + x2) / 2, (y1 + y2) / 2))
+        pad_x = (bbox[2] - bbox[0]) * 0.1
+        pad_y = (bbox[3] - bbox[1]) * 0.1
+        for _ in range(max(1, samples // max(len(wards), 1))):
+            points.append((
+                rng.uniform(bbox[0] - pad_x, bbox[2] + pad_x),
+                rng.uniform(bbox[1] - pad_y, bbox[3] + pad_y)
+            ))
+    rng.shuffle(points)
+    return points
+
+
+# ---------------------------------------------------------
+# OVERLAP VALIDATION (PostGIS)
+# ---------------------------------------------------------
+class WardGeometryError(ValueError):
+    """The drawn boundary is not a valid polygon; safe to return to clients."""
+
+# Matches the ST_Subdivide size used for ward_parts in migration 0010
+WARD_PART_VERTICES = 64
+
+# The drawn polygon is cut the same way, pieces are paired up through the
+# ward_parts GiST index (&&), and ST_Relate checks the pairs for interiors
+# that intersect ('T********'). For polygons that is exactly "the overlap
+# has area", so no intersection geometry or area is ever computed, and
+# wards that merely share an edge are not conflicts.
+WARD_OVERLAP_SQL = """
+    WITH drawn_parts AS (
+        SELECT d.geom
+        FROM ST_Subdivide(ST_GeomFromText(%(wkt)s, 4326), %(vertices)s) AS piece, ST_Dump(piece) AS d
+    )
+    SELECT DISTINCT w.id, w.name
+    FROM drawn_parts n
+    JOIN ward_parts p ON p.geom && n.geom
+    JOIN wards w ON w.id = p.ward_id
+    WHERE w.deleted_at IS NULL AND ST_Relate(p.geom, n.geom, 'T********')
+    ORDER BY w.name;
+"""
+
+def find_ward_overlaps(cur, geom_wkt):
+    """
+    Returns [(ward_id, name)] of the wards whose area overlaps the polygon
+    `geom_wkt` (WGS 84). Raises WardGeometryError for an invalid polygon.
+    """
+    cur.execute(
+        "SELECT GeometryType(g), ST_IsValid(g), ST_IsValidReason(g) FROM ST_GeomFromText(%s, 4326) AS g;",
+        (geom_wkt,)
+    )
+    geometry_type, valid, reason = cur.fetchone()
+    if geometry_type != 'POLYGON':
+        raise WardGeometryError(f"geom_wkt must be a POLYGON, got {geometry_type}")
+    if not valid:
+        raise WardGeometryError(f"Invalid ward boundary: {reason}")
+    cur.execute(WARD_OVERLAP_SQL, {"wkt": geom_wkt, "vertices": WARD_PART_VERTICES})
+    return cur.fetchall()
@@ -0,0 +1,172 @@
+"""
+Cached, pre-serialized and pre-compressed payloads for GET /api/v1/wards.
+
+Payloads are keyed on the ward-set version (cache_versions['wards'], bumped
+by a trigger whenever the wards table changes) plus the requested
+simplification tier and bbox, so a response only has to be rebuilt after a
+ward edit. Each entry stores the JSON body gzip (and, if the optional
+`brotli` package is installed, brotli) compressed. The few full-set
+entries (no bbox, one per tier) stay cached and are compressed up front at
+the highest levels. bbox entries mostly miss, since every map pan asks for
+a new box, so they are compressed only in the encoding a client asks for,
+at cheap levels: a maximum-level pass would cost more than building them.
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from helper import get_db_connection
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+WARDS_CACHE_MAX_ENTRIES = int(os.getenv("WARDS_CACHE_MAX_ENTRIES", "64"))
+# Seconds between checks of the shared ward-set version (other workers)
+WARDS_VERSION_CHECK_INTERVAL = float(os.getenv("WARD_INDEX_CHECK_INTERVAL", "5"))
+
+# (max zoom, simplify tolerance in degrees, GeoJSON decimal digits)
+SIMPLIFY_TIERS = [
+    (10, 0.001, 5),     # city overview: ~100 m
+    (13, 0.0001, 6),    # district: ~10 m
+]
+FULL_TIER = ('full', None, 9)
+
+# (gzip level, brotli quality): full sets are compressed once per ward
+# edit, bbox payloads on demand
+PRECOMPRESS_LEVELS = (9, 11)
+ON_DEMAND_LEVELS = (5, 4)
+
+
+def tier_for_zoom(zoom):
+    """Returns (tier_name, tolerance, digits) for a Leaflet zoom level (None = full)."""
+    if zoom is None:
+        return FULL_TIER
+    for max_zoom, tolerance, digits in SIMPLIFY_TIERS:
+        if zoom <= max_zoom:
+            return (f"z{max_zoom}", tolerance, digits)
+    return FULL_TIER
+
+
+class CachedPayload:
+    """
+    A JSON body and its compressed forms. With precompress=True both are
+    made now at PRECOMPRESS_LEVELS; otherwise each is made on first use at
+    ON_DEMAND_LEVELS. `br` is None without the brotli package.
+    """
+    __slots__ = ('etag', 'body', 'levels', '_gzip', '_br')
+
+    def __init__(self, etag, body, precompress=False):
+        self.etag = etag
+        self.body = body
+        self.levels = PRECOMPRESS_LEVELS if precompress else ON_DEMAND_LEVELS
+        self._gzip = self._br = None
+        if precompress:
+            self._gzip = gzip.compress(body, compresslevel=self.levels[0])
+            self._br = brotli.compress(body, quality=self.levels[1]) if brotli else None
+
+    @property
+    def gzip(self):
+        if self._gzip is None:
+            self._gzip = gzip.compress(self.body, compresslevel=self.levels[0])
+        return self._gzip
+
+    @property
+    def br(self):
+        if self._br is None and brotli is not None:
+            self._br = brotli.compress(self.body, quality=self.levels[1])
+        return self._br
+
+
+class WardsPayloadCache:
+    def __init__(self, max_entries=WARDS_CACHE_MAX_ENTRIES, check_interval=WARDS_VERSION_CHECK_INTERVAL):
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self._checked_at = 0.0
+        self._stale = True
+
+    def invalidate(self):
+        self._stale = True
+
+    def version(self):
+        """The ward-set version, re-read from the database at most every check_interval."""
+        now = time.monotonic()
+        if not self._stale and self._version is not None and now - self._checked_at < self.check_interval:
+            return self._version
+        self._stale = False
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT version FROM cache_versions WHERE name = 'wards';")
+            row = cur.fetchone()
+        except Exception:
+            self._stale = True
+            raise
+        finally:
+            cur.close()
+            conn.close()
+        version = row[0] if row else 0
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+            self._version = version
+            self._checked_at = now
+        return version
+
+    def get(self, tier, bbox):
+        """Returns the CachedPayload for (tier, bbox) at the current version."""
+        version = self.version()
+        key = (version, tier[0], bbox)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        bbox_tag = "-".join(f"{v:g}" for v in bbox) if bbox else "all"
+        entry = CachedPayload(f"wards-{version}-{tier[0]}-{bbox_tag}", self._build(tier, bbox), precompress=not bbox)
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _build(self, tier, bbox):
+        _, tolerance, digits = tier
+        geom_sql = "ST_SimplifyPreserveTopology(geom, %s)" if tolerance else "geom"
+        params = [tolerance] if tolerance else []
+        params.append(digits)
+        where = "WHERE deleted_at IS NULL"
+        if bbox:
+            where += " AND geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)"
+            params.extend(bbox)
+
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                f"SELECT id, name, ST_AsGeoJSON({geom_sql}, %s) FROM wards {where} ORDER BY name ASC;",
+                params
+            )
+            records = cur.fetchall()
+        finally:
+            cur.close()
+            conn.close()
+
+        # ST_AsGeoJSON output is already JSON: splice it in instead of
+        # parsing and re-serializing every geometry
+        items = [
+            f'{{"id": {row[0]}, "name": {json.dumps(row[1])}, "geom": {row[2] or "null"}}}'
+            for row in records
+        ]
+        return ('{"status": "Success", "data": [' + ", ".join(items) + ']}').encode()
+
+
+wards_cache = WardsPayloadCache()
@@ -1,6 +1,7 @@
 import React from 'react';
 import { X, Phone, Calendar, Hash, MapPin, ExternalLink, ThumbsUp, PlusCircle, AlertTriangle } from 'lucide-react';
 import { AdminIssue } from '../pages/AdminIssues'; 
+import ResponsiveImage from './ResponsiveImage';
 
 interface IssueDetailsModalProps {
   issue: AdminIssue;
@@ -63,7 +64,14 @@ export default function IssueDetailsModal({
           )}
 
           <div className="w-full h-64 sm:h-80 bg-slate-100 rounded-xl overflow-hidden border border-slate-200">
-            <img src={issue.image_url} alt="Full Issue" className="w-full h-full object-cover" />
+            <ResponsiveImage 
+              src={issue.image_url} 
+              images={issue.images}
+              status={issue.image_status}
+              sizes="(min-width: 672px) 672px, 100vw"
+              alt="Full Issue" 
+              className="w-full h-full object-cover"
+            />
           </div>
 
           <div>
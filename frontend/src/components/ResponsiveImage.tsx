@@ -0,0 +1,62 @@
+import React from 'react';
+import { ImageOff, Loader2 } from 'lucide-react';
+
+// Renditions map returned by the API in the `images` field of a complaint
+export interface ImageVariants {
+  src: string;
+  width: number;
+  height: number;
+  sources: { type: string; srcset: string }[];
+}
+
+interface ResponsiveImageProps {
+  // null until the background pipeline has stored the photo
+  src: string | null;
+  images?: ImageVariants | null;
+  // The complaint's image_status: 'pending', 'ready' or 'failed'
+  status?: string | null;
+  // Rendered width of the image, so the browser picks the smallest rendition
+  sizes: string;
+  alt: string;
+  className?: string;
+}
+
+export default function ResponsiveImage({ src, images, status, sizes, alt, className }: ResponsiveImageProps) {
+  // Reports are accepted before their photo is processed, so there is nothing to load yet
+  if (!src || status === 'pending') {
+    const pending = status === 'pending';
+    const label = pending ? 'Photo processing' : 'Photo unavailable';
+    return (
+      <div
+        role="img"
+        aria-label={label}
+        title={label}
+        className={`${className ?? ''} flex items-center justify-center bg-slate-100 text-slate-400`}
+      >
+        {pending ? <Loader2 className="w-6 h-6 animate-spin" /> : <ImageOff className="w-6 h-6" />}
+      </div>
+    );
+  }
+
+  // Older complaints (or images still processing) only have the full-size URL
+  if (!images || images.sources.length === 0) {
+    return <img src={src} alt={alt} className={className} loading="lazy" />;
+  }
+
+  return (
+    <picture>
+      {images.sources.map((source) => (
+        <source key={source.type} type={source.type} srcSet={source.srcset} sizes={sizes} />
+      ))}
+      <img
+        src={images.src}
+        width={images.width}
+        height={images.height}
+        alt={alt}
+        className={className}
+        loading="lazy"
+        decoding="async"
+      />
+    </picture>
+  );
+}
@@ -3,13 +3,16 @@ import axios from 'axios';
 import { Loader2, AlertCircle, MapPin, ExternalLink, CheckCircle, ThumbsUp } from 'lucide-react';
 import { supabase } from '../lib/supabase';
 import IssueDetailsModal from '../components/IssueDetailsModal';
+import ResponsiveImage, { ImageVariants } from '../components/ResponsiveImage';
 
 export interface AdminIssue {
   id: string;
   category: string;
   description: string;
   status: string;
-  image_url: string;
+  image_url: string | null;
+  image_status?: string | null;
+  images?: ImageVariants | null;
   created_at: string;
   phone_number: string;
   ward_id: string;
@@ -24,6 +27,9 @@ export default function AdminIssues() {
   const [error, setError] = useState<string | null>(null);
   const [updatingId, setUpdatingId] = useState<string | null>(null);
   const [selectedIssue, setSelectedIssue] = useState<AdminIssue | null>(null);
+  // The list is paged: next_cursor is set while older reports remain
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const apiUrl = import.meta.env.VITE_API_URL;
 
@@ -43,6 +49,7 @@ export default function AdminIssues() {
 
       const response = await axios.get(`${apiUrl}/admin/complaints?user_id=${user.id}`);
       setIssues(response.data.data);
+      setNextCursor(response.data.next_cursor || null);
       setLoading(false);
     } catch (err: any) {
       console.error(err);
@@ -55,6 +62,25 @@ export default function AdminIssues() {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const { data: { user } } = await supabase.auth.getUser();
+      if (!user) return;
+      const response = await axios.get(
+        `${apiUrl}/admin/complaints?user_id=${user.id}&cursor=${encodeURIComponent(nextCursor)}`
+      );
+      setIssues((current) => [...current, ...response.data.data]);
+      setNextCursor(response.data.next_cursor || null);
+    } catch (err) {
+      alert("Failed to load more reports. Please try again.");
+      console.error(err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleStatusChange = async (issueId: string, newStatus: string) => {
     setUpdatingId(issueId);
     try {
@@ -116,7 +142,9 @@ export default function AdminIssues() {
         </div>
         <div className="mt-4 sm:mt-0 bg-white border border-slate-200 rounded-lg px-4 py-2 flex items-center gap-2 shadow-sm">
           <CheckCircle className="text-green-500 w-5 h-5" />
-          <span className="font-semibold text-slate-700">{issues.length} Total Reports</span>
+          <span className="font-semibold text-slate-700">
+            {nextCursor ? `${issues.length}+ Reports Loaded` : `${issues.length} Total Reports`}
+          </span>
         </div>
       </div>
 
@@ -142,8 +170,11 @@ export default function AdminIssues() {
                       className="focus:outline-none focus:ring-2 focus:ring-blue-500 rounded-lg block"
                       title="Click to view full details"
                     >
-                      <img 
+                      <ResponsiveImage 
                         src={issue.image_url} 
+                        images={issue.images}
+                        status={issue.image_status}
+                        sizes="64px"
                         alt="Issue" 
                         className="h-16 w-16 rounded-lg object-cover border border-slate-200 hover:opacity-80 transition-opacity cursor-pointer"
                       />
@@ -220,6 +251,19 @@ export default function AdminIssues() {
         </div>
       </div>
 
+      {nextCursor && (
+        <div className="mt-6 flex justify-center">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="bg-white hover:bg-slate-50 text-blue-600 font-semibold px-6 py-2 rounded-lg border border-slate-200 shadow-sm transition-colors disabled:opacity-50 flex items-center gap-2"
+          >
+            {loadingMore && <Loader2 className="w-4 h-4 animate-spin" />}
+            Load more
+          </button>
+        </div>
+      )}
+
       {selectedIssue && (
         <IssueDetailsModal 
           issue={selectedIssue} 
@@ -3,13 +3,16 @@ import { useSearchParams } from 'react-router-dom';
 import axios from 'axios';
 import { MapPin, AlertCircle, Loader2 } from 'lucide-react';
 import IssueDetailsModal from '../components/IssueDetailsModal';
+import ResponsiveImage, { ImageVariants } from '../components/ResponsiveImage';
 
 interface FeedItem {
   id: string;
   category: string;
   description: string;
   status: string;
-  image_url: string;
+  image_url: string | null;
+  image_status?: string | null;
+  images?: ImageVariants | null;
   created_at: string;
   latitude: number;
   longitude: number;
@@ -23,6 +26,9 @@ export default function CivicMedia() {
   const [wardName, setWardName] = useState<string>('');
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  // The feed is paged: next_cursor is set while older posts remain
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   // <-- Added Modal State
   const [selectedPost, setSelectedPost] = useState<FeedItem | null>(null);
@@ -44,6 +50,7 @@ export default function CivicMedia() {
         
         setFeed(response.data.data);
         setWardName(response.data.ward_name);
+        setNextCursor(response.data.next_cursor || null);
         setLoading(false);
       } catch (err: any) {
         if (err.response && err.response.status === 404) {
@@ -58,6 +65,24 @@ export default function CivicMedia() {
     fetchLocalFeed();
   }, [lat, lon]);
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const apiUrl = import.meta.env.VITE_API_URL;
+      const response = await axios.get(
+        `${apiUrl}/complaints/ward?lat=${lat}&lon=${lon}&cursor=${encodeURIComponent(nextCursor)}`
+      );
+      setFeed((current) => [...current, ...response.data.data]);
+      setNextCursor(response.data.next_cursor || null);
+    } catch (err) {
+      console.error(err);
+      alert("Failed to load more posts. Please try again.");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getTimeAgo = (dateString: string) => {
     const now = new Date();
     const past = new Date(dateString);
@@ -120,8 +145,11 @@ export default function CivicMedia() {
                 className="w-full aspect-square bg-gray-200 relative cursor-pointer group"
                 onClick={() => setSelectedPost(post)}
               >
-                <img 
+                <ResponsiveImage 
                   src={post.image_url} 
+                  images={post.images}
+                  status={post.image_status}
+                  sizes="(min-width: 640px) 640px, 100vw"
                   alt={post.category} 
                   className="w-full h-full object-cover group-hover:opacity-90 transition-opacity"
                 />
@@ -147,6 +175,17 @@ export default function CivicMedia() {
         )}
       </div>
 
+      {nextCursor && (
+        <button
+          onClick={loadMore}
+          disabled={loadingMore}
+          className="mt-4 w-full bg-white hover:bg-slate-50 text-blue-600 font-semibold py-3 rounded-xl border border-gray-100 shadow-sm transition-colors disabled:opacity-50 flex items-center justify-center gap-2"
+        >
+          {loadingMore && <Loader2 className="w-4 h-4 animate-spin" />}
+          Load more
+        </button>
+      )}
+
       {/* <-- Added Modal Rendering --> */}
       {selectedPost && (
         <IssueDetailsModal 
@@ -3,13 +3,15 @@ import { useAuth } from '../context/AuthContext';
 import axios from 'axios';
 import { MapPin, Clock, CheckCircle, AlertCircle, Loader2 } from 'lucide-react';
 import IssueDetailsModal from '../components/IssueDetailsModal';
+import ResponsiveImage from '../components/ResponsiveImage';
 
 interface Report {
   id: string;
   category: string;
   description: string;
   status: string;
-  image_url: string;
+  image_url: string | null;
+  image_status?: string | null;
   created_at: string;
   phone_number?: string;
   ward_id?: string;
@@ -24,6 +26,23 @@ export default function DashboardPage() {
   const [error, setError] = useState<string | null>(null);
   
   const [selectedReport, setSelectedReport] = useState<Report | null>(null);
+  // The list is paged: the X-Next-Cursor header is set while older reports remain
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  // --- NEW: Sanitize invalid 'NaN' JSON from Python ---
+  const parseReports = (responseData: any) => {
+    if (typeof responseData === 'string') {
+      try {
+        // Replace unquoted NaN with null so the browser can parse it
+        const fixedString = responseData.replace(/:\s*NaN/g, ': null');
+        responseData = JSON.parse(fixedString);
+      } catch (parseError) {
+        console.error("Failed to parse sanitized data", parseError);
+      }
+    }
+    return responseData;
+  };
 
   useEffect(() => {
     const fetchReports = async () => {
@@ -36,22 +55,12 @@ export default function DashboardPage() {
         
         const response = await axios.get(`${apiUrl}/complaints/user/${encodeURIComponent(user?.phone)}`);
         
-        // --- NEW: Sanitize invalid 'NaN' JSON from Python ---
-        let responseData = response.data;
-        
-        if (typeof responseData === 'string') {
-          try {
-            // Replace unquoted NaN with null so the browser can parse it
-            const fixedString = responseData.replace(/:\s*NaN/g, ': null');
-            responseData = JSON.parse(fixedString);
-          } catch (parseError) {
-            console.error("Failed to parse sanitized data", parseError);
-          }
-        }
+        const responseData = parseReports(response.data);
         
         // SAFETY CHECK 1: Ensure we actually got a list back from the API
         if (Array.isArray(responseData)) {
           setReports(responseData);
+          setNextCursor(response.headers['x-next-cursor'] || null);
         } else {
           console.error("API did not return an array after parsing:", responseData);
           setError("Received invalid data format from the server.");
@@ -68,6 +77,27 @@ export default function DashboardPage() {
     fetchReports();
   }, [user]);
 
+  const loadMore = async () => {
+    if (!nextCursor || !user?.phone) return;
+    setLoadingMore(true);
+    try {
+      const apiUrl = import.meta.env.VITE_API_URL;
+      const response = await axios.get(
+        `${apiUrl}/complaints/user/${encodeURIComponent(user.phone)}?cursor=${encodeURIComponent(nextCursor)}`
+      );
+      const responseData = parseReports(response.data);
+      if (Array.isArray(responseData)) {
+        setReports((current) => [...current, ...responseData]);
+        setNextCursor(response.headers['x-next-cursor'] || null);
+      }
+    } catch (err) {
+      console.error(err);
+      alert("Failed to load more reports. Please try again.");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getStatusColor = (status: string) => {
     switch (status) {
       case 'resolved': return 'bg-green-100 text-green-700 border-green-200';
@@ -113,7 +143,7 @@ export default function DashboardPage() {
       <div className="flex items-center justify-between">
         <h1 className="text-2xl font-bold text-slate-900">My Reports</h1>
         <div className="text-sm text-slate-500">
-          Showing {safeReports.length} issues
+          Showing {safeReports.length}{nextCursor ? '+' : ''} issues
         </div>
       </div>
 
@@ -134,8 +164,10 @@ export default function DashboardPage() {
               className="bg-white rounded-2xl shadow-sm border border-slate-200 overflow-hidden hover:shadow-md transition-shadow group cursor-pointer"
             >
               <div className="relative h-48 overflow-hidden">
-                <img 
+                <ResponsiveImage 
                   src={report.image_url} 
+                  status={report.image_status}
+                  sizes="(min-width: 1024px) 33vw, (min-width: 768px) 50vw, 100vw"
                   alt="Issue" 
                   className="w-full h-full object-cover group-hover:scale-105 transition-transform duration-500"
                 />
@@ -174,6 +206,19 @@ export default function DashboardPage() {
         </div>
       )}
 
+      {nextCursor && (
+        <div className="flex justify-center">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="bg-white hover:bg-slate-50 text-blue-600 font-semibold px-6 py-3 rounded-xl border border-slate-200 shadow-sm transition-colors disabled:opacity-50 flex items-center gap-2"
+          >
+            {loadingMore && <Loader2 className="w-4 h-4 animate-spin" />}
+            Load more
+          </button>
+        </div>
+      )}
+
       {selectedReport && (
         <IssueDetailsModal 
           issue={selectedReport as any}
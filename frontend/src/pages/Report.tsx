@@ -88,7 +88,7 @@ export default function ReportPage() {
     setIsVoting(true);
     try {
       const apiUrl = import.meta.env.VITE_API_URL;
-      await axios.post(`${apiUrl}/complaints/${duplicateIssue.id}/vote`);
+      await axios.post(`${apiUrl}/complaints/${duplicateIssue.id}/vote`, { voter_id: user?.phone });
       setDuplicateIssue(null);
       setSuccess(true);
       setTimeout(() => navigate('/dashboard'), 2000);